@@ -2,7 +2,9 @@ from django.contrib import admindocs
 
 
 from django.contrib import admin
-from .models import Boutique, Produit, Marque, Modele, Stock, ArchivedBoutique, ArchivedProduit
+from django.db import transaction
+from .models import Boutique, Produit, Marque, Modele, Stock, ArchivedBoutique, ArchivedProduit, AlerteStock, MouvementStock
+from .permissions import contexte_permissions
 
 @admin.register(Marque)
 class MarqueAdmin(admin.ModelAdmin):
@@ -77,13 +79,33 @@ class StockAdmin(admin.ModelAdmin):
     autocomplete_fields = ['boutique', 'produit']
     list_editable = ('quantite', 'seuil_alerte')
 
+    def changelist_view(self, request, extra_context=None):
+        if request.method != 'POST':
+            return super().changelist_view(request, extra_context)
+        # Les mouvements des lignes modifiées via list_editable sont insérés en une seule fois
+        request.mouvements_stock = []
+        with transaction.atomic():
+            response = super().changelist_view(request, extra_context)
+            MouvementStock.objects.bulk_create(request.mouvements_stock)
+        return response
+
+    def save_model(self, request, obj, form, change):
+        quantite_avant = form.initial.get('quantite', 0) if change else 0
+        super().save_model(request, obj, form, change)
+        if quantite_avant != obj.quantite:
+            mouvement = MouvementStock.depuis_stock(obj, quantite_avant, obj.quantite, 'ADMIN', request.user)
+            if hasattr(request, 'mouvements_stock'):
+                request.mouvements_stock.append(mouvement)
+            else:
+                mouvement.save()
+
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
             return qs
-        if hasattr(request.user, 'profile'):
-            if request.user.profile.role == 'GESTIONNAIRE':
-                return qs.filter(boutique__gestionnaires=request.user)
+        contexte = contexte_permissions(request)
+        if contexte.role == 'GESTIONNAIRE':
+            return qs.filter(boutique_id__in=contexte.boutiques_gestionnaire)
         return qs.none()
 
 @admin.register(ArchivedProduit)
@@ -98,4 +120,25 @@ class ArchivedBoutiqueAdmin(admin.ModelAdmin):
     list_display = ('nom_boutique', 'ville', 'code_postal', 'date_archivage', 'archive_par')
     list_filter = ('date_archivage', 'ville')
     search_fields = ('nom_boutique', 'ville', 'code_postal')
-    readonly_fields = ('date_archivage', 'archive_par')
\ No newline at end of file
+    readonly_fields = ('date_archivage', 'archive_par')
+
+@admin.register(AlerteStock)
+class AlerteStockAdmin(admin.ModelAdmin):
+    list_display = ('boutique', 'produit', 'quantite', 'seuil_alerte', 'statut', 'date_creation', 'date_envoi')
+    list_filter = ('statut', 'date_creation')
+    search_fields = ('boutique__nom_boutique', 'produit__nom_produit')
+    readonly_fields = ('date_creation', 'date_envoi')
+
+@admin.register(MouvementStock)
+class MouvementStockAdmin(admin.ModelAdmin):
+    list_display = ('date_mouvement', 'boutique', 'produit', 'quantite_avant', 'quantite_apres', 'variation', 'source', 'utilisateur')
+    list_filter = ('source', 'date_mouvement')
+    search_fields = ('boutique__nom_boutique', 'produit__nom_produit')
+    readonly_fields = [field.name for field in MouvementStock._meta.fields]
+
+    # Journal en ajout seul
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,145 @@
+"""
+Pipeline des alertes de stock faible.
+
+Les écritures de stock appellent ``enfiler_alertes`` qui enregistre les alertes dans la
+table AlerteStock (dans la transaction en cours, sans envoyer d'email). La commande
+``manage.py envoyer_alertes_stock`` vide ensuite la file : un seul email récapitulatif
+par gestionnaire, envoyés sur une seule connexion SMTP.
+"""
+from collections import defaultdict
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import AlerteStock, Stock
+
+logger = logging.getLogger(__name__)
+
+
+def enfiler_alertes(stocks):
+    """
+    Enregistre une alerte pour chaque stock passé sous son seuil d'alerte.
+    Une seule alerte est créée par couple (boutique, produit) dans la fenêtre
+    STOCK_ALERT_WINDOW_MINUTES, et jamais deux en attente (contrainte
+    alerte_stock_une_en_attente, y compris entre transactions concurrentes).
+    Retourne le nombre d'alertes proposées à l'insertion.
+    """
+    faibles = {
+        (stock.boutique_id, stock.produit_id): stock
+        for stock in stocks
+        if stock.quantite < stock.seuil_alerte
+    }
+    if not faibles:
+        return 0
+
+    limite = timezone.now() - timedelta(minutes=settings.STOCK_ALERT_WINDOW_MINUTES)
+    deja_signales = set(
+        AlerteStock.objects.filter(
+            date_creation__gte=limite,
+            boutique_id__in={boutique_id for boutique_id, _ in faibles},
+            produit_id__in={produit_id for _, produit_id in faibles},
+        ).values_list('boutique_id', 'produit_id')
+    )
+
+    alertes = [
+        AlerteStock(
+            boutique_id=stock.boutique_id,
+            produit_id=stock.produit_id,
+            quantite=stock.quantite,
+            seuil_alerte=stock.seuil_alerte,
+        )
+        for couple, stock in faibles.items()
+        if couple not in deja_signales
+    ]
+    # La vérification ci-dessus ne voit pas les transactions concurrentes : la contrainte
+    # d'unicité tranche, l'alerte en double est ignorée
+    AlerteStock.objects.bulk_create(alertes, ignore_conflicts=True)
+    return len(alertes)
+
+
+def _message_recapitulatif(gestionnaire, lignes):
+    """
+    Construit l'email récapitulatif d'un gestionnaire à partir de ses alertes.
+    """
+    details = "\n".join(
+        f"- {alerte.produit.nom_produit} ({alerte.boutique.nom_boutique}) : "
+        f"{quantite} en stock, seuil d'alerte {alerte.seuil_alerte}"
+        for alerte, quantite in lignes
+    )
+    message = (
+        f"Bonjour {gestionnaire.first_name or 'gestionnaire'},\n\n"
+        f"Les produits suivants ont un stock faible :\n\n"
+        f"{details}\n\n"
+        f"Veuillez procéder au réapprovisionnement.\n\n"
+        f"Cordialement,\nVotre système de gestion de stock"
+    )
+    return EmailMessage(
+        subject=f"Alerte stock - {len(lignes)} produit(s) à réapprovisionner",
+        body=message,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[gestionnaire.email],
+    )
+
+
+def envoyer_alertes(limite=500):
+    """
+    Traite au plus ``limite`` alertes en attente et envoie un récapitulatif par gestionnaire.
+    Les alertes sont verrouillées pendant l'envoi (plusieurs workers peuvent tourner en parallèle)
+    et restent en attente si l'envoi échoue. Retourne le nombre d'alertes traitées.
+    """
+    with transaction.atomic():
+        alertes = list(
+            AlerteStock.objects.select_for_update(skip_locked=True, of=('self',))
+            .filter(statut='EN_ATTENTE')
+            .select_related('boutique', 'produit')
+            .prefetch_related('boutique__gestionnaires')
+            .order_by('date_creation')[:limite]
+        )
+        if not alertes:
+            return 0
+
+        # Quantités actuelles : une alerte devenue inutile (réapprovisionnement) n'est pas envoyée
+        quantites = {
+            (boutique_id, produit_id): quantite
+            for boutique_id, produit_id, quantite in Stock.objects.filter(
+                boutique_id__in={alerte.boutique_id for alerte in alertes},
+                produit_id__in={alerte.produit_id for alerte in alertes},
+            ).values_list('boutique_id', 'produit_id', 'quantite')
+        }
+
+        par_gestionnaire = defaultdict(list)
+        destinataires = {}
+        envoyees, ignorees = [], []
+        for alerte in alertes:
+            quantite = quantites.get((alerte.boutique_id, alerte.produit_id))
+            gestionnaires = [g for g in alerte.boutique.gestionnaires.all() if g.email]
+            if quantite is None or quantite >= alerte.seuil_alerte or not gestionnaires:
+                ignorees.append(alerte)
+                continue
+            for gestionnaire in gestionnaires:
+                destinataires[gestionnaire.pk] = gestionnaire
+                par_gestionnaire[gestionnaire.pk].append((alerte, quantite))
+            envoyees.append(alerte)
+
+        messages = [
+            _message_recapitulatif(destinataires[gestionnaire_id], lignes)
+            for gestionnaire_id, lignes in par_gestionnaire.items()
+        ]
+        if messages:
+            # Une seule connexion SMTP pour tous les récapitulatifs
+            with get_connection(fail_silently=False) as connexion:
+                connexion.send_messages(messages)
+
+        maintenant = timezone.now()
+        for alerte in envoyees:
+            alerte.statut, alerte.date_envoi = 'ENVOYEE', maintenant
+        for alerte in ignorees:
+            alerte.statut, alerte.date_envoi = 'IGNOREE', maintenant
+        AlerteStock.objects.bulk_update(envoyees + ignorees, ['statut', 'date_envoi'])
+
+    logger.info(f"{len(messages)} récapitulatif(s) d'alerte stock envoyé(s) pour {len(envoyees)} alerte(s)")
+    return len(alertes)
@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class BoutiqueConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'boutique'
\ No newline at end of file
+    name = 'boutique'
+
+    def ready(self):
+        # Connexion des signaux (alertes et traçabilité du stock)
+        from . import signals  # noqa: F401
\ No newline at end of file
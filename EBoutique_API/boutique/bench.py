@@ -0,0 +1,361 @@
+"""
+Banc d'essai de charge reproductible.
+
+``generer_donnees`` remplit la base avec un jeu de données synthétique réaliste
+(marques, modèles, boutiques avec leur équipe, produits, stocks, historique des
+ventes) tiré d'un générateur aléatoire à graine fixe : même graine, mêmes données.
+Les lignes créées sont reconnaissables (utilisateurs ``bench_*``, boutiques « Bench »)
+et supprimées par ``purger_donnees``.
+
+``executer_bench`` interroge les principaux endpoints dans le processus (client de test
+Django, sans serveur HTTP) avec des clients concurrents, et mesure le débit et les
+latences p50 / p95 / p99 de chaque scénario.
+
+Commandes : ``manage.py seed_bench`` puis ``manage.py bench``.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import random
+import re
+import statistics
+import subprocess
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Q
+from django.test import Client
+from django.utils import timezone
+
+from free_app.models import UserProfile
+from .cache import invalider_groupes
+from .geo import encoder_geohash
+from .importation import _Resolveur
+from .models import (
+    Boutique, ConsolidationVentes, HistoriqueVentes, MouvementStock, Produit, Stock, VenteJournaliere,
+)
+from .statistiques import rafraichir_ventes_journalieres
+
+PREFIXE = 'bench_'
+MOT_DE_PASSE = 'bench'
+DESCRIPTION_VENTE = 'Vente générée par seed_bench'
+TAILLE_LOT = 2000
+
+VILLES = (
+    # (ville, code postal, latitude, longitude)
+    ('Paris', '75001', 48.8566, 2.3522),
+    ('Marseille', '13001', 43.2965, 5.3698),
+    ('Lyon', '69001', 45.7640, 4.8357),
+    ('Toulouse', '31000', 43.6047, 1.4442),
+    ('Nice', '06000', 43.7102, 7.2620),
+    ('Nantes', '44000', 47.2184, -1.5536),
+    ('Strasbourg', '67000', 48.5734, 7.7521),
+    ('Montpellier', '34000', 43.6108, 3.8767),
+    ('Bordeaux', '33000', 44.8378, -0.5792),
+    ('Lille', '59000', 50.6292, 3.0573),
+)
+GAMMES = {
+    'Apple': ('iPhone 13', 'iPhone 14', 'iPhone 15', 'iPhone 15 Pro', 'iPhone 16'),
+    'Samsung': ('Galaxy S23', 'Galaxy S24', 'Galaxy A35', 'Galaxy A55', 'Galaxy Z Flip6'),
+    'Xiaomi': ('Redmi Note 13', 'Xiaomi 14', 'Poco X6'),
+    'Google': ('Pixel 8', 'Pixel 8a', 'Pixel 9'),
+    'OnePlus': ('OnePlus 12', 'Nord CE4'),
+    'Oppo': ('Find X7', 'Reno 11'),
+}
+COULEURS = ('Noir', 'Blanc', 'Bleu', 'Vert', 'Rouge', 'Violet', 'Gris', 'Or')
+MEMOIRES = ((64, 4), (128, 6), (128, 8), (256, 8), (256, 12), (512, 12))  # (capacité, RAM) en Go
+
+SCENARIOS = ('produits-liste', 'boutiques-liste', 'stocks-vendre', 'historique-ventes', 'jeton')
+
+
+def _par_lots(objets, taille_lot):
+    for debut in range(0, len(objets), taille_lot):
+        yield objets[debut:debut + taille_lot]
+
+
+def _reconsolider():
+    """
+    Reconstruit les agrégats journaliers : les ventes générées sont antidatées, dans des
+    journées que rafraichir_ventes_journalieres considère déjà consolidées.
+    """
+    with transaction.atomic():
+        VenteJournaliere.objects.all().delete()
+        ConsolidationVentes.objects.update(derniere_date=None)
+    rafraichir_ventes_journalieres()
+
+
+def purger_donnees():
+    """
+    Supprime les données créées par generer_donnees. Retourne le nombre de lignes supprimées.
+    """
+    with transaction.atomic():
+        boutiques = Boutique.objects.filter(nom_boutique__startswith='Bench ')
+        # Ventes générées et ventes enregistrées par le scénario stocks-vendre
+        supprimees = HistoriqueVentes.objects.filter(Q(description=DESCRIPTION_VENTE) | Q(boutique__in=boutiques)).delete()[0]
+        supprimees += MouvementStock.objects.filter(boutique__in=boutiques).delete()[0]  # Sans contrainte : pas de cascade
+        supprimees += boutiques.delete()[0]
+        # Produits, stocks et profils suivent leurs utilisateurs (on_delete=CASCADE)
+        supprimees += User.objects.filter(username__startswith=PREFIXE).delete()[0]
+    _reconsolider()
+    invalider_groupes('marques', 'modeles', 'produits', 'boutiques')
+    return supprimees
+
+
+def generer_donnees(boutiques, produits, ventes=None, stocks_par_produit=3, graine=0, taille_lot=TAILLE_LOT):
+    """
+    Crée ``boutiques`` boutiques (un responsable et deux gestionnaires chacune),
+    ``produits`` produits répartis dans ``stocks_par_produit`` boutiques, et ``ventes``
+    lignes d'historique étalées sur l'année écoulée (2 par produit par défaut).
+    Tout est créé par bulk_create ; retourne le nombre de lignes créées par table.
+    Lève ValueError si des données de bench sont déjà présentes (purger_donnees d'abord)
+    ou si des ventes sont demandées sans aucun stock où les prendre.
+    """
+    ventes = 2 * produits if ventes is None else ventes
+    if ventes > 0 and (produits < 1 or stocks_par_produit < 1):
+        raise ValueError("Des ventes demandent au moins un produit en stock (--produits et --stocks-par-produit)")
+    if User.objects.filter(username__startswith=PREFIXE).exclude(username=f'{PREFIXE}admin').exists():
+        raise ValueError("Des données de bench existent déjà : relancer manage.py seed_bench avec --purger")
+    rng = random.Random(graine)
+    mot_de_passe = make_password(MOT_DE_PASSE)  # Un seul hachage (coûteux) pour tous les comptes
+    bilan = {}
+
+    with transaction.atomic():
+        User.objects.update_or_create(
+            username=f'{PREFIXE}admin',
+            defaults={'password': mot_de_passe, 'is_staff': True, 'is_superuser': True},
+        )
+
+        # Équipes des boutiques : un responsable et deux gestionnaires par boutique
+        utilisateurs = User.objects.bulk_create([
+            User(username=f'{PREFIXE}{role}_{numero}', password=mot_de_passe, email=f'{role}{numero}@bench.eboutique.fr')
+            for numero in range(1, boutiques + 1)
+            for role in ('responsable', 'gestionnaire_a', 'gestionnaire_b')
+        ], batch_size=taille_lot)
+        UserProfile.objects.bulk_create([
+            UserProfile(user=utilisateur, role='RESPONSABLE' if index % 3 == 0 else 'GESTIONNAIRE')
+            for index, utilisateur in enumerate(utilisateurs)
+        ], batch_size=taille_lot)
+        bilan['utilisateurs'] = len(utilisateurs) + 1
+
+        objets = []
+        for numero in range(1, boutiques + 1):
+            ville, code_postal, latitude, longitude = VILLES[(numero - 1) % len(VILLES)]
+            # Dispersion d'une vingtaine de kilomètres autour du centre-ville
+            latitude = round(latitude + rng.uniform(-0.2, 0.2), 6)
+            longitude = round(longitude + rng.uniform(-0.2, 0.2), 6)
+            objets.append(Boutique(
+                nom_boutique=f"Bench {ville} {numero}", adresse=f"{rng.randint(1, 200)} rue du Commerce",
+                ville=ville, code_postal=code_postal, departement=code_postal[:2],
+                latitude=latitude, longitude=longitude, geohash=encoder_geohash(latitude, longitude),
+                responsable=utilisateurs[3 * (numero - 1)],
+            ))
+        liste_boutiques = Boutique.objects.bulk_create(objets, batch_size=taille_lot)
+        Boutique.gestionnaires.through.objects.bulk_create([
+            Boutique.gestionnaires.through(boutique_id=boutique.boutique_id, user_id=utilisateurs[3 * index + decalage].pk)
+            for index, boutique in enumerate(liste_boutiques)
+            for decalage in (1, 2)
+        ], batch_size=taille_lot)
+        bilan['boutiques'] = len(liste_boutiques)
+
+        couples = [(marque, modele) for marque, modeles in GAMMES.items() for modele in modeles]
+        modeles = _Resolveur().resoudre(couples)
+
+        objets = []
+        for _ in range(produits):
+            marque, modele = rng.choice(couples)
+            capacite, ram = rng.choice(MEMOIRES)
+            couleur = rng.choice(COULEURS)
+            objets.append(Produit(
+                nom_produit=f"{modele} {capacite} Go {couleur}", modele_id=modeles[(marque, modele)],
+                prix=round(rng.uniform(149, 1599), 2), couleur=couleur, capacite=capacite, ram=ram,
+                user=rng.choice(utilisateurs), validation_responsable=rng.random() < 0.9,
+            ))
+        liste_produits = Produit.objects.bulk_create(objets, batch_size=taille_lot)
+        bilan['produits'] = len(liste_produits)
+
+        stocks = []
+        for produit in liste_produits:
+            for boutique in rng.sample(liste_boutiques, min(stocks_par_produit, len(liste_boutiques))):
+                stocks.append(Stock(boutique=boutique, produit=produit, quantite=rng.randint(0, 500), seuil_alerte=5))
+        Stock.objects.bulk_create(stocks, batch_size=taille_lot)
+        bilan['stocks'] = len(stocks)
+
+        noms_modeles = {modele_id: couple for couple, modele_id in modeles.items()}
+        equipes = {
+            boutique.boutique_id: utilisateurs[3 * index:3 * index + 3]
+            for index, boutique in enumerate(liste_boutiques)
+        }
+        # date_vente est en auto_now_add : les ventes d'une même journée sont créées
+        # ensemble puis datées par un UPDATE
+        par_jour = {}
+        for _ in range(ventes):
+            stock = rng.choice(stocks)
+            par_jour.setdefault(rng.randint(0, 364), []).append((stock, rng.randint(1, 3)))
+        maintenant = timezone.now()
+        for jour, lignes in sorted(par_jour.items()):
+            creees = HistoriqueVentes.objects.bulk_create([
+                HistoriqueVentes(
+                    original_id=stock.produit.produit_id, nom_produit=stock.produit.nom_produit,
+                    marque=noms_modeles[stock.produit.modele_id][0], modele=noms_modeles[stock.produit.modele_id][1],
+                    prix=stock.produit.prix, couleur=stock.produit.couleur, capacite=stock.produit.capacite,
+                    ram=stock.produit.ram, quantite_vendue=quantite, boutique_id=stock.boutique_id,
+                    vendu_par=rng.choice(equipes[stock.boutique_id]), description=DESCRIPTION_VENTE,
+                )
+                for stock, quantite in lignes
+            ], batch_size=taille_lot)
+            date = maintenant - timedelta(days=jour, minutes=rng.randint(0, 600))
+            for lot in _par_lots([vente.pk for vente in creees], taille_lot):
+                HistoriqueVentes.objects.filter(pk__in=lot).update(date_vente=date)
+        bilan['ventes'] = ventes
+
+    _reconsolider()
+    invalider_groupes('marques', 'modeles', 'produits', 'boutiques')
+    return bilan
+
+
+
+# ============================================================================
+# Exécution des scénarios
+# ============================================================================
+COMPTE_BENCH = f'{PREFIXE}gestionnaire_a_1'  # Gestionnaire de la première boutique générée
+SQL_SERVER_TIMING = re.compile(r'desc="(\d+) SQL"')
+
+
+def _hote():
+    hotes = [hote for hote in settings.ALLOWED_HOSTS if hote != '*' and not hote.startswith('.')]
+    return hotes[0] if hotes else 'localhost'
+
+
+def _stocks_a_vendre():
+    """
+    Stocks de la boutique du compte de bench assez fournis pour absorber les ventes du scénario.
+    """
+    return list(
+        Stock.objects.filter(boutique__gestionnaires__username=COMPTE_BENCH, quantite__gte=50)
+        .order_by('stock_id').values_list('stock_id', flat=True)
+    )
+
+
+def _requetes(scenario, stocks):
+    """
+    Fonction i -> (méthode, chemin, corps JSON, authentifiée) de la i-ème requête du scénario.
+    """
+    if scenario == 'jeton':
+        return lambda i: ('post', '/api/token/', {'username': COMPTE_BENCH, 'password': MOT_DE_PASSE}, False)
+    if scenario == 'stocks-vendre':
+        return lambda i: ('post', f'/api/stocks/{stocks[i % len(stocks)]}/vendre/', {'quantite': 1}, True)
+    chemin = {
+        'produits-liste': '/api/produits/',
+        'boutiques-liste': '/api/boutiques/',
+        'historique-ventes': '/api/historique-ventes/',
+    }[scenario]
+    return lambda i: ('get', chemin, None, True)
+
+
+def _client(requete, indices, jeton, hote):
+    """
+    Boucle d'un client : envoie les requêtes d'indices donnés.
+    Retourne (latences en secondes, requêtes SQL par requête, nombre d'erreurs).
+    """
+    client = Client(SERVER_NAME=hote, raise_request_exception=False)
+    latences, requetes_sql, erreurs = [], [], 0
+    try:
+        for i in indices:
+            methode, chemin, corps, authentifiee = requete(i)
+            options = {'data': corps, 'content_type': 'application/json'} if corps else {}
+            if authentifiee:
+                options['HTTP_AUTHORIZATION'] = f'Bearer {jeton}'
+            debut = time.perf_counter()
+            reponse = getattr(client, methode)(chemin, **options)
+            duree = time.perf_counter() - debut
+            if reponse.status_code >= 400:
+                erreurs += 1
+                continue
+            latences.append(duree)
+            sql = SQL_SERVER_TIMING.search(reponse.get('Server-Timing', ''))
+            if sql:
+                requetes_sql.append(int(sql.group(1)))
+    finally:
+        connection.close()  # Connexion propre au thread du client
+    return latences, requetes_sql, erreurs
+
+
+def centile(valeurs, p):
+    if not valeurs:
+        return None
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[p - 1] if len(valeurs) > 1 else valeurs[0]
+
+
+def mesurer(scenario, requetes=200, concurrence=8, echauffement=20, jeton=None, stocks=()):
+    """
+    Envoie ``requetes`` requêtes du scénario réparties entre ``concurrence`` clients
+    simultanés, après ``echauffement`` requêtes non mesurées.
+    """
+    requete = _requetes(scenario, stocks)
+    hote = _hote()
+    _client(requete, range(echauffement), jeton, hote)
+
+    debut = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrence) as executor:
+        resultats = list(executor.map(
+            lambda numero: _client(requete, range(echauffement + numero, echauffement + requetes, concurrence), jeton, hote),
+            range(concurrence),
+        ))
+    duree = time.perf_counter() - debut
+
+    latences = sorted(latence for latences_client, _, _ in resultats for latence in latences_client)
+    requetes_sql = [nombre for _, nombres, _ in resultats for nombre in nombres]
+    return {
+        'requetes': len(latences),
+        'erreurs': sum(erreurs for _, _, erreurs in resultats),
+        'req_par_s': round(len(latences) / duree, 1),
+        'sql_par_requete': round(statistics.mean(requetes_sql), 1) if requetes_sql else None,
+        **{
+            f'p{p}_ms': round(centile(latences, p) * 1000, 2) if latences else None
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def executer_bench(scenarios=SCENARIOS, requetes=200, concurrence=8, echauffement=20):
+    """
+    Mesure chaque scénario et retourne le rapport (commit, paramètres, volume des
+    données, résultats par scénario). Les données doivent avoir été générées par
+    generer_donnees. Lève ValueError si le compte de bench est absent.
+    """
+    client = Client(SERVER_NAME=_hote(), raise_request_exception=False)
+    reponse = client.post('/api/token/', {'username': COMPTE_BENCH, 'password': MOT_DE_PASSE}, content_type='application/json')
+    if reponse.status_code != 200:
+        raise ValueError(f"Connexion impossible avec {COMPTE_BENCH} : lancer d'abord manage.py seed_bench")
+    jeton = reponse.json()['access']
+    stocks = _stocks_a_vendre()
+    if 'stocks-vendre' in scenarios and not stocks:
+        raise ValueError(f"Aucun stock à vendre dans la boutique de {COMPTE_BENCH}")
+
+    return {
+        'commit': _commit(),
+        'base': connection.vendor,
+        'parametres': {'requetes': requetes, 'concurrence': concurrence, 'echauffement': echauffement},
+        'donnees': {
+            'boutiques': Boutique.objects.count(),
+            'produits': Produit.objects.count(),
+            'stocks': Stock.objects.count(),
+            'ventes': HistoriqueVentes.objects.count(),
+        },
+        'resultats': {
+            scenario: mesurer(scenario, requetes, concurrence, echauffement, jeton, stocks)
+            for scenario in scenarios
+        },
+    }
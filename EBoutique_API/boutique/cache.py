@@ -0,0 +1,119 @@
+"""
+Cache des réponses de lecture du catalogue (marques, modèles, produits, boutiques).
+
+Chaque groupe de réponses a un numéro de version stocké dans le cache ; il fait
+partie de la clé de chaque réponse mise en cache. Les signaux de modification des
+modèles incrémentent la version (avant et après le commit de la transaction), ce qui rend
+toutes les réponses du groupe inaccessibles sans avoir à les énumérer : elles
+expirent d'elles-mêmes.
+
+Les réponses portent un ETag calculé sur le corps : un client qui renvoie
+If-None-Match reçoit un 304 sans corps. Pas de Last-Modified : date_maj ne change ni
+avec les gestionnaires (relation many-to-many) ni avec les utilisateurs embarqués.
+"""
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+# Groupes de réponses invalidés par la modification de chaque modèle
+# (les produits embarquent modèle, marque, utilisateur, stocks et noms de boutiques)
+GROUPES_PAR_MODELE = {
+    'Marque': ('marques', 'modeles', 'produits'),
+    'Modele': ('modeles', 'produits'),
+    'Produit': ('produits',),
+    'Stock': ('produits',),
+    'Boutique': ('boutiques', 'produits'),
+    'User': ('boutiques', 'produits'),
+}
+
+
+def _cle_version(groupe):
+    return f'reponses:version:{groupe}'
+
+
+def version_groupe(groupe):
+    """
+    Version courante d'un groupe. Si la clé a été évincée, une nouvelle version est
+    tirée de l'horloge pour ne jamais retomber sur une version déjà utilisée.
+    """
+    version = cache.get(_cle_version(groupe))
+    if version is None:
+        version = time.time_ns()
+        cache.add(_cle_version(groupe), version, timeout=None)
+        version = cache.get(_cle_version(groupe), version)
+    return version
+
+
+def invalider_groupes(*groupes):
+    """
+    Incrémente la version des groupes donnés immédiatement, puis une seconde fois après
+    le commit de la transaction en cours : une lecture concurrente qui aurait remis en
+    cache l'état d'avant le commit entre-temps est ainsi écartée.
+    """
+    def incrementer():
+        for groupe in groupes:
+            try:
+                cache.incr(_cle_version(groupe))
+            except ValueError:
+                cache.set(_cle_version(groupe), time.time_ns(), timeout=None)
+    incrementer()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(incrementer)
+
+
+def _empreinte(contenu):
+    return hashlib.md5(contenu.encode(), usedforsecurity=False).hexdigest()
+
+
+class CacheReponsesMixin:
+    """
+    Met en cache les réponses de list et retrieve d'un viewset.
+    La clé dépend du groupe et de sa version, du chemin, des paramètres de requête
+    (pagination, filtres, tri), de l'hôte (liens next/previous absolus) et de l'utilisateur lorsque la réponse lui est propre (?mine=1).
+    """
+    groupe_cache = None
+
+    def cle_cache(self, request):
+        parametres = sorted(request.query_params.lists())
+        portee = request.user.pk if getattr(self, 'portee_demandee', lambda: False)() else ''
+        brut = json.dumps([request.get_host(), request.path, parametres, portee])
+        return 'reponses:{}:{}:{}'.format(
+            self.groupe_cache, version_groupe(self.groupe_cache),
+            _empreinte(brut)
+        )
+
+    def reponse_en_cache(self, request, calculer, *args, **kwargs):
+        if not settings.CACHE_REPONSES_ACTIF:
+            return calculer(request, *args, **kwargs)
+
+        cle = self.cle_cache(request)
+        entree = cache.get(cle)
+        if entree is None:
+            response = calculer(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            # Données réduites à des types JSON : stockables par tous les backends de cache
+            contenu = json.dumps(response.data, cls=DjangoJSONEncoder)
+            entree = {'data': json.loads(contenu), 'etag': quote_etag(_empreinte(contenu))}
+            cache.set(cle, entree, settings.CACHE_REPONSES_SECONDS)
+
+        entetes = {'ETag': entree['etag'], 'Cache-Control': 'no-cache'}
+        if_none_match = request.headers.get('If-None-Match', '')
+        non_modifie = entree['etag'] in [etag.strip() for etag in if_none_match.split(',')] or if_none_match.strip() == '*'
+        if non_modifie:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=entetes)
+        return Response(entree['data'], headers=entetes)
+
+    def list(self, request, *args, **kwargs):
+        return self.reponse_en_cache(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.reponse_en_cache(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,161 @@
+"""
+Exports en flux (CSV ou NDJSON) de l'historique des ventes, des stocks et des produits archivés.
+
+Les lignes sont lues par lots avec .values_list().iterator(chunk_size=...) : curseur
+côté serveur sous PostgreSQL, ni instance de modèle ni serializer. La réponse est une
+StreamingHttpResponse ; la mémoire utilisée reste constante quel que soit le nombre
+de lignes exportées.
+
+Sous ASGI, Django consommerait entièrement un itérateur synchrone avant de l'envoyer :
+le flux est alors un générateur asynchrone qui lit chaque lot dans un thread.
+"""
+import csv
+from datetime import datetime
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+FORMATS_EXPORT = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+TAILLE_LOT = 2000  # Lignes lues par aller-retour avec la base et envoyées par morceau
+
+# (en-tête, chemin pour values_list)
+COLONNES_VENTES = (
+    ('id', 'id'),
+    ('date_vente', 'date_vente'),
+    ('produit_id', 'original_id'),
+    ('nom_produit', 'nom_produit'),
+    ('marque', 'marque'),
+    ('modele', 'modele'),
+    ('couleur', 'couleur'),
+    ('capacite', 'capacite'),
+    ('ram', 'ram'),
+    ('prix', 'prix'),
+    ('quantite_vendue', 'quantite_vendue'),
+    ('boutique_id', 'boutique_id'),
+    ('nom_boutique', 'boutique__nom_boutique'),
+    ('vendu_par_id', 'vendu_par_id'),
+    ('vendu_par', 'vendu_par__username'),
+)
+COLONNES_STOCKS = (
+    ('stock_id', 'stock_id'),
+    ('boutique_id', 'boutique_id'),
+    ('nom_boutique', 'boutique__nom_boutique'),
+    ('produit_id', 'produit_id'),
+    ('nom_produit', 'produit__nom_produit'),
+    ('marque', 'produit__modele__marque__marque'),
+    ('modele', 'produit__modele__modele'),
+    ('quantite', 'quantite'),
+    ('seuil_alerte', 'seuil_alerte'),
+)
+COLONNES_ARCHIVES = (
+    ('id', 'id'),
+    ('date_archivage', 'date_archivage'),
+    ('produit_id', 'original_id'),
+    ('nom_produit', 'nom_produit'),
+    ('marque', 'marque'),
+    ('modele', 'modele'),
+    ('couleur', 'couleur'),
+    ('capacite', 'capacite'),
+    ('ram', 'ram'),
+    ('prix', 'prix'),
+    ('archive_par', 'archive_par__username'),
+    ('raison', 'raison'),
+)
+
+
+class _Tampon:
+    """
+    Pseudo-fichier pour csv.writer : writerow renvoie la ligne formatée au lieu de l'écrire.
+    """
+    def write(self, valeur):
+        return valeur
+
+
+def _encodeur(format_export, entetes):
+    """
+    Retourne (en-tête du fichier, fonction qui formate une ligne de values_list).
+    """
+    if format_export == 'csv':
+        ecrivain = csv.writer(_Tampon())
+
+        def ligne_csv(ligne):
+            return ecrivain.writerow([
+                timezone.localtime(valeur).isoformat() if isinstance(valeur, datetime) else valeur
+                for valeur in ligne
+            ])
+        return ecrivain.writerow(entetes), ligne_csv
+
+    encodeur = DjangoJSONEncoder(ensure_ascii=False)
+    return '', lambda ligne: encodeur.encode(dict(zip(entetes, ligne))) + '\n'
+
+
+def _flux(lignes, entete, formater):
+    yield entete.encode()
+    lot = []
+    for ligne in lignes.iterator(chunk_size=TAILLE_LOT):
+        lot.append(formater(ligne))
+        if len(lot) == TAILLE_LOT:
+            yield ''.join(lot).encode()
+            lot = []
+    if lot:
+        yield ''.join(lot).encode()
+
+
+async def _aflux(lignes, entete, formater):
+    # aiterator() exécute les requêtes values_list dans la boucle d'événements
+    # (SynchronousOnlyOperation) : chaque lot du flux synchrone est lu dans un thread
+    morceaux = _flux(lignes, entete, formater)
+    fin = object()
+    while (morceau := await sync_to_async(next)(morceaux, fin)) is not fin:
+        yield morceau
+
+
+def reponse_export(request, queryset, colonnes, nom):
+    """
+    Réponse en flux des lignes du queryset (déjà filtré et trié) au format demandé
+    par ?format= (csv par défaut). Le fichier est proposé en téléchargement sous
+    <nom>-<date>.<format>.
+    """
+    format_export = request.query_params.get('format', 'csv')
+    if format_export not in FORMATS_EXPORT:
+        return Response(
+            {'error': f"Le format doit être l'un de : {', '.join(FORMATS_EXPORT)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    entetes = [entete for entete, _ in colonnes]
+    # La base est choisie maintenant : le flux est lu après la fin de la vue, une fois
+    # le routage vers la réplique (LectureReplicaMixin) désactivé
+    lignes = queryset.prefetch_related(None).using(queryset.db).values_list(*(chemin for _, chemin in colonnes))
+    entete, formater = _encodeur(format_export, entetes)
+    if isinstance(request._request, ASGIRequest):
+        contenu = _aflux(lignes, entete, formater)
+    else:
+        contenu = _flux(lignes, entete, formater)
+
+    response = StreamingHttpResponse(contenu, content_type=FORMATS_EXPORT[format_export])
+    nom_fichier = f"{nom}-{timezone.localdate():%Y%m%d}.{format_export}"
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    return response
+
+
+class ExportMixin:
+    """
+    Viewsets disposant d'une action export : le paramètre ?format= y désigne le format
+    du fichier exporté et non un renderer DRF. Les réponses d'erreur de l'action
+    (paramètres invalides, permissions) restent rendues en JSON.
+    """
+    def perform_content_negotiation(self, request, force=False):
+        if self.action == 'export':
+            renderer = JSONRenderer()
+            return renderer, renderer.media_type
+        return super().perform_content_negotiation(request, force)
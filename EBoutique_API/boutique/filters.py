@@ -0,0 +1,156 @@
+"""
+Filtres des listes de l'API (django-filter).
+"""
+from django.db import connection
+from django.db.models import Q
+from django_filters import rest_framework as filters
+
+from .models import (
+    Boutique, Produit, Stock, ArchivedProduit, ArchivedBoutique, HistoriqueVentes,
+    DemandeSuppressionProduit
+)
+
+
+def rechercher_produits(queryset, terme, prefixe=''):
+    """
+    Recherche plein texte sur le nom du produit, le modèle et la marque.
+    Sous PostgreSQL : similarité de trigrammes (tolérante aux fautes de frappe), servie par
+    les index GIN gin_trgm_ops et triée par pertinence. Ailleurs (SQLite pour les tests) :
+    chaque mot doit apparaître dans l'un des trois champs.
+    """
+    champs = [f'{prefixe}nom_produit', f'{prefixe}modele__modele', f'{prefixe}modele__marque__marque']
+    terme = terme.strip()
+    if not terme:
+        return queryset
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        from django.db.models.functions import Greatest
+
+        correspondance = Q()
+        for champ in champs:
+            correspondance |= Q(**{f'{champ}__trigram_word_similar': terme})
+        return queryset.filter(correspondance).annotate(
+            pertinence=Greatest(*[TrigramWordSimilarity(terme, champ) for champ in champs])
+        ).order_by('-pertinence')
+
+    for mot in terme.split():
+        correspondance = Q()
+        for champ in champs:
+            correspondance |= Q(**{f'{champ}__icontains': mot})
+        queryset = queryset.filter(correspondance)
+    return queryset
+
+
+class ProduitFilter(filters.FilterSet):
+    """
+    Filtres du catalogue : marque, modèle, couleur, capacité, RAM, fourchette de prix
+    et recherche par mots-clés.
+    """
+    marque = filters.NumberFilter(field_name='modele__marque_id')
+    marque_nom = filters.CharFilter(field_name='modele__marque__marque', lookup_expr='iexact')
+    couleur = filters.CharFilter(lookup_expr='iexact')
+    prix_min = filters.NumberFilter(field_name='prix', lookup_expr='gte')
+    prix_max = filters.NumberFilter(field_name='prix', lookup_expr='lte')
+    capacite_min = filters.NumberFilter(field_name='capacite', lookup_expr='gte')
+    capacite_max = filters.NumberFilter(field_name='capacite', lookup_expr='lte')
+    ram_min = filters.NumberFilter(field_name='ram', lookup_expr='gte')
+    ram_max = filters.NumberFilter(field_name='ram', lookup_expr='lte')
+    boutique = filters.NumberFilter(field_name='stocks__boutique_id', distinct=True)
+    recherche = filters.CharFilter(method='filtrer_recherche')
+
+    class Meta:
+        model = Produit
+        fields = ['modele', 'capacite', 'ram', 'validation_responsable']
+
+    def filtrer_recherche(self, queryset, name, value):
+        return rechercher_produits(queryset, value)
+
+
+class StockFilter(filters.FilterSet):
+    """
+    Filtres des stocks : boutique, produit, marque et quantités.
+    """
+    marque = filters.NumberFilter(field_name='produit__modele__marque_id')
+    quantite_min = filters.NumberFilter(field_name='quantite', lookup_expr='gte')
+    quantite_max = filters.NumberFilter(field_name='quantite', lookup_expr='lte')
+    en_stock = filters.BooleanFilter(method='filtrer_en_stock')
+    recherche = filters.CharFilter(method='filtrer_recherche')
+
+    class Meta:
+        model = Stock
+        fields = ['boutique', 'produit']
+
+    def filtrer_en_stock(self, queryset, name, value):
+        return queryset.filter(quantite__gt=0) if value else queryset.filter(quantite__lte=0)
+
+    def filtrer_recherche(self, queryset, name, value):
+        return rechercher_produits(queryset, value, prefixe='produit__')
+
+
+class BoutiqueFilter(filters.FilterSet):
+    """
+    Filtres des boutiques : ville, code postal (ou son début) et département.
+    """
+    ville = filters.CharFilter(lookup_expr='iexact')
+    code_postal = filters.CharFilter()
+    code_postal_debut = filters.CharFilter(field_name='code_postal', lookup_expr='startswith')
+    departement = filters.CharFilter(lookup_expr='iexact')
+
+    class Meta:
+        model = Boutique
+        fields = ['responsable']
+
+
+class ArchivedProduitFilter(filters.FilterSet):
+    """
+    Filtres des produits archivés : marque, modèle et période d'archivage.
+    """
+    marque = filters.CharFilter(lookup_expr='iexact')
+    modele = filters.CharFilter(lookup_expr='iexact')
+    debut = filters.IsoDateTimeFilter(field_name='date_archivage', lookup_expr='gte')
+    fin = filters.IsoDateTimeFilter(field_name='date_archivage', lookup_expr='lte')
+
+    class Meta:
+        model = ArchivedProduit
+        fields = ['original_id', 'archive_par']
+
+
+class HistoriqueVentesFilter(filters.FilterSet):
+    """
+    Filtres de l'historique des ventes : marque, modèle, boutique, vendeur et période de vente.
+    """
+    marque = filters.CharFilter(lookup_expr='iexact')
+    modele = filters.CharFilter(lookup_expr='iexact')
+    debut = filters.IsoDateTimeFilter(field_name='date_vente', lookup_expr='gte')
+    fin = filters.IsoDateTimeFilter(field_name='date_vente', lookup_expr='lte')
+
+    class Meta:
+        model = HistoriqueVentes
+        fields = ['original_id', 'boutique', 'vendu_par']
+
+
+class ArchivedBoutiqueFilter(filters.FilterSet):
+    """
+    Filtres des boutiques archivées : ville, code postal et période d'archivage.
+    """
+    ville = filters.CharFilter(lookup_expr='iexact')
+    code_postal = filters.CharFilter()
+    debut = filters.IsoDateTimeFilter(field_name='date_archivage', lookup_expr='gte')
+    fin = filters.IsoDateTimeFilter(field_name='date_archivage', lookup_expr='lte')
+
+    class Meta:
+        model = ArchivedBoutique
+        fields = ['original_id', 'archive_par']
+
+
+class DemandeSuppressionProduitFilter(filters.FilterSet):
+    """
+    Filtres des demandes de suppression : statut, produit, demandeur et période de demande.
+    """
+    debut = filters.IsoDateTimeFilter(field_name='date_demande', lookup_expr='gte')
+    fin = filters.IsoDateTimeFilter(field_name='date_demande', lookup_expr='lte')
+
+    class Meta:
+        model = DemandeSuppressionProduit
+        fields = ['statut', 'produit', 'demandeur', 'responsable']
@@ -0,0 +1,185 @@
+"""
+Outils géographiques pour la recherche des boutiques les plus proches.
+
+Les boutiques sont indexées par un geohash stocké en base (colonne indexée
+``Boutique.geohash``) : chaque préfixe du geohash correspond à une cellule
+de la grille. La recherche interroge uniquement la cellule du point demandé
+et ses 8 voisines, en élargissant la grille tant que les k résultats ne sont
+pas garantis, au lieu de calculer la distance de toutes les boutiques.
+"""
+import math
+
+RAYON_TERRE_KM = 6371.0
+PRECISION_GEOHASH = 9  # Précision stockée en base (~5 m)
+PRECISION_RECHERCHE_MAX = 7  # Cellule la plus fine utilisée pour la recherche (~150 m)
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encoder_geohash(latitude, longitude, precision=PRECISION_GEOHASH):
+    """
+    Encode une position GPS en geohash de la précision demandée.
+    """
+    lat_min, lat_max = -90.0, 90.0
+    lon_min, lon_max = -180.0, 180.0
+    geohash = []
+    bits = 0
+    nb_bits = 0
+    pair = True  # Les bits pairs codent la longitude
+
+    while len(geohash) < precision:
+        if pair:
+            milieu = (lon_min + lon_max) / 2
+            if longitude >= milieu:
+                bits = (bits << 1) | 1
+                lon_min = milieu
+            else:
+                bits = bits << 1
+                lon_max = milieu
+        else:
+            milieu = (lat_min + lat_max) / 2
+            if latitude >= milieu:
+                bits = (bits << 1) | 1
+                lat_min = milieu
+            else:
+                bits = bits << 1
+                lat_max = milieu
+        pair = not pair
+        nb_bits += 1
+        if nb_bits == 5:
+            geohash.append(_BASE32[bits])
+            bits = 0
+            nb_bits = 0
+
+    return ''.join(geohash)
+
+
+def dimensions_cellule(precision):
+    """
+    Retourne la taille (en degrés) d'une cellule : (hauteur en latitude, largeur en longitude).
+    """
+    total_bits = 5 * precision
+    bits_longitude = (total_bits + 1) // 2
+    bits_latitude = total_bits // 2
+    return 180.0 / (2 ** bits_latitude), 360.0 / (2 ** bits_longitude)
+
+
+def cellules_voisines(latitude, longitude, precision):
+    """
+    Retourne les geohashs de la cellule contenant le point et de ses 8 voisines.
+    Les cellules au-delà des pôles sont ignorées, la longitude est repliée sur [-180, 180[.
+    """
+    hauteur, largeur = dimensions_cellule(precision)
+    cellules = set()
+    for d_lat in (-1, 0, 1):
+        lat = latitude + d_lat * hauteur
+        if lat < -90.0 or lat > 90.0:
+            continue
+        for d_lon in (-1, 0, 1):
+            lon = (longitude + d_lon * largeur + 180.0) % 360.0 - 180.0
+            cellules.add(encoder_geohash(lat, lon, precision))
+    return sorted(cellules)
+
+
+def rayon_garanti_km(latitude, precision):
+    """
+    Distance minimale entre le point et le bord du bloc de 3x3 cellules qui l'entoure :
+    toute boutique située à une distance inférieure est forcément dans le bloc.
+    """
+    hauteur, largeur = dimensions_cellule(precision)
+    nord_sud = RAYON_TERRE_KM * math.radians(hauteur)
+    largeur_rad = min(math.radians(largeur), math.pi / 2)
+    est_ouest = RAYON_TERRE_KM * math.asin(
+        min(1.0, math.cos(math.radians(latitude)) * math.sin(largeur_rad))
+    )
+    return min(nord_sud, est_ouest)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """
+    Distance orthodromique (formule de haversine) entre deux points, en kilomètres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * RAYON_TERRE_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def boite_englobante(latitude, longitude, rayon_km):
+    """
+    Retourne (lat_min, lat_max, lon_min, lon_max) couvrant le cercle de rayon donné.
+    Les bornes de longitude valent None lorsque le cercle touche un pôle ou l'antiméridien.
+    """
+    delta_lat = math.degrees(rayon_km / RAYON_TERRE_KM)
+    lat_min, lat_max = latitude - delta_lat, latitude + delta_lat
+    if lat_min <= -90.0 or lat_max >= 90.0:
+        return max(lat_min, -90.0), min(lat_max, 90.0), None, None
+
+    cos_max = math.cos(math.radians(max(abs(lat_min), abs(lat_max))))
+    delta_lon = math.degrees(rayon_km / (RAYON_TERRE_KM * cos_max))
+    lon_min, lon_max = longitude - delta_lon, longitude + delta_lon
+    if lon_min < -180.0 or lon_max > 180.0:
+        return lat_min, lat_max, None, None
+    return lat_min, lat_max, lon_min, lon_max
+
+
+def _etape_recherche(latitude, longitude, k, rayon_km, precision, candidats):
+    """
+    Trie les candidats d'une étape de k_plus_proches.
+    Retourne (resultats, termine) : termine vaut True lorsque les k résultats sont garantis exacts.
+    """
+    resultats = []
+    for objet, lat, lon in candidats:
+        distance = distance_km(latitude, longitude, lat, lon)
+        if distance <= rayon_km:
+            resultats.append((distance, objet))
+    resultats.sort(key=lambda resultat: resultat[0])
+
+    # Le bloc couvre tout le rayon : la liste est complète
+    garanti = rayon_garanti_km(latitude, precision)
+    if garanti >= rayon_km:
+        return resultats[:k], True
+
+    # Les résultats situés dans le rayon garanti sont exacts
+    surs = [resultat for resultat in resultats if resultat[0] <= garanti]
+    if len(surs) >= k:
+        return surs[:k], True
+    return resultats[:k], False
+
+
+def k_plus_proches(latitude, longitude, k, rayon_km, charger_candidats):
+    """
+    Recherche les k objets les plus proches dans le rayon donné.
+
+    ``charger_candidats(cellules)`` doit retourner des tuples (objet, latitude, longitude)
+    pour les objets dont le geohash commence par l'une des cellules fournies.
+    On part des cellules les plus fines et on élargit la grille jusqu'à ce que les
+    k résultats soient garantis exacts, ou que le bloc couvre tout le rayon demandé.
+
+    Retourne une liste de tuples (distance_km, objet) triée par distance.
+    """
+    resultats = []
+    for precision in range(PRECISION_RECHERCHE_MAX, 0, -1):
+        cellules = cellules_voisines(latitude, longitude, precision)
+        resultats, termine = _etape_recherche(
+            latitude, longitude, k, rayon_km, precision, charger_candidats(cellules)
+        )
+        if termine:
+            break
+    return resultats
+
+
+async def ak_plus_proches(latitude, longitude, k, rayon_km, charger_candidats):
+    """
+    Version asynchrone de k_plus_proches : ``charger_candidats`` est une coroutine.
+    """
+    resultats = []
+    for precision in range(PRECISION_RECHERCHE_MAX, 0, -1):
+        cellules = cellules_voisines(latitude, longitude, precision)
+        resultats, termine = _etape_recherche(
+            latitude, longitude, k, rayon_km, precision, await charger_candidats(cellules)
+        )
+        if termine:
+            break
+    return resultats
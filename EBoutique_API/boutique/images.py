@@ -0,0 +1,200 @@
+"""
+Images dérivées des produits : miniature et taille moyenne, en JPEG et en WebP.
+
+Les variantes sont enregistrées à côté de l'original, dans produits/variantes/ ; le
+stockage les nomme d'après leur contenu comme les originaux (eboutique_config/media.py).
+Leur description (noms, largeur, hauteur) est stockée dans Produit.variantes_image
+avec le nom de l'image source : des variantes qui ne correspondent plus à l'image du
+produit ne sont jamais exposées.
+
+Après l'enregistrement d'une nouvelle image, la génération a lieu après le commit
+dans un thread d'arrière-plan, hors du cycle de la requête. La commande
+``manage.py generer_images_produits`` rattrape les images sans variantes (import,
+redémarrage d'un worker) ou régénère tout le dossier produits/ dans un pool de processus.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+import logging
+import os
+import threading
+
+import django
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.fields.json import KT
+from PIL import ExifTags, Image, ImageOps
+
+from .cache import invalider_groupes
+from .models import Produit
+
+logger = logging.getLogger(__name__)
+
+DOSSIER_IMAGES = 'produits'
+# Côté le plus long en pixels, de la plus grande à la plus petite taille :
+# chaque variante est réduite à partir de la précédente
+TAILLES = {
+    'moyenne': 800,
+    'miniature': 200,
+}
+FORMATS = {
+    'jpeg': ('jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+    'webp': ('webp', {'quality': 80, 'method': 4}),
+}
+
+_executeur = None
+_verrou_executeur = threading.Lock()
+
+
+def nom_variante(nom, taille, extension):
+    dossier, fichier = os.path.split(nom)
+    return f'{dossier}/variantes/{os.path.splitext(fichier)[0]}_{taille}.{extension}'
+
+
+def _enregistrer(nom, image, format_image, options):
+    tampon = BytesIO()
+    image.save(tampon, format_image, **options)
+    # Pas de suppression de l'ancienne version : le fichier peut être partagé (contenu identique)
+    return default_storage.save(nom, ContentFile(tampon.getvalue()))
+
+
+def generer_variantes(nom):
+    """
+    Génère les variantes de l'image ``nom`` du stockage et les enregistre à côté de
+    l'original. Retourne la description à stocker dans Produit.variantes_image.
+    Lève OSError si le fichier est absent ou n'est pas une image.
+    """
+    with default_storage.open(nom, 'rb') as fichier:
+        image = Image.open(fichier)
+        largeur, hauteur = image.size
+        if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+            largeur, hauteur = hauteur, largeur  # Photo tournée d'un quart de tour
+        # JPEG : décodage directement à l'échelle réduite (1/2, 1/4, 1/8), bien moins coûteux
+        image.draft('RGB', (max(TAILLES.values()),) * 2)
+        image = ImageOps.exif_transpose(image)
+        transparente = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparente else 'RGB')
+
+    variantes = {'source': nom, 'largeur': largeur, 'hauteur': hauteur}
+    for taille, cote in TAILLES.items():
+        image.thumbnail((cote, cote), Image.Resampling.LANCZOS)
+        variante = {'largeur': image.width, 'hauteur': image.height}
+        for format_image, (extension, options) in FORMATS.items():
+            rendu = image
+            if transparente and format_image == 'jpeg':
+                rendu = Image.new('RGB', image.size, 'white')
+                rendu.paste(image, mask=image.getchannel('A'))
+            variante[format_image] = _enregistrer(nom_variante(nom, taille, extension), rendu, format_image.upper(), options)
+        variantes[taille] = variante
+    return variantes
+
+
+def enregistrer_variantes(nom, variantes):
+    """
+    Enregistre les variantes sur les produits dont l'image est toujours ``nom``.
+    """
+    mis_a_jour = Produit.objects.filter(image=nom).update(variantes_image=variantes)
+    if mis_a_jour:
+        # update() ne déclenche pas les signaux : les réponses en cache sont invalidées ici
+        invalider_groupes('produits')
+    return mis_a_jour
+
+
+def _tache_variantes(nom):
+    try:
+        enregistrer_variantes(nom, generer_variantes(nom))
+    except Exception:
+        logger.exception("Échec de la génération des variantes de %s", nom)
+    finally:
+        connection.close()  # Connexion propre au thread d'arrière-plan
+
+
+def planifier_variantes(produit):
+    """
+    Génère les variantes de l'image du produit après le commit de la transaction en
+    cours, dans le thread d'arrière-plan du processus.
+    """
+    global _executeur
+    nom = produit.image.name
+    with _verrou_executeur:
+        if _executeur is None:
+            _executeur = ThreadPoolExecutor(max_workers=1, thread_name_prefix='variantes-images')
+    transaction.on_commit(lambda: _executeur.submit(_tache_variantes, nom))
+
+
+def images_en_attente():
+    """
+    Noms des images de produits dont les variantes sont absentes ou périmées.
+    """
+    return (
+        Produit.objects.exclude(Q(image='') | Q(image__isnull=True))
+        .annotate(source=KT('variantes_image__source'))
+        .filter(Q(source__isnull=True) | ~Q(source=F('image')))
+        .values_list('image', flat=True)
+        .distinct()
+    )
+
+
+def images_du_dossier():
+    """
+    Noms de toutes les images originales du dossier produits/ (sans le sous-dossier des variantes).
+    """
+    if not default_storage.exists(DOSSIER_IMAGES):
+        return []
+    _, fichiers = default_storage.listdir(DOSSIER_IMAGES)
+    return sorted(f'{DOSSIER_IMAGES}/{fichier}' for fichier in fichiers)
+
+
+def representation_variantes(variantes, nom_image, construire_url):
+    """
+    URLs et dimensions des variantes de l'image ``nom_image`` pour les réponses de l'API.
+    Retourne None tant que les variantes de cette image n'ont pas été générées.
+    """
+    if not nom_image or not variantes or variantes.get('source') != nom_image:
+        return None
+    representation = {
+        'original': {
+            'url': construire_url(default_storage.url(nom_image)),
+            'largeur': variantes['largeur'],
+            'hauteur': variantes['hauteur'],
+        },
+    }
+    for taille in TAILLES:
+        variante = variantes[taille]
+        representation[taille] = {
+            'url': construire_url(default_storage.url(variante['jpeg'])),
+            'url_webp': construire_url(default_storage.url(variante['webp'])),
+            'largeur': variante['largeur'],
+            'hauteur': variante['hauteur'],
+        }
+    return representation
+
+
+def _generer_dans_processus(nom):
+    # Toute erreur (fichier illisible, DecompressionBombError de Pillow...) reste propre à
+    # l'image : remontée par pool.map, elle interromprait la commande sans enregistrer les autres
+    try:
+        return nom, generer_variantes(nom), None
+    except Exception as e:
+        return nom, None, f"{type(e).__name__} : {e}"
+
+
+def regenerer_variantes(noms, processus=None):
+    """
+    Génère les variantes des images ``noms`` dans un pool de processus (décodage et
+    redimensionnement en parallèle sur tous les cœurs) ; les produits sont mis à jour
+    par le processus principal. Retourne (nombre d'images traitées, erreurs).
+    """
+    noms = list(noms)
+    traitees, erreurs = 0, []
+    with ProcessPoolExecutor(max_workers=processus, initializer=django.setup) as pool:
+        for nom, variantes, erreur in pool.map(_generer_dans_processus, noms, chunksize=4):
+            if erreur:
+                erreurs.append(f"{nom} : {erreur}")
+                continue
+            Produit.objects.filter(image=nom).update(variantes_image=variantes)
+            traitees += 1
+    if traitees:
+        invalider_groupes('produits')
+    return traitees, erreurs
@@ -0,0 +1,417 @@
+"""
+Import en masse du catalogue (marques, modèles, produits, boutiques, stocks) depuis des CSV.
+
+Remplace le traitement pandas de script.ipynb. Les fichiers sont lus en flux, par lots
+de ``taille_lot`` lignes : la mémoire ne dépend pas de la taille du fichier. Chaque lot
+est écrit dans sa propre transaction, en quelques requêtes :
+- marques, modèles et stocks : bulk_create(update_conflicts=True) sur leur clé unique
+  (INSERT ... ON CONFLICT DO UPDATE) ;
+- produits et boutiques (sans clé unique en base) : clé naturelle résolue par une table
+  en mémoire chargée une fois ; les lignes déjà présentes reçoivent leur clé primaire et
+  le même bulk_create(update_conflicts=True) sur la clé primaire les met à jour
+  (bulk_update génère un CASE WHEN par ligne, beaucoup plus lent).
+
+Les écritures en masse ne déclenchent ni save() ni les signaux : le geohash des
+boutiques est calculé ici, les mouvements et alertes de stock sont enregistrés
+explicitement et le cache des réponses est invalidé en fin d'import.
+"""
+import csv
+import re
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .alertes import enfiler_alertes
+from .cache import invalider_groupes
+from .geo import encoder_geohash
+from .models import Boutique, Marque, Modele, MouvementStock, Produit, Stock
+
+TAILLE_LOT = 5000
+
+# Colonnes acceptées pour chaque champ : format de l'application, puis CSV Flipkart d'origine
+COLONNES_PRODUIT = {
+    'marque': ('marque', 'nom', 'brand'),
+    'modele': ('modele', 'model'),
+    'nom_produit': ('nom_produit',),
+    'couleur': ('couleur', 'base_color'),
+    'capacite': ('capacite', 'ROM'),
+    'ram': ('ram', 'RAM'),
+    'prix': ('prix', 'sales_price'),
+    # Chemin d'une image déjà dans le stockage (produits/...) ; l'image_url du CSV Flipkart,
+    # une URL externe, n'est pas importée
+    'image': ('image',),
+}
+COLONNES_BOUTIQUE = {
+    'nom_boutique': ('nom_boutique', 'nom'),
+    'adresse': ('adresse',),
+    'ville': ('ville',),
+    'code_postal': ('code_postal',),
+    'departement': ('departement',),
+    'latitude': ('latitude',),
+    'longitude': ('longitude',),
+    'description': ('shopDescription',),
+}
+COLONNES_STOCK = {
+    'boutique_id': ('boutique_id', 'id_boutique'),
+    'produit_id': ('produit_id', 'id_produit'),
+    'quantite': ('quantite',),
+}
+
+# Description du CSV des boutiques Free : "[Orange] 75 Paris Châtelet (12 rue ...)"
+DESCRIPTION_BOUTIQUE = re.compile(r'^\[[^\]]*\]\s*(?P<departement>\d+[AB]?)?\s*(?P<ville>[^(]*?)\s*(?:\((?P<adresse>[^)]*)\))?\s*$')
+
+
+@dataclass
+class Rapport:
+    """
+    Bilan d'un import : lignes lues, créées, mises à jour et rejetées, durée.
+    """
+    entite: str
+    lues: int = 0
+    creees: int = 0
+    mises_a_jour: int = 0
+    rejetees: int = 0
+    references_creees: int = 0  # Marques et modèles créés par l'import des produits
+    erreurs: list = field(default_factory=list)
+    duree: float = 0.0
+
+    @property
+    def lignes_par_seconde(self):
+        return self.lues / self.duree if self.duree else 0.0
+
+    def rejeter(self, numero, message):
+        self.rejetees += 1
+        if len(self.erreurs) < 20:  # Les premières erreurs suffisent à corriger le fichier
+            self.erreurs.append(f"ligne {numero} : {message}")
+
+    def __str__(self):
+        return (
+            f"{self.entite} : {self.lues} ligne(s) en {self.duree:.2f} s "
+            f"({self.lignes_par_seconde:.0f} lignes/s), {self.creees} créée(s), "
+            f"{self.mises_a_jour} mise(s) à jour, {self.rejetees} rejetée(s)"
+            + (f", {self.references_creees} marque(s) et modèle(s) créé(s)" if self.references_creees else '')
+        )
+
+
+def _lire_lots(chemin, colonnes, taille_lot, delimiteur=None):
+    """
+    Lit un CSV en flux et produit des lots de (numéro de ligne, valeurs) où les valeurs
+    sont indexées par les noms de champs de ``colonnes``. Le séparateur est détecté
+    (',' ou ';') s'il n'est pas fourni.
+    """
+    with open(chemin, newline='', encoding='utf-8-sig') as fichier:
+        if delimiteur is None:
+            entete = fichier.readline()
+            delimiteur = ';' if entete.count(';') > entete.count(',') else ','
+            fichier.seek(0)
+        lecteur = csv.DictReader(fichier, delimiter=delimiteur)
+        correspondance = {
+            champ: next((nom for nom in noms if nom in (lecteur.fieldnames or ())), None)
+            for champ, noms in colonnes.items()
+        }
+        lignes = (
+            (numero, {champ: (ligne[nom] or '').strip() if nom else '' for champ, nom in correspondance.items()})
+            for numero, ligne in enumerate(lecteur, start=2)
+        )
+        while lot := list(islice(lignes, taille_lot)):
+            yield lot
+
+
+def _decimal(valeur):
+    """
+    Convertit un nombre du CSV (virgule décimale acceptée) ; lève ValueError si invalide.
+    """
+    try:
+        nombre = Decimal(valeur.replace(',', '.').replace(' ', ''))
+    except InvalidOperation:
+        raise ValueError(f"nombre invalide : {valeur!r}")
+    if not nombre.is_finite():
+        raise ValueError(f"nombre invalide : {valeur!r}")
+    return nombre
+
+
+def _texte_champ(modele, nom, valeur):
+    """
+    Texte du CSV pour un champ du modèle ; lève ValueError s'il dépasse la longueur
+    du champ (une valeur tronquée ne retrouverait plus la même clé naturelle).
+    """
+    longueur = modele._meta.get_field(nom).max_length
+    if len(valeur) > longueur:
+        raise ValueError(f"{nom} trop long ({len(valeur)} > {longueur} caractères)")
+    return valeur
+
+
+def _decimal_champ(modele, nom, valeur):
+    """
+    Nombre arrondi à la précision du champ : même valeur que celle relue en base,
+    pour comparer les clés naturelles.
+    """
+    return round(_decimal(valeur), modele._meta.get_field(nom).decimal_places)
+
+
+class _Resolveur:
+    """
+    Tables en mémoire nom -> id des marques et (marque_id, nom) -> id des modèles.
+    Les noms inconnus d'un lot sont créés en une requête par table.
+    """
+    def __init__(self):
+        self.marques = dict(Marque.objects.values_list('marque', 'marque_id'))
+        self.modeles = {
+            (marque_id, nom): modele_id
+            for modele_id, marque_id, nom in Modele.objects.values_list('modele_id', 'marque_id', 'modele')
+        }
+        self.creees = 0
+
+    def resoudre(self, couples):
+        """
+        Retourne les identifiants des modèles des couples (marque, modele) donnés.
+        """
+        nouvelles = {marque for marque, _ in couples} - self.marques.keys()
+        if nouvelles:
+            objets = Marque.objects.bulk_create(
+                [Marque(marque=marque) for marque in nouvelles],
+                update_conflicts=True, unique_fields=['marque'], update_fields=['marque'],
+            )
+            self.marques.update((objet.marque, objet.marque_id) for objet in objets)
+            self.creees += len(nouvelles)
+
+        cles = {(self.marques[marque], modele) for marque, modele in couples}
+        nouveaux = cles - self.modeles.keys()
+        if nouveaux:
+            objets = Modele.objects.bulk_create(
+                [Modele(marque_id=marque_id, modele=modele) for marque_id, modele in nouveaux],
+                update_conflicts=True, unique_fields=['marque', 'modele'], update_fields=['modele'],
+            )
+            self.modeles.update(((objet.marque_id, objet.modele), objet.modele_id) for objet in objets)
+            self.creees += len(nouveaux)
+
+        return {(marque, modele): self.modeles[(self.marques[marque], modele)] for marque, modele in couples}
+
+
+def importer_produits(chemin, utilisateur, taille_lot=TAILLE_LOT, valides=True):
+    """
+    Importe les produits d'un CSV (format de l'application ou CSV Flipkart).
+    Un produit est identifié par (modèle, nom, couleur, capacité, RAM) ; un produit déjà
+    présent voit son prix et son image mis à jour.
+    """
+    rapport = Rapport('Produits')
+    debut = time.perf_counter()
+    resolveur = _Resolveur()
+    existants = {
+        (modele_id, nom, couleur, capacite, ram): (produit_id, prix, image)
+        for produit_id, modele_id, nom, couleur, capacite, ram, prix, image in Produit.objects.values_list(
+            'produit_id', 'modele_id', 'nom_produit', 'couleur', 'capacite', 'ram', 'prix', 'image'
+        ).iterator(chunk_size=taille_lot)
+    }
+
+    for lot in _lire_lots(chemin, COLONNES_PRODUIT, taille_lot):
+        rapport.lues += len(lot)
+        lignes = []
+        for numero, valeurs in lot:
+            try:
+                if not valeurs['marque'] or not valeurs['modele']:
+                    raise ValueError("marque et modèle obligatoires")
+                _texte_champ(Marque, 'marque', valeurs['marque'])
+                _texte_champ(Modele, 'modele', valeurs['modele'])
+                _texte_champ(Produit, 'couleur', valeurs['couleur'])
+                if '://' in valeurs['image']:
+                    raise ValueError(f"image : chemin du stockage attendu, pas une URL ({valeurs['image']!r})")
+                _texte_champ(Produit, 'image', valeurs['image'])
+                capacite = _decimal_champ(Produit, 'capacite', valeurs['capacite'])
+                ram = _decimal_champ(Produit, 'ram', valeurs['ram'])
+                prix = _decimal_champ(Produit, 'prix', valeurs['prix'])
+            except ValueError as erreur:
+                rapport.rejeter(numero, erreur)
+                continue
+            # Nom construit comme dans script.ipynb : "marque modèle capacité"
+            nom = valeurs['nom_produit'] or f"{valeurs['marque']} {valeurs['modele']} {valeurs['capacite']}"
+            try:
+                _texte_champ(Produit, 'nom_produit', nom)
+            except ValueError as erreur:
+                rapport.rejeter(numero, erreur)
+                continue
+            lignes.append((valeurs, nom, capacite, ram, prix))
+
+        with transaction.atomic():
+            modeles = resolveur.resoudre({(valeurs['marque'], valeurs['modele']) for valeurs, *_ in lignes})
+            nouveaux, modifies = {}, {}
+            for valeurs, nom, capacite, ram, prix in lignes:
+                cle = (modeles[(valeurs['marque'], valeurs['modele'])], nom, valeurs['couleur'], capacite, ram)
+                image = valeurs['image']
+                if cle in existants:
+                    produit_id, prix_actuel, image_actuelle = existants[cle]
+                    image = image or image_actuelle  # Sans image dans le fichier, l'image actuelle est conservée
+                    if (prix, image) == (prix_actuel, image_actuelle):
+                        continue
+                    existants[cle] = (produit_id, prix, image)
+                else:
+                    produit_id = None
+                # Ligne complète dans les deux cas : seuls prix et image sont écrits en cas de conflit
+                produit = Produit(
+                    produit_id=produit_id, modele_id=cle[0], nom_produit=nom, couleur=cle[2], capacite=capacite,
+                    ram=ram, prix=prix, image=image, user=utilisateur, validation_responsable=valides,
+                )
+                (modifies if produit_id else nouveaux)[cle] = produit
+            Produit.objects.bulk_create(
+                [*nouveaux.values(), *modifies.values()], batch_size=1000,
+                update_conflicts=True, unique_fields=['produit_id'], update_fields=['prix', 'image'],
+            )
+        existants.update((cle, (produit.produit_id, produit.prix, produit.image.name)) for cle, produit in nouveaux.items())
+        rapport.creees += len(nouveaux)
+        rapport.mises_a_jour += len(modifies)
+
+    invalider_groupes('marques', 'modeles', 'produits')
+    rapport.references_creees = resolveur.creees
+    rapport.duree = time.perf_counter() - debut
+    return rapport
+
+
+def _valeurs_boutique(valeurs):
+    """
+    Champs d'une boutique ; la ville, le département et l'adresse manquants sont extraits
+    de la description du CSV Free (shopDescription), comme dans script.ipynb.
+    """
+    description = DESCRIPTION_BOUTIQUE.match(valeurs['description']) if valeurs['description'] else None
+    extraits = description.groupdict() if description else {}
+    ville = valeurs['ville'] or (extraits.get('ville') or '').strip()
+    adresse = valeurs['adresse'] or (extraits.get('adresse') or '').strip()
+    nom = valeurs['nom_boutique'] or (f"Free {ville}" if ville else '')
+    if not nom or not adresse:
+        raise ValueError("nom de boutique et adresse obligatoires")
+    latitude = _decimal_champ(Boutique, 'latitude', valeurs['latitude'])
+    longitude = _decimal_champ(Boutique, 'longitude', valeurs['longitude'])
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("coordonnées GPS invalides")
+    return {
+        'nom_boutique': _texte_champ(Boutique, 'nom_boutique', nom),
+        'adresse': adresse,
+        'ville': _texte_champ(Boutique, 'ville', ville),
+        'code_postal': _texte_champ(Boutique, 'code_postal', valeurs['code_postal']),
+        'departement': _texte_champ(Boutique, 'departement', valeurs['departement'] or extraits.get('departement') or ''),
+        'latitude': latitude,
+        'longitude': longitude,
+        'geohash': encoder_geohash(float(latitude), float(longitude)),
+    }
+
+
+def importer_boutiques(chemin, taille_lot=TAILLE_LOT):
+    """
+    Importe les boutiques d'un CSV (format de l'application ou CSV des boutiques Free).
+    Une boutique est identifiée par (nom, adresse) ; une boutique déjà présente voit sa
+    localisation mise à jour.
+    """
+    rapport = Rapport('Boutiques')
+    debut = time.perf_counter()
+    champs_modifiables = ['ville', 'code_postal', 'departement', 'latitude', 'longitude', 'geohash']
+    existants = {
+        (nom, adresse): (boutique_id, tuple(valeurs))
+        for boutique_id, nom, adresse, *valeurs in Boutique.objects.values_list(
+            'boutique_id', 'nom_boutique', 'adresse', *champs_modifiables
+        ).iterator()
+    }
+
+    for lot in _lire_lots(chemin, COLONNES_BOUTIQUE, taille_lot):
+        rapport.lues += len(lot)
+        nouvelles, modifiees = {}, {}
+        for numero, valeurs in lot:
+            try:
+                champs = _valeurs_boutique(valeurs)
+            except ValueError as erreur:
+                rapport.rejeter(numero, erreur)
+                continue
+            cle = (champs['nom_boutique'], champs['adresse'])
+            localisation = tuple(champs[champ] for champ in champs_modifiables)
+            if cle in existants:
+                boutique_id, localisation_actuelle = existants[cle]
+                if localisation == localisation_actuelle:
+                    continue
+                existants[cle] = (boutique_id, localisation)
+                modifiees[cle] = Boutique(boutique_id=boutique_id, **champs)
+            else:
+                nouvelles[cle] = Boutique(**champs)
+
+        with transaction.atomic():
+            Boutique.objects.bulk_create(
+                [*nouvelles.values(), *modifiees.values()], batch_size=1000,
+                update_conflicts=True, unique_fields=['boutique_id'], update_fields=champs_modifiables + ['date_maj'],
+            )
+        existants.update(
+            (cle, (boutique.boutique_id, tuple(getattr(boutique, champ) for champ in champs_modifiables)))
+            for cle, boutique in nouvelles.items()
+        )
+        rapport.creees += len(nouvelles)
+        rapport.mises_a_jour += len(modifiees)
+
+    invalider_groupes('boutiques', 'produits')
+    rapport.duree = time.perf_counter() - debut
+    return rapport
+
+
+def importer_stocks(chemin, utilisateur=None, taille_lot=TAILLE_LOT):
+    """
+    Importe les quantités en stock (colonnes boutique_id, produit_id, quantite).
+    Upsert sur la contrainte unique (boutique, produit), avec un mouvement IMPORT par
+    quantité modifiée et les alertes de stock faible des stocks existants.
+    """
+    rapport = Rapport('Stocks')
+    debut = time.perf_counter()
+    boutiques = set(Boutique.objects.values_list('boutique_id', flat=True))
+    produits = set(Produit.objects.values_list('produit_id', flat=True).iterator())
+
+    for lot in _lire_lots(chemin, COLONNES_STOCK, taille_lot):
+        rapport.lues += len(lot)
+        quantites = {}
+        for numero, valeurs in lot:
+            try:
+                boutique_id, produit_id, quantite = (
+                    int(valeurs['boutique_id']), int(valeurs['produit_id']), int(valeurs['quantite'])
+                )
+            except ValueError:
+                rapport.rejeter(numero, "boutique_id, produit_id et quantite doivent être entiers")
+                continue
+            if quantite < 0 or boutique_id not in boutiques or produit_id not in produits:
+                rapport.rejeter(numero, "quantité négative, boutique ou produit inconnu")
+                continue
+            quantites[(boutique_id, produit_id)] = quantite
+
+        with transaction.atomic():
+            avant = {
+                (boutique_id, produit_id): (quantite, seuil)
+                for boutique_id, produit_id, quantite, seuil in Stock.objects.filter(
+                    boutique_id__in={boutique_id for boutique_id, _ in quantites},
+                    produit_id__in={produit_id for _, produit_id in quantites},
+                ).values_list('boutique_id', 'produit_id', 'quantite', 'seuil_alerte')
+            }
+            stocks = [
+                Stock(boutique_id=boutique_id, produit_id=produit_id, quantite=quantite)
+                for (boutique_id, produit_id), quantite in quantites.items()
+                if (boutique_id, produit_id) not in avant or avant[(boutique_id, produit_id)][0] != quantite
+            ]
+            Stock.objects.bulk_create(
+                stocks, batch_size=1000,
+                update_conflicts=True, unique_fields=['boutique', 'produit'], update_fields=['quantite'],
+            )
+            modifies = []
+            for stock in stocks:
+                _, seuil = avant.get((stock.boutique_id, stock.produit_id), (0, None))
+                if seuil is not None:
+                    stock.seuil_alerte = seuil
+                    modifies.append(stock)
+            MouvementStock.objects.bulk_create([
+                MouvementStock.depuis_stock(
+                    stock, avant.get((stock.boutique_id, stock.produit_id), (0,))[0], stock.quantite, 'IMPORT', utilisateur
+                )
+                for stock in stocks
+            ], batch_size=1000)
+            # Alertes uniquement pour les stocks existants, comme le signal post_save
+            enfiler_alertes(modifies)
+
+        rapport.creees += len(stocks) - len(modifies)
+        rapport.mises_a_jour += len(modifies)
+
+    invalider_groupes('produits')
+    rapport.duree = time.perf_counter() - debut
+    return rapport
@@ -0,0 +1,35 @@
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from boutique.bench import SCENARIOS, executer_bench
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit et les latences p50 / p95 / p99 des principaux endpoints (données de seed_bench)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=SCENARIOS)
+        parser.add_argument('--requetes', type=int, default=200, help='Requêtes mesurées par scénario')
+        parser.add_argument('--concurrence', type=int, default=8, help='Nombre de clients simultanés')
+        parser.add_argument('--echauffement', type=int, default=20, help='Requêtes non mesurées avant chaque scénario')
+        parser.add_argument('--sortie', help='Fichier JSON où écrire le rapport (à comparer entre deux commits)')
+
+    def handle(self, *args, **options):
+        try:
+            rapport = executer_bench(
+                options['scenarios'], options['requetes'], options['concurrence'], options['echauffement']
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"{'scenario':<18} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL':>5} {'erreurs':>8}")
+        for scenario, r in rapport['resultats'].items():
+            self.stdout.write(
+                f"{scenario:<18} {r['req_par_s']:>8} {r['p50_ms']!s:>8} {r['p95_ms']!s:>8} "
+                f"{r['p99_ms']!s:>8} {r['sql_par_requete']!s:>5} {r['erreurs']:>8}"
+            )
+        if options['sortie']:
+            # Clés triées et indentation fixe : deux rapports se comparent avec diff
+            Path(options['sortie']).write_text(json.dumps(rapport, indent=2, sort_keys=True) + '\n')
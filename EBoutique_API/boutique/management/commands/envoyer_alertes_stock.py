@@ -0,0 +1,32 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from boutique.alertes import envoyer_alertes
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Envoie les alertes de stock faible en attente (un récapitulatif par gestionnaire)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true', help='Tourner en continu comme worker')
+        parser.add_argument('--intervalle', type=int, default=60, help='Secondes entre deux passages en mode boucle')
+        parser.add_argument('--limite', type=int, default=500, help="Nombre maximum d'alertes traitées par passage")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                # Vider la file par paquets avant d'attendre le passage suivant
+                while traitees := envoyer_alertes(limite=options['limite']):
+                    self.stdout.write(f"{traitees} alerte(s) traitée(s)")
+            except Exception:
+                if not options['boucle']:
+                    raise
+                # SMTP ou base indisponible : les alertes restent en attente, nouvel essai au passage suivant
+                logger.exception("Échec de l'envoi des alertes de stock")
+            if not options['boucle']:
+                break
+            time.sleep(options['intervalle'])
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from boutique.images import images_du_dossier, images_en_attente, regenerer_variantes
+
+
+class Command(BaseCommand):
+    help = "Génère les images dérivées des produits (miniature et taille moyenne, JPEG et WebP)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tout', action='store_true', help='Régénérer toutes les images du dossier produits/')
+        parser.add_argument('--processus', type=int, help='Nombre de processus (défaut : nombre de cœurs)')
+
+    def handle(self, *args, **options):
+        # Par défaut : seulement les images sans variantes à jour (import, génération interrompue)
+        noms = images_du_dossier() if options['tout'] else images_en_attente()
+        traitees, erreurs = regenerer_variantes(noms, processus=options['processus'])
+        self.stdout.write(f"{traitees} image(s) traitée(s), {len(erreurs)} erreur(s)")
+        for erreur in erreurs:
+            self.stderr.write(f"  {erreur}")
@@ -0,0 +1,56 @@
+import statistics
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+
+from eboutique_config import schema
+
+
+class Command(BaseCommand):
+    help = "Écrit le schéma OpenAPI (JSON et YAML) dans SCHEMA_OPENAPI_DIR, à lancer au build"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dossier', default=settings.SCHEMA_OPENAPI_DIR, help='Dossier de sortie')
+        parser.add_argument('--bench', type=int, default=0, metavar='N',
+                            help='Mesurer N générations complètes et N réponses servies depuis le fichier')
+
+    def handle(self, *args, **options):
+        dossier = Path(options['dossier'])
+        dossier.mkdir(parents=True, exist_ok=True)
+        for format, (nom_fichier, _, _) in schema.FORMATS.items():
+            contenu = schema.generer_schema(format)
+            (dossier / nom_fichier).write_bytes(contenu)
+            self.stdout.write(f"{dossier / nom_fichier} ({len(contenu)} octets)")
+
+        if options['bench']:
+            self.bench(options['bench'], dossier)
+
+    def bench(self, iterations, dossier):
+        """
+        Compare la génération du schéma à chaque requête (ancien comportement) et le
+        service du fichier précalculé via la vue /swagger.json/.
+        """
+        def mesurer(fonction):
+            durees = []
+            for _ in range(iterations):
+                debut = time.perf_counter()
+                fonction()
+                durees.append((time.perf_counter() - debut) * 1000)
+            return statistics.median(durees), max(durees)
+
+        avant = mesurer(lambda: schema.generer_schema('.json'))
+
+        settings.SCHEMA_OPENAPI_DIR = str(dossier)
+        schema._schemas.clear()
+        client = Client(HTTP_HOST='localhost')
+        client.get('/swagger.json/')  # Lecture du fichier, une fois par processus
+        apres = mesurer(lambda: client.get('/swagger.json/'))
+        etag = client.get('/swagger.json/')['ETag']
+        revalidation = mesurer(lambda: client.get('/swagger.json/', HTTP_IF_NONE_MATCH=etag))
+
+        self.stdout.write(f"Génération complète      : médiane {avant[0]:.1f} ms, max {avant[1]:.1f} ms")
+        self.stdout.write(f"Fichier précalculé (200) : médiane {apres[0]:.1f} ms, max {apres[1]:.1f} ms")
+        self.stdout.write(f"Revalidation ETag (304)  : médiane {revalidation[0]:.1f} ms, max {revalidation[1]:.1f} ms")
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from boutique.importation import TAILLE_LOT, importer_boutiques, importer_produits, importer_stocks
+
+
+class Command(BaseCommand):
+    help = "Importe en masse le catalogue depuis des CSV (produits Flipkart, boutiques Free, stocks)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--produits', help='CSV des produits (marque/brand, modele/model, couleur, capacite, ram, prix, image)')
+        parser.add_argument('--boutiques', help='CSV des boutiques (nom_boutique, adresse, ville, code_postal, latitude, longitude ou shopDescription)')
+        parser.add_argument('--stocks', help='CSV des stocks (boutique_id, produit_id, quantite)')
+        parser.add_argument('--utilisateur', help="Nom de l'utilisateur auteur des produits (défaut : premier superutilisateur)")
+        parser.add_argument('--non-valides', action='store_true', help='Créer les produits en attente de validation')
+        parser.add_argument('--taille-lot', type=int, default=TAILLE_LOT, help='Nombre de lignes lues et écrites par transaction')
+
+    def handle(self, *args, **options):
+        if not (options['produits'] or options['boutiques'] or options['stocks']):
+            raise CommandError("Indiquer au moins un fichier : --produits, --boutiques ou --stocks")
+
+        utilisateur = self.utilisateur(options['utilisateur'])
+        # Boutiques et produits d'abord : les stocks les référencent
+        if options['boutiques']:
+            self.afficher(importer_boutiques(options['boutiques'], taille_lot=options['taille_lot']))
+        if options['produits']:
+            if utilisateur is None:
+                raise CommandError("Aucun utilisateur pour les produits : créer un superutilisateur ou utiliser --utilisateur")
+            self.afficher(importer_produits(
+                options['produits'], utilisateur, taille_lot=options['taille_lot'], valides=not options['non_valides']
+            ))
+        if options['stocks']:
+            self.afficher(importer_stocks(options['stocks'], utilisateur, taille_lot=options['taille_lot']))
+
+    def utilisateur(self, nom):
+        if nom:
+            try:
+                return User.objects.get(username=nom)
+            except User.DoesNotExist:
+                raise CommandError(f"Utilisateur inconnu : {nom}")
+        return User.objects.filter(is_superuser=True).order_by('pk').first()
+
+    def afficher(self, rapport):
+        self.stdout.write(str(rapport))
+        for erreur in rapport.erreurs:
+            self.stderr.write(f"  {erreur}")
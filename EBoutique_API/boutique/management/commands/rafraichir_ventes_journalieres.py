@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from boutique.statistiques import rafraichir_ventes_journalieres
+
+
+class Command(BaseCommand):
+    help = "Agrège les ventes des journées terminées dans VenteJournaliere (à lancer chaque nuit)"
+
+    def handle(self, *args, **options):
+        lignes = rafraichir_ventes_journalieres()
+        self.stdout.write(f"{lignes} ligne(s) d'agrégat créée(s)")
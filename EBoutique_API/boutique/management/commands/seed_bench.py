@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from boutique.bench import generer_donnees, purger_donnees
+
+
+class Command(BaseCommand):
+    help = "Génère un jeu de données synthétique reproductible pour le banc d'essai (manage.py bench)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boutiques', type=int, default=20, help='Nombre de boutiques')
+        parser.add_argument('--produits', type=int, default=2000, help='Nombre de produits')
+        parser.add_argument('--ventes', type=int, help="Lignes d'historique des ventes (défaut : 2 par produit)")
+        parser.add_argument('--stocks-par-produit', type=int, default=3, help='Boutiques ayant chaque produit en stock')
+        parser.add_argument('--graine', type=int, default=0, help='Graine du générateur aléatoire')
+        parser.add_argument('--purger', action='store_true', help='Supprimer les données générées précédemment')
+
+    def handle(self, *args, **options):
+        if options['boutiques'] < 1 or options['produits'] < 0:
+            raise CommandError("Il faut au moins une boutique et un nombre de produits positif")
+        if options['ventes'] and (options['produits'] < 1 or options['stocks_par_produit'] < 1):
+            # Vérifié avant --purger : des paramètres invalides ne suppriment rien
+            raise CommandError("Des ventes demandent au moins un produit en stock (--produits et --stocks-par-produit)")
+        if options['purger']:
+            self.stdout.write(f"{purger_donnees()} lignes supprimées")
+        try:
+            bilan = generer_donnees(
+                options['boutiques'], options['produits'], ventes=options['ventes'],
+                stocks_par_produit=options['stocks_par_produit'], graine=options['graine'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(', '.join(f"{nombre} {table}" for table, nombre in bilan.items()) + ' créés')
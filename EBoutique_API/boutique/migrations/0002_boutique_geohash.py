@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+from boutique.geo import encoder_geohash
+
+
+def remplir_geohash(apps, schema_editor):
+    """
+    Calcule le geohash des boutiques existantes.
+    """
+    Boutique = apps.get_model('boutique', 'Boutique')
+    boutiques = []
+    for boutique in Boutique.objects.exclude(latitude=None).exclude(longitude=None).iterator():
+        boutique.geohash = encoder_geohash(float(boutique.latitude), float(boutique.longitude))
+        boutiques.append(boutique)
+    Boutique.objects.bulk_update(boutiques, ['geohash'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='boutique',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=12),
+        ),
+        migrations.RunPython(remplir_geohash, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0002_boutique_geohash'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='stock',
+            constraint=models.CheckConstraint(condition=models.Q(('quantite__gte', 0)), name='stock_quantite_positive'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0003_stock_quantite_positive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlerteStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantite', models.IntegerField()),
+                ('seuil_alerte', models.PositiveIntegerField()),
+                ('statut', models.CharField(choices=[('EN_ATTENTE', "En attente d'envoi"), ('ENVOYEE', 'Envoyée'), ('IGNOREE', 'Ignorée (stock réapprovisionné ou aucun destinataire)')], default='EN_ATTENTE', max_length=20)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+                ('date_envoi', models.DateTimeField(blank=True, null=True)),
+                ('boutique', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes_stock', to='boutique.boutique')),
+                ('produit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertes_stock', to='boutique.produit')),
+            ],
+            options={
+                'db_table': 'tb_alerte_stock',
+                'indexes': [models.Index(fields=['boutique', 'produit', 'date_creation'], name='alerte_stock_dedup_idx'), models.Index(fields=['statut', 'date_creation'], name='alerte_stock_statut_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-18 09:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0004_alertestock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouvementStock',
+            fields=[
+                ('mouvement_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('quantite_avant', models.IntegerField()),
+                ('quantite_apres', models.IntegerField()),
+                ('variation', models.IntegerField()),
+                ('source', models.CharField(choices=[('VENTE', 'Vente'), ('STOCK', 'Mise à jour du stock'), ('PRODUIT', 'Création ou mise à jour du produit'), ('ADMIN', 'Administration')], max_length=20)),
+                ('date_mouvement', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('boutique', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='mouvements_stock', to='boutique.boutique')),
+                ('produit', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='mouvements_stock', to='boutique.produit')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='mouvements_stock', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'tb_mouvement_stock',
+                'ordering': ['date_mouvement', 'mouvement_id'],
+                'indexes': [models.Index(fields=['boutique', 'produit', 'date_mouvement'], name='mouvement_stock_bp_date_idx'), models.Index(fields=['produit', 'date_mouvement'], name='mouvement_stock_p_date_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2 on 2026-10-18 09:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0005_mouvementstock'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsolidationVentes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('derniere_date', models.DateField(null=True)),
+            ],
+            options={
+                'db_table': 'tb_consolidation_ventes',
+            },
+        ),
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('original_id', models.IntegerField()),
+                ('nom_produit', models.CharField(max_length=100)),
+                ('marque', models.CharField(max_length=50)),
+                ('modele', models.CharField(max_length=50)),
+                ('quantite', models.IntegerField()),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, max_digits=14)),
+                ('nb_ventes', models.IntegerField()),
+            ],
+            options={
+                'db_table': 'tb_vente_journaliere',
+            },
+        ),
+        migrations.AddField(
+            model_name='historiqueventes',
+            name='boutique',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventes', to='boutique.boutique'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueventes',
+            index=models.Index(fields=['date_vente', 'id'], name='historique_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueventes',
+            index=models.Index(fields=['boutique', 'date_vente'], name='historique_boutique_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueventes',
+            index=models.Index(fields=['vendu_par', 'date_vente'], name='historique_vendeur_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueventes',
+            index=models.Index(fields=['original_id', 'date_vente'], name='historique_produit_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='ventejournaliere',
+            name='boutique',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='boutique.boutique'),
+        ),
+        migrations.AddField(
+            model_name='ventejournaliere',
+            name='vendu_par',
+            field=models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='ventejournaliere',
+            index=models.Index(fields=['date'], name='vente_jour_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ventejournaliere',
+            index=models.Index(fields=['boutique', 'date'], name='vente_jour_boutique_date_idx'),
+        ),
+    ]
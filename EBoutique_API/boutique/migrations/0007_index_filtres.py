@@ -0,0 +1,52 @@
+# Generated by Django 5.2 on 2026-10-18 09:38
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0006_statistiques_ventes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedboutique',
+            index=models.Index(django.db.models.functions.text.Upper('ville'), name='archive_boutique_ville_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedproduit',
+            index=models.Index(django.db.models.functions.text.Upper('marque'), name='archive_produit_marque_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boutique',
+            index=models.Index(django.db.models.functions.text.Upper('ville'), name='boutique_ville_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='boutique',
+            index=models.Index(fields=['code_postal'], name='boutique_code_postal_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='boutique',
+            index=models.Index(django.db.models.functions.text.Upper('departement'), name='boutique_departement_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['prix'], name='produit_prix_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(django.db.models.functions.text.Upper('couleur'), name='produit_couleur_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='produit',
+            index=models.Index(fields=['capacite', 'ram'], name='produit_capacite_ram_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stock',
+            index=models.Index(fields=['produit', 'quantite'], name='stock_produit_quantite_idx'),
+        ),
+    ]
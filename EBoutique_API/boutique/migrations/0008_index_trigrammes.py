@@ -0,0 +1,36 @@
+from django.db import migrations
+
+# Index de trigrammes pour la recherche du catalogue (PostgreSQL uniquement)
+INDEX_TRIGRAMMES = [
+    ('produit_nom_trgm_idx', 'tb_produit', 'nom_produit'),
+    ('modele_modele_trgm_idx', 'tb_modele', 'modele'),
+    ('marque_marque_trgm_idx', 'tb_marque', 'marque'),
+]
+
+
+def creer_index_trigrammes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nom, table, colonne in INDEX_TRIGRAMMES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {nom} ON {table} USING gin ({colonne} gin_trgm_ops)'
+        )
+
+
+def supprimer_index_trigrammes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nom, _, _ in INDEX_TRIGRAMMES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {nom}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0007_index_filtres'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index_trigrammes, supprimer_index_trigrammes),
+    ]
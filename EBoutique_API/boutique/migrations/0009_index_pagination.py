@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-18 09:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0008_index_trigrammes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedproduit',
+            index=models.Index(fields=['date_archivage', 'id'], name='archive_produit_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='demandesuppressionproduit',
+            index=models.Index(fields=['date_demande', 'id'], name='demande_suppression_date_idx'),
+        ),
+    ]
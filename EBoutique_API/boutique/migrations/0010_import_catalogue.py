@@ -0,0 +1,41 @@
+from django.db import migrations, models
+
+
+def fusionner_modeles_doublons(apps, schema_editor):
+    """
+    Regroupe les modèles de même nom d'une même marque sur le plus ancien
+    avant d'ajouter la contrainte d'unicité.
+    """
+    Modele = apps.get_model('boutique', 'Modele')
+    Produit = apps.get_model('boutique', 'Produit')
+    conserves = {}
+    doublons = {}
+    for modele_id, marque_id, nom in Modele.objects.order_by('modele_id').values_list('modele_id', 'marque_id', 'modele'):
+        cle = (marque_id, nom)
+        if cle in conserves:
+            doublons[modele_id] = conserves[cle]
+        else:
+            conserves[cle] = modele_id
+    for doublon, conserve in doublons.items():
+        Produit.objects.filter(modele_id=doublon).update(modele_id=conserve)
+    Modele.objects.filter(modele_id__in=doublons).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0009_index_pagination'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionner_modeles_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='modele',
+            constraint=models.UniqueConstraint(fields=['marque', 'modele'], name='modele_unique_par_marque'),
+        ),
+        migrations.AlterField(
+            model_name='mouvementstock',
+            name='source',
+            field=models.CharField(choices=[('VENTE', 'Vente'), ('STOCK', 'Mise à jour du stock'), ('PRODUIT', 'Création ou mise à jour du produit'), ('ADMIN', 'Administration'), ('IMPORT', 'Import du catalogue')], max_length=20),
+        ),
+    ]
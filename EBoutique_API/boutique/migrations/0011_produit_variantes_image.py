@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0010_import_catalogue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produit',
+            name='variantes_image',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
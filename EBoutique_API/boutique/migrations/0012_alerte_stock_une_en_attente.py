@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+def ignorer_alertes_doublons(apps, schema_editor):
+    """
+    Ne garde en attente que l'alerte la plus ancienne de chaque couple
+    (boutique, produit) avant d'ajouter la contrainte d'unicité.
+    """
+    AlerteStock = apps.get_model('boutique', 'AlerteStock')
+    vus = set()
+    doublons = []
+    en_attente = AlerteStock.objects.filter(statut='EN_ATTENTE').order_by('pk')
+    for alerte_id, boutique_id, produit_id in en_attente.values_list('pk', 'boutique_id', 'produit_id'):
+        cle = (boutique_id, produit_id)
+        if cle in vus:
+            doublons.append(alerte_id)
+        else:
+            vus.add(cle)
+    AlerteStock.objects.filter(pk__in=doublons).update(statut='IGNOREE')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('boutique', '0011_produit_variantes_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(ignorer_alertes_doublons, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='alertestock',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut', 'EN_ATTENTE')), fields=('boutique', 'produit'), name='alerte_stock_une_en_attente'),
+        ),
+    ]
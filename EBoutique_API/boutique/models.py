@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator
+from django.db.models.functions import Upper
+
+from .geo import encoder_geohash
 
 # ============================================================================
 # Modèles de base pour la gestion des produits
@@ -31,6 +34,10 @@ class Modele(models.Model):
 
     class Meta:
         db_table = 'tb_modele'  # Nom personnalisé de la table
+        constraints = [
+            # Clé naturelle utilisée par l'import du catalogue (bulk_create avec update_conflicts)
+            models.UniqueConstraint(fields=['marque', 'modele'], name='modele_unique_par_marque'),
+        ]
 
     def __str__(self):
         return f"{self.marque} - {self.modele}"
@@ -52,6 +59,7 @@ class Boutique(models.Model):
     departement = models.CharField(max_length=50, blank=True, null=False)  # Département
     longitude = models.DecimalField(max_digits=12, decimal_places=9, blank=True, null=False)  # Coordonnée GPS
     latitude = models.DecimalField(max_digits=12, decimal_places=9, blank=True, null=False)  # Coordonnée GPS
+    geohash = models.CharField(max_length=12, blank=True, default='', db_index=True, editable=False)  # Cellule géographique pour la recherche de proximité
     num_telephone = models.CharField(max_length=20, blank=True, null=True, unique=True)  # Numéro de téléphone unique
     email = models.EmailField(blank=True, null=True, unique=True)  # Email unique
     responsable = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='boutiques_responsable')  # Responsable principal
@@ -61,10 +69,26 @@ class Boutique(models.Model):
 
     class Meta:
         db_table = 'tb_boutique'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(Upper('ville'), name='boutique_ville_idx'),  # Filtre ville (insensible à la casse)
+            models.Index(fields=['code_postal'], name='boutique_code_postal_idx', opclasses=['varchar_pattern_ops']),  # Égalité et préfixe
+            models.Index(Upper('departement'), name='boutique_departement_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom_boutique} - {self.ville} ({self.code_postal})"
 
+    def save(self, *args, **kwargs):
+        """
+        Recalcule le geohash à partir des coordonnées GPS avant l'enregistrement.
+        """
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encoder_geohash(float(self.latitude), float(self.longitude))
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+
 class Produit(models.Model):
     """
     Modèle représentant un produit (téléphone) en vente.
@@ -79,10 +103,16 @@ class Produit(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='produits')  # Utilisateur ayant ajouté le produit
     ram = models.DecimalField(max_digits=10, decimal_places=2)  # Quantité de RAM
     image = models.ImageField(upload_to='produits/', null=True, blank=True)  # Image du produit (optionnelle)
+    variantes_image = models.JSONField(default=dict, blank=True, editable=False)  # Images dérivées (voir images.py)
     validation_responsable = models.BooleanField(default=False)  # Validation du responsable de la boutique
 
     class Meta:
         db_table = 'tb_produit'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(fields=['prix'], name='produit_prix_idx'),  # Fourchette de prix
+            models.Index(Upper('couleur'), name='produit_couleur_idx'),
+            models.Index(fields=['capacite', 'ram'], name='produit_capacite_ram_idx'),
+        ]
 
     def __str__(self):
         return f"{self.nom_produit} ({self.modele})"
@@ -104,12 +134,119 @@ class Stock(models.Model):
             models.UniqueConstraint(
                 fields=['boutique', 'produit'],
                 name='stock_composite_key'  # Clé composite unique pour éviter les doublons
+            ),
+            models.CheckConstraint(
+                condition=models.Q(quantite__gte=0),
+                name='stock_quantite_positive'  # La base refuse toute quantité négative
             )
         ]
+        indexes = [
+            models.Index(fields=['produit', 'quantite'], name='stock_produit_quantite_idx'),  # Disponibilité d'un produit
+        ]
 
     def __str__(self):
         return f"{self.produit} @ {self.boutique} - {self.quantite} en stock"
 
+class MouvementStock(models.Model):
+    """
+    Journal (en ajout seul) des mouvements de stock.
+    Chaque ligne conserve la quantité avant et après le mouvement : la quantité d'un stock
+    à une date donnée est celle du dernier mouvement antérieur, sans rejouer le journal.
+    Les clés étrangères n'ont pas de contrainte en base pour conserver l'historique
+    des boutiques et produits supprimés.
+    """
+    SOURCE_CHOICES = [
+        ('VENTE', 'Vente'),
+        ('STOCK', 'Mise à jour du stock'),
+        ('PRODUIT', 'Création ou mise à jour du produit'),
+        ('ADMIN', 'Administration'),
+        ('IMPORT', 'Import du catalogue'),
+    ]
+    mouvement_id = models.BigAutoField(primary_key=True)  # Identifiant unique du mouvement
+    boutique = models.ForeignKey(Boutique, on_delete=models.DO_NOTHING, db_constraint=False, related_name='mouvements_stock')  # Boutique concernée
+    produit = models.ForeignKey(Produit, on_delete=models.DO_NOTHING, db_constraint=False, related_name='mouvements_stock')  # Produit concerné
+    quantite_avant = models.IntegerField()  # Quantité avant le mouvement
+    quantite_apres = models.IntegerField()  # Quantité après le mouvement
+    variation = models.IntegerField()  # Différence (positive pour une entrée, négative pour une sortie)
+    source = models.CharField(max_length=20, choices=SOURCE_CHOICES)  # Chemin d'écriture à l'origine du mouvement
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='mouvements_stock')  # Auteur du mouvement
+    date_mouvement = models.DateTimeField(auto_now_add=True, db_index=True)  # Date du mouvement
+
+    class Meta:
+        db_table = 'tb_mouvement_stock'  # Nom personnalisé de la table
+        ordering = ['date_mouvement', 'mouvement_id']
+        indexes = [
+            models.Index(fields=['boutique', 'produit', 'date_mouvement'], name='mouvement_stock_bp_date_idx'),
+            models.Index(fields=['produit', 'date_mouvement'], name='mouvement_stock_p_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.type_mouvement}: {self.produit_id} @ {self.boutique_id} ({self.quantite_avant} -> {self.quantite_apres})"
+
+    @property
+    def type_mouvement(self):
+        return 'ENTREE' if self.variation > 0 else 'SORTIE'
+
+    @classmethod
+    def depuis_stock(cls, stock, quantite_avant, quantite_apres, source, utilisateur=None):
+        """
+        Prépare (sans l'enregistrer) le mouvement d'un stock à partir des quantités connues.
+        """
+        return cls(
+            boutique_id=stock.boutique_id,
+            produit_id=stock.produit_id,
+            quantite_avant=quantite_avant,
+            quantite_apres=quantite_apres,
+            variation=quantite_apres - quantite_avant,
+            source=source,
+            utilisateur=utilisateur if utilisateur is not None and utilisateur.is_authenticated else None,
+        )
+
+    @classmethod
+    def quantite_a(cls, boutique_id, produit_id, date):
+        """
+        Quantité en stock d'un produit dans une boutique à une date donnée (None si inconnue).
+        Une seule lecture d'index sur (boutique, produit, date_mouvement).
+        """
+        return cls.objects.filter(
+            boutique_id=boutique_id, produit_id=produit_id, date_mouvement__lte=date
+        ).order_by('-date_mouvement', '-mouvement_id').values_list('quantite_apres', flat=True).first()
+
+class AlerteStock(models.Model):
+    """
+    File d'attente (outbox) des alertes de stock faible.
+    Les alertes sont enregistrées dans la même transaction que la modification du stock,
+    puis envoyées par lot par la commande envoyer_alertes_stock.
+    """
+    STATUT_CHOICES = [
+        ('EN_ATTENTE', "En attente d'envoi"),
+        ('ENVOYEE', 'Envoyée'),
+        ('IGNOREE', 'Ignorée (stock réapprovisionné ou aucun destinataire)'),
+    ]
+    boutique = models.ForeignKey(Boutique, on_delete=models.CASCADE, related_name='alertes_stock')  # Boutique concernée
+    produit = models.ForeignKey(Produit, on_delete=models.CASCADE, related_name='alertes_stock')  # Produit concerné
+    quantite = models.IntegerField()  # Quantité au moment de l'alerte
+    seuil_alerte = models.PositiveIntegerField()  # Seuil du stock au moment de l'alerte
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='EN_ATTENTE')
+    date_creation = models.DateTimeField(auto_now_add=True)  # Date de l'alerte
+    date_envoi = models.DateTimeField(null=True, blank=True)  # Date de traitement par le worker
+
+    class Meta:
+        db_table = 'tb_alerte_stock'  # Nom personnalisé de la table
+        constraints = [
+            models.UniqueConstraint(
+                fields=['boutique', 'produit'], condition=models.Q(statut='EN_ATTENTE'),
+                name='alerte_stock_une_en_attente'  # Deux ventes simultanées ne peuvent pas mettre deux alertes en file
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['boutique', 'produit', 'date_creation'], name='alerte_stock_dedup_idx'),  # Déduplication
+            models.Index(fields=['statut', 'date_creation'], name='alerte_stock_statut_idx'),  # File d'attente du worker
+        ]
+
+    def __str__(self):
+        return f"Alerte: {self.produit} @ {self.boutique} ({self.quantite}/{self.seuil_alerte})"
+
 # ============================================================================
 # Modèles d'archivage pour la traçabilité et l'historique des ventes
 # ============================================================================
@@ -130,14 +267,83 @@ class HistoriqueVentes(models.Model):
     date_vente = models.DateTimeField(auto_now_add=True)  # Date automatique d'archivage
     quantite_vendue = models.IntegerField(validators=[MinValueValidator(0)], default=0)  # Quantité vendue
     vendu_par = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='historique_produits')  # Utilisateur ayant archivé
+    boutique = models.ForeignKey(Boutique, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventes')  # Boutique de la vente
     description = models.TextField()  # ajouter un texte 
 
     class Meta:
         db_table = 'tb_historique_ventes'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(fields=['date_vente', 'id'], name='historique_date_idx'),
+            models.Index(fields=['boutique', 'date_vente'], name='historique_boutique_date_idx'),
+            models.Index(fields=['vendu_par', 'date_vente'], name='historique_vendeur_date_idx'),
+            models.Index(fields=['original_id', 'date_vente'], name='historique_produit_date_idx'),
+        ]
 
     def __str__(self):
         return f"Archive: {self.nom_produit} (ID original: {self.original_id})"
 
+    @classmethod
+    def depuis_stock(cls, stock, quantite_vendue, vendu_par):
+        """
+        Prépare (sans l'enregistrer) la ligne d'historique d'une vente à partir du stock.
+        Le stock doit être chargé avec select_related('produit__modele__marque').
+        """
+        produit = stock.produit
+        return cls(
+            original_id=produit.produit_id,
+            nom_produit=produit.nom_produit,
+            marque=produit.modele.marque.marque,
+            modele=produit.modele.modele,
+            prix=produit.prix,
+            couleur=produit.couleur,
+            capacite=produit.capacite,
+            ram=produit.ram,
+            vendu_par=vendu_par,
+            boutique_id=stock.boutique_id,
+            quantite_vendue=quantite_vendue,
+            description="Produit vendu et archivé"
+        )
+
+class VenteJournaliere(models.Model):
+    """
+    Agrégat journalier des ventes (une ligne par jour, boutique, produit et vendeur).
+    Alimenté de façon incrémentale à partir de HistoriqueVentes pour les journées terminées,
+    il évite de parcourir tout l'historique pour les statistiques.
+    """
+    date = models.DateField()  # Journée agrégée
+    boutique = models.ForeignKey(Boutique, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')  # Boutique de la vente
+    original_id = models.IntegerField()  # ID du produit vendu
+    nom_produit = models.CharField(max_length=100)  # Nom du produit
+    marque = models.CharField(max_length=50)  # Nom de la marque
+    modele = models.CharField(max_length=50)  # Nom du modèle
+    vendu_par = models.ForeignKey(User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')  # Vendeur
+    quantite = models.IntegerField()  # Unités vendues
+    chiffre_affaires = models.DecimalField(max_digits=14, decimal_places=2)  # Somme de prix x quantité
+    nb_ventes = models.IntegerField()  # Nombre de lignes de vente
+
+    class Meta:
+        db_table = 'tb_vente_journaliere'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(fields=['date'], name='vente_jour_date_idx'),
+            models.Index(fields=['boutique', 'date'], name='vente_jour_boutique_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} - {self.nom_produit} : {self.quantite} vendu(s)"
+
+class ConsolidationVentes(models.Model):
+    """
+    Dernière journée consolidée dans VenteJournaliere (une seule ligne).
+    La ligne est verrouillée pendant la consolidation pour éviter les doublons.
+    """
+    derniere_date = models.DateField(null=True)  # Dernière journée entièrement agrégée
+
+    class Meta:
+        db_table = 'tb_consolidation_ventes'  # Nom personnalisé de la table
+
+    def __str__(self):
+        return f"Ventes consolidées jusqu'au {self.derniere_date}"
+
 class ArchivedBoutique(models.Model):
     """
     Modèle pour archiver les boutiques supprimées.
@@ -157,6 +363,9 @@ class ArchivedBoutique(models.Model):
 
     class Meta:
         db_table = 'tb_archive_boutique'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(Upper('ville'), name='archive_boutique_ville_idx'),
+        ]
 
     def __str__(self):
         return f"Archive: {self.nom} (ID original: {self.original_id})"
@@ -180,6 +389,10 @@ class ArchivedProduit(models.Model):
 
     class Meta:
         db_table = 'tb_archive_produit'  # Nom personnalisé de la table
+        indexes = [
+            models.Index(Upper('marque'), name='archive_produit_marque_idx'),
+            models.Index(fields=['date_archivage', 'id'], name='archive_produit_date_idx'),
+        ]
 
     def __str__(self):
         return f"Archive: {self.nom_produit} (ID original: {self.original_id})"
@@ -213,6 +426,9 @@ class DemandeSuppressionProduit(models.Model):
     class Meta:
         db_table = 'tb_demande_suppression_produit'
         ordering = ['-date_demande']
+        indexes = [
+            models.Index(fields=['date_demande', 'id'], name='demande_suppression_date_idx'),
+        ]
 
     def __str__(self):
         return f"Demande de suppression de {self.produit} par {self.demandeur}"
\ No newline at end of file
@@ -0,0 +1,163 @@
+"""
+Pagination par curseur (keyset) des tables d'historique et d'archives.
+
+Contrairement à PageNumberPagination, chaque page est lue par un parcours de l'index
+(date, id) à partir de la dernière ligne de la page précédente : ni OFFSET, ni
+COUNT(*) obligatoire, et le coût d'une page ne dépend pas de sa position.
+"""
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class PaginationCurseur(BasePagination):
+    """
+    Pagination par curseur sur un couple de champs (date, id), du plus récent au plus ancien.
+
+    Paramètres de requête :
+    - cursor : curseur opaque renvoyé dans les liens next / previous
+    - page_size : taille de page choisie par le client (bornée par max_page_size)
+    - total=0 : ne pas calculer le nombre total de lignes (count vaut alors null)
+    """
+    ordering = ('-date', '-id')  # Redéfini par les sous-classes, le dernier champ doit être unique
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    total_query_param = 'total'
+
+    def get_page_size(self, request):
+        page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+        valeur = request.query_params.get(self.page_size_query_param)
+        if valeur:
+            try:
+                page_size = int(valeur)
+            except ValueError:
+                pass
+        return max(1, min(page_size, self.max_page_size))
+
+    def _champs(self):
+        return [champ.lstrip('-') for champ in self.ordering]
+
+    def encoder_curseur(self, objet, precedent):
+        """
+        Curseur opaque : valeurs des champs de tri de la ligne de bord et sens de lecture.
+        """
+        valeurs = [
+            self.modele._meta.get_field(champ).value_to_string(objet)
+            for champ in self._champs()
+        ]
+        donnees = json.dumps({'v': valeurs, 'p': precedent}, separators=(',', ':'))
+        curseur = base64.urlsafe_b64encode(donnees.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, curseur)
+
+    def decoder_curseur(self, request):
+        """
+        Retourne (valeurs, precedent) ou None si aucun curseur n'est fourni.
+        """
+        curseur = request.query_params.get(self.cursor_query_param)
+        if not curseur:
+            return None
+        try:
+            donnees = json.loads(base64.urlsafe_b64decode(curseur.encode()))
+            valeurs = [
+                self.modele._meta.get_field(champ).to_python(valeur)
+                for champ, valeur in zip(self._champs(), donnees['v'], strict=True)
+            ]
+            return valeurs, bool(donnees['p'])
+        except (ValueError, TypeError, KeyError, ValidationError):
+            raise NotFound('Curseur invalide')
+
+    def _apres(self, valeurs, ordering):
+        """
+        Condition keyset « strictement après la ligne (valeurs) » dans l'ordre donné :
+        (a > x) OR (a = x AND b > y) ..., servie par l'index composite.
+        """
+        condition = Q()
+        egalites = {}
+        for champ, valeur in zip(ordering, valeurs):
+            nom = champ.lstrip('-')
+            lookup = 'lt' if champ.startswith('-') else 'gt'
+            condition |= Q(**egalites, **{f'{nom}__{lookup}': valeur})
+            egalites[nom] = valeur
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.modele = queryset.model
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.total_query_param) != '0':
+            self.count = queryset.count()
+
+        curseur = self.decoder_curseur(request)
+        precedent = curseur is not None and curseur[1]
+        ordering = self.ordering
+        if precedent:
+            ordering = [champ[1:] if champ.startswith('-') else f'-{champ}' for champ in ordering]
+        if curseur is not None:
+            queryset = queryset.filter(self._apres(curseur[0], ordering))
+
+        # Une ligne de plus pour savoir s'il reste une page dans ce sens
+        lignes = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        encore = len(lignes) > self.page_size
+        lignes = lignes[:self.page_size]
+        if precedent:
+            lignes.reverse()
+            self.a_suivant, self.a_precedent = True, encore
+        else:
+            self.a_suivant, self.a_precedent = encore, curseur is not None
+        self.page = lignes
+        return lignes
+
+    def get_next_link(self):
+        if not self.a_suivant or not self.page:
+            return None
+        return self.encoder_curseur(self.page[-1], precedent=False)
+
+    def get_previous_link(self):
+        if not self.a_precedent:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encoder_curseur(self.page[0], precedent=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'nullable': True},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class PaginationVentes(PaginationCurseur):
+    ordering = ('-date_vente', '-id')
+
+
+class PaginationArchives(PaginationCurseur):
+    ordering = ('-date_archivage', '-id')
+
+
+class PaginationDemandesSuppression(PaginationCurseur):
+    ordering = ('-date_demande', '-id')
@@ -1,8 +1,132 @@
 from django.contrib.auth.mixins import UserPassesTestMixin
+from django.contrib.auth.models import User
+from django.db.models import CharField, IntegerField, Value
 from rest_framework import permissions
 
 from.models import Produit, Boutique
 
+# ============================================================================
+# Contexte de permissions calculé une fois par requête
+# ============================================================================
+class ContextePermissions:
+    """
+    Rôle de l'utilisateur et identifiants des boutiques dont il est responsable
+    ou gestionnaire. Les vérifications de permission se font par appartenance
+    à ces ensembles, sans recharger le profil ni les boutiques.
+    """
+    def __init__(self, user_id=None, role=None,
+                 boutiques_responsable=(), boutiques_gestionnaire=()):
+        self.user_id = user_id
+        self.role = role
+        self.boutiques_responsable = frozenset(boutiques_responsable)
+        self.boutiques_gestionnaire = frozenset(boutiques_gestionnaire)
+
+    @classmethod
+    def depuis_utilisateur(cls, user):
+        """
+        Charge le rôle et les deux ensembles de boutiques en une seule requête.
+        UNION ALL de trois lectures (une ligne par boutique) : une jointure sur les
+        deux relations retournerait responsable × gestionnaire lignes.
+        """
+        if not user.is_authenticated:
+            return cls()
+        role_ = User.objects.filter(pk=user.pk).values_list(
+            Value('ROLE'), 'profile__role', Value(None, output_field=IntegerField())
+        )
+        responsable_ = Boutique.objects.filter(responsable_id=user.pk).values_list(
+            Value('RESPONSABLE'), Value(None, output_field=CharField()), 'boutique_id'
+        )
+        gestionnaire_ = Boutique.gestionnaires.through.objects.filter(user_id=user.pk).values_list(
+            Value('GESTIONNAIRE'), Value(None, output_field=CharField()), 'boutique_id'
+        )
+        role, ensembles = None, {'RESPONSABLE': set(), 'GESTIONNAIRE': set()}
+        for origine, valeur, boutique_id in role_.union(responsable_, gestionnaire_, all=True):
+            if origine == 'ROLE':
+                role = valeur
+            else:
+                ensembles[origine].add(boutique_id)
+        return cls(user.pk, role, ensembles['RESPONSABLE'], ensembles['GESTIONNAIRE'])
+
+    @property
+    def boutiques_gerees(self):
+        """
+        Boutiques sur lesquelles l'utilisateur peut agir selon son rôle.
+        """
+        if self.role == 'RESPONSABLE':
+            return self.boutiques_responsable
+        if self.role == 'GESTIONNAIRE':
+            return self.boutiques_gestionnaire
+        return frozenset()
+
+    def gere(self, *boutique_ids):
+        """
+        Vrai si l'utilisateur peut agir sur au moins une des boutiques données.
+        """
+        return not self.boutiques_gerees.isdisjoint(boutique_ids)
+
+
+def contexte_permissions(request):
+    """
+    Retourne le contexte de permissions de la requête, calculé au premier appel
+    puis mémorisé sur la requête Django (partagé entre les permissions DRF et l'admin).
+    """
+    requete = getattr(request, '_request', request)
+    user = request.user
+    contexte = getattr(requete, '_contexte_permissions', None)
+    if contexte is None or contexte.user_id != user.pk:
+        contexte = ContextePermissions.depuis_utilisateur(user)
+        requete._contexte_permissions = contexte
+    return contexte
+
+
+class PorteeBoutiquesMixin:
+    """
+    Restreint en SQL le queryset d'un viewset aux boutiques de l'utilisateur :
+    - à la demande pour les lectures (?mine=1)
+    - toujours pour les actions d'écriture (hors superuser), avant même de charger l'objet
+    Les viewsets définissent ``filtrer_par_boutiques(queryset, boutique_ids)``.
+    """
+    parametre_portee = 'mine'
+    actions_ecriture = {'update', 'partial_update', 'destroy', 'vendre', 'vendre_lot', 'valider', 'annuler'}
+
+    def portee_demandee(self):
+        return self.request.query_params.get(self.parametre_portee) in ('1', 'true')
+
+    def boutiques_portee(self, contexte):
+        return contexte.boutiques_gerees
+
+    def filtrer_par_boutiques(self, queryset, boutique_ids):
+        return queryset.filter(boutique_id__in=boutique_ids)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset  # Génération du schéma OpenAPI, sans requête réelle
+        ecriture = self.action in self.actions_ecriture and not self.request.user.is_superuser
+        if not (ecriture or self.portee_demandee()):
+            return queryset
+        if not self.request.user.is_authenticated:
+            return queryset.none()
+        boutique_ids = self.boutiques_portee(contexte_permissions(self.request))
+        if not boutique_ids:
+            return queryset.none()
+        return self.filtrer_par_boutiques(queryset, boutique_ids)
+
+
+def boutiques_objet(obj):
+    """
+    Identifiants des boutiques auxquelles se rattache un objet (boutique, produit ou stock).
+    """
+    if isinstance(obj, Boutique):
+        return {obj.boutique_id}
+    if isinstance(obj, Produit):
+        # Les stocks sont préchargés par ProduitSerializer.optimiser_queryset
+        return {stock.boutique_id for stock in obj.stocks.all()}
+    if hasattr(obj, 'boutique_id'):
+        return {obj.boutique_id}
+    return set()
+
+
 class GestionnaireBoutiqueMixin(UserPassesTestMixin):
     def test_func(self):
         return (
@@ -34,10 +158,7 @@ class EstResponsableBoutique(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        if hasattr(request.user, 'profile'):
-            return request.user.profile.role == 'RESPONSABLE'
-            
-        return False
+        return contexte_permissions(request).role == 'RESPONSABLE'
 
     def has_object_permission(self, request, view, obj):
         # Permettre GET à tout le monde
@@ -51,13 +172,14 @@ class EstResponsableBoutique(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        # Si l'objet est une boutique
-        if hasattr(obj, 'responsable'):
-            return obj.responsable == request.user
-                    
-        # Si l'objet est un produit ou un stock
-        if hasattr(obj, 'boutique'):
-            return obj.boutique.responsable == request.user
+        # Boutique, produit ou stock : la boutique doit être l'une des siennes
+        boutiques = boutiques_objet(obj)
+        if boutiques:
+            return not contexte_permissions(request).boutiques_responsable.isdisjoint(boutiques)
+
+        # Autre objet rattaché directement à un responsable
+        if hasattr(obj, 'responsable_id'):
+            return obj.responsable_id == request.user.pk
             
         return False
 
@@ -73,10 +195,7 @@ class PeuModifierUserProfile(permissions.BasePermission):
         # Pour les autres méthodes, vérifier si c'est un gestionnaire
         if not request.user.is_authenticated:
             return False
-        try:
-            return request.user.profile.role == 'RESPONSABLE'
-        except:
-            return False
+        return contexte_permissions(request).role == 'RESPONSABLE'
 
     def has_object_permission(self, request, view, obj):
         # Permettre GET à tout le monde
@@ -85,13 +204,7 @@ class PeuModifierUserProfile(permissions.BasePermission):
         # Pour les autres méthodes, vérifier si c'est un gestionnaire de la boutique
         if not request.user.is_authenticated:
             return False
-        try:
-            if request.user.profile.role == 'RESPONSABLE':
-                return True
-            else:
-                return False
-        except:
-            return False
+        return contexte_permissions(request).role == 'RESPONSABLE'
 
 class EstGestionnaireOuResponsable(permissions.BasePermission):
     """
@@ -113,27 +226,17 @@ class EstGestionnaireOuResponsable(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        if not hasattr(request.user, 'profile'):
-            return False
-
-        role = request.user.profile.role
-        if role not in ['RESPONSABLE', 'GESTIONNAIRE']:
+        contexte = contexte_permissions(request)
+        if contexte.role not in ['RESPONSABLE', 'GESTIONNAIRE']:
             return False
 
         # Vérifier les permissions pour la création de produit
         if request.method == 'POST' and view.get_queryset().model == Produit:
-            boutique_id = request.data.get('boutique_id')
-            if not boutique_id:
-                return False
-
             try:
-                boutique = Boutique.objects.get(boutique_id=boutique_id)
-                if role == 'RESPONSABLE':
-                    return boutique.responsable == request.user
-                elif role == 'GESTIONNAIRE':
-                    return request.user in boutique.gestionnaires.all()
-            except Boutique.DoesNotExist:
+                boutique_id = int(request.data.get('boutique_id'))
+            except (TypeError, ValueError):
                 return False
+            return contexte.gere(boutique_id)
 
         return True
 
@@ -149,41 +252,5 @@ class EstGestionnaireOuResponsable(permissions.BasePermission):
         if request.user.is_superuser:
             return True
             
-        # Vérifier les permissions spécifiques selon le rôle
-        try:
-            role = request.user.profile.role
-            
-            # Si l'objet est un produit
-            if isinstance(obj, Produit):
-                # Récupérer les stocks du produit
-                stocks = obj.stocks.all()
-                if not stocks.exists():
-                    return False
-                
-                if role == 'RESPONSABLE':
-                    # Un responsable ne peut agir que sur les produits de sa boutique
-                    return any(stock.boutique.responsable == request.user for stock in stocks)
-                elif role == 'GESTIONNAIRE':
-                    # Un gestionnaire ne peut agir que sur les produits des boutiques où il travaille
-                    return any(request.user in stock.boutique.gestionnaires.all() for stock in stocks)
-                return False
-            
-            # Si l'objet est une boutique
-            if hasattr(obj, 'responsable'):
-                if role == 'RESPONSABLE':
-                    return obj.responsable == request.user
-                elif role == 'GESTIONNAIRE':
-                    return request.user in obj.gestionnaires.all()
-                return False
-            
-            # Si l'objet est un stock
-            if hasattr(obj, 'boutique'):
-                if role == 'RESPONSABLE':
-                    return obj.boutique.responsable == request.user
-                elif role == 'GESTIONNAIRE':
-                    return request.user in obj.boutique.gestionnaires.all()
-                return False
-            
-            return False
-        except:
-            return False
\ No newline at end of file
+        # Un responsable agit sur sa boutique, un gestionnaire sur les boutiques où il travaille
+        return contexte_permissions(request).gere(*boutiques_objet(obj))
@@ -0,0 +1,95 @@
+"""
+Lectures sur la base réplique (alias ``replica``, optionnel).
+
+Les viewsets qui héritent de LectureReplicaMixin exécutent leurs actions de lecture
+listées dans ``actions_replica`` (listes, archives, historique) sur la réplique.
+L'authentification et les permissions restent lues sur la base principale : un
+jeton révoqué ou un rôle retiré ne dépend pas du retard de réplication.
+
+Sans alias ``replica`` dans DATABASES, tout reste sur ``default``.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from rest_framework import permissions
+
+ALIAS_REPLICA = 'replica'
+
+_lecture_replica = ContextVar('lecture_replica', default=False)
+
+
+def replica_configuree():
+    return ALIAS_REPLICA in settings.DATABASES
+
+
+def lecture_replica_active():
+    return _lecture_replica.get()
+
+
+@contextmanager
+def lecture_replica():
+    """
+    Envoie les lectures du bloc sur la réplique (si elle est configurée).
+    """
+    jeton = _lecture_replica.set(True)
+    try:
+        yield
+    finally:
+        _lecture_replica.reset(jeton)
+
+
+@contextmanager
+def lecture_principale():
+    """
+    Lit sur ``default`` dans le bloc, même si la réplique a été demandée autour :
+    pour les lectures dont on déduit une écriture (consolidation).
+    """
+    jeton = _lecture_replica.set(False)
+    try:
+        yield
+    finally:
+        _lecture_replica.reset(jeton)
+
+
+class RouteurReplica:
+    """
+    Routeur de bases : lectures sur la réplique lorsqu'elles ont été demandées
+    (lecture_replica), tout le reste sur ``default``.
+    """
+    def db_for_read(self, model, **hints):
+        if _lecture_replica.get() and replica_configuree():
+            return ALIAS_REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Même données de part et d'autre : les relations entre les deux alias sont valides
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # La réplique reçoit le schéma par réplication, jamais par migrate
+        return db != ALIAS_REPLICA
+
+
+class LectureReplicaMixin:
+    """
+    Exécute les actions de lecture du viewset listées dans actions_replica sur la réplique.
+    Le routage est activé après l'authentification et les permissions (initial) et
+    désactivé une fois la réponse construite (finalize_response).
+    """
+    actions_replica = ('list',)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in permissions.SAFE_METHODS and self.action in self.actions_replica:
+            self._jeton_replica = _lecture_replica.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        jeton = getattr(self, '_jeton_replica', None)
+        if jeton is not None:
+            _lecture_replica.reset(jeton)
+            self._jeton_replica = None
+        return super().finalize_response(request, response, *args, **kwargs)
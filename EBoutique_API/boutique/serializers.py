@@ -1,9 +1,12 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Prefetch
 from .models import (
     Marque, Modele, Boutique, Produit, Stock,
-    ArchivedProduit, ArchivedBoutique, HistoriqueVentes, DemandeSuppressionProduit
+    ArchivedProduit, ArchivedBoutique, HistoriqueVentes, DemandeSuppressionProduit,
+    MouvementStock
 )
+from .images import representation_variantes
 
 # ============================================================================
 # Serializers pour les modèles de base
@@ -89,6 +92,25 @@ class BoutiqueSerializer(serializers.ModelSerializer):
             'boutique_id': {'read_only': True}
         }
 
+    @staticmethod
+    def prefetch_gestionnaires(prefixe=''):
+        """
+        Préchargement des gestionnaires limité aux champs utilisés par GestionnaireSerializer.
+        """
+        return Prefetch(
+            f'{prefixe}gestionnaires',
+            queryset=User.objects.only(*GestionnaireSerializer.Meta.fields)
+        )
+
+    @staticmethod
+    def optimiser_queryset(queryset):
+        """
+        Joint le responsable et précharge les gestionnaires pour éviter deux requêtes par boutique.
+        """
+        return queryset.select_related('responsable').prefetch_related(
+            BoutiqueSerializer.prefetch_gestionnaires()
+        )
+
     def to_representation(self, instance):
         """
         Personnalise la représentation de la boutique en incluant les détails du responsable
@@ -125,15 +147,29 @@ class ProduitSerializer(serializers.ModelSerializer):
     boutique_id = serializers.IntegerField(write_only=True, required=False)  # ID de la boutique pour le stock initial
     quantite_initiale = serializers.IntegerField(write_only=True, default=1, min_value=1)  # Quantité initiale en stock
     boutiques = serializers.SerializerMethodField()  # Champ pour les informations des boutiques
+    images = serializers.SerializerMethodField()  # Variantes de l'image (miniature, moyenne) avec leurs dimensions
 
     class Meta:
         model = Produit
-        fields = '__all__'
+        exclude = ['variantes_image']
         read_only_fields = ['user', 'validation_responsable']
         extra_kwargs = {
             'produit_id': {'read_only': True}
         }
 
+    @staticmethod
+    def optimiser_queryset(queryset, prefixe=''):
+        """
+        Charge en un nombre constant de requêtes les relations utilisées par la représentation
+        (modèle, marque, utilisateur et stocks avec leur boutique).
+        Le préfixe permet d'appliquer le chargement à un produit imbriqué (ex: 'produit__').
+        """
+        return queryset.select_related(
+            f'{prefixe}modele__marque', f'{prefixe}user'
+        ).prefetch_related(
+            Prefetch(f'{prefixe}stocks', queryset=Stock.objects.select_related('boutique'))
+        )
+
     def get_boutiques(self, obj):
         """
         Récupère les informations des boutiques associées au produit via la table Stock.
@@ -151,6 +187,15 @@ class ProduitSerializer(serializers.ModelSerializer):
                 continue
         return boutiques_info
 
+    def get_images(self, obj):
+        """
+        URLs et dimensions de l'original et de ses variantes ; None tant qu'elles ne sont pas générées.
+        """
+        request = self.context.get('request')
+        return representation_variantes(
+            obj.variantes_image, obj.image.name, request.build_absolute_uri if request else str
+        )
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['modele'] = ModeleSerializer(instance.modele).data
@@ -171,11 +216,12 @@ class ProduitSerializer(serializers.ModelSerializer):
         # Créer l'entrée dans le stock si une boutique est spécifiée
         if boutique_id is not None:
             try:
-                Stock.objects.create(
+                stock = Stock.objects.create(
                     boutique_id=boutique_id,
                     produit=produit,
                     quantite=quantite_initiale
                 )
+                MouvementStock.depuis_stock(stock, 0, quantite_initiale, 'PRODUIT', validated_data['user']).save()
             except Exception as e:
                 # Si la création du stock échoue, supprimer le produit
                 produit.delete()
@@ -204,9 +250,14 @@ class ProduitSerializer(serializers.ModelSerializer):
                 )
                 
                 # Si le stock existait déjà, mettre à jour la quantité
+                quantite_avant = 0 if created else stock.quantite
                 if not created:
                     stock.quantite = quantite_initiale
                     stock.save()
+                if quantite_avant != quantite_initiale:
+                    MouvementStock.depuis_stock(
+                        stock, quantite_avant, quantite_initiale, 'PRODUIT', self.context['request'].user
+                    ).save()
             except Exception as e:
                 raise serializers.ValidationError(f"Erreur lors de la mise à jour du stock: {str(e)}")
 
@@ -231,8 +282,13 @@ class StockSerializer(serializers.ModelSerializer):
         """
         Met à jour le stock et archive automatiquement le produit si le stock est épuisé.
         """
+        quantite_avant = instance.quantite
         if 'quantite' in validated_data:
             nouvelle_quantite = validated_data['quantite']
+            if nouvelle_quantite != quantite_avant:
+                MouvementStock.depuis_stock(
+                    instance, quantite_avant, max(nouvelle_quantite, 0), 'STOCK', self.context['request'].user
+                ).save()
             if nouvelle_quantite <= 0:
                 # Archiver le produit
                 ArchivedProduit.objects.create(
@@ -283,6 +339,18 @@ class HistoriqueVentesSerializer(serializers.ModelSerializer):
         representation['vendu_par'] = UserSerializer(instance.vendu_par).data
         return representation
 
+class MouvementStockSerializer(serializers.ModelSerializer):
+    """
+    Serializer pour le modèle MouvementStock.
+    Lecture seule : le journal est alimenté par les écritures de stock.
+    """
+    type_mouvement = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = MouvementStock
+        fields = '__all__'
+        read_only_fields = [field.name for field in MouvementStock._meta.fields]
+
 class ArchivedBoutiqueSerializer(serializers.ModelSerializer):
     """
     Serializer pour le modèle ArchivedBoutique.
@@ -312,6 +380,15 @@ class DemandeSuppressionProduitSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['date_demande', 'date_validation', 'statut', 'commentaire_responsable', 'demandeur', 'responsable']
 
+    @staticmethod
+    def optimiser_queryset(queryset):
+        """
+        Charge le produit imbriqué, le demandeur et le responsable sans requête par demande.
+        """
+        return ProduitSerializer.optimiser_queryset(queryset, prefixe='produit__').select_related(
+            'demandeur', 'responsable'
+        )
+
     def create(self, validated_data):
         """
         Crée une demande de suppression et associe automatiquement le responsable de la boutique.
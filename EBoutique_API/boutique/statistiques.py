@@ -0,0 +1,185 @@
+"""
+Statistiques de ventes calculées en base.
+
+Les journées terminées sont lues dans l'agrégat VenteJournaliere, consolidé de façon
+incrémentale (uniquement les journées pas encore agrégées) par la commande
+``manage.py rafraichir_ventes_journalieres``, lancée chaque nuit ; les ventes non
+consolidées, en pratique celles du jour, sont agrégées depuis HistoriqueVentes.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Trunc, TruncDate
+from django.utils import timezone
+
+from .models import ConsolidationVentes, HistoriqueVentes, VenteJournaliere
+from .replica import lecture_principale
+
+PERIODES = {'jour': 'day', 'semaine': 'week', 'mois': 'month'}
+CHAMPS_JOURNALIERS = ['boutique', 'original_id', 'nom_produit', 'marque', 'modele', 'vendu_par']
+NB_TOP_PRODUITS = 10
+
+_CHIFFRE_AFFAIRES = ExpressionWrapper(
+    F('prix') * F('quantite_vendue'), output_field=DecimalField(max_digits=14, decimal_places=2)
+)
+AGREGATS_HISTORIQUE = {
+    'quantite_totale': Sum('quantite_vendue'),
+    'ca_total': Sum(_CHIFFRE_AFFAIRES),
+    'nb_total': Count('id'),
+}
+AGREGATS_JOURNALIERS = {
+    'quantite_totale': Sum('quantite'),
+    'ca_total': Sum('chiffre_affaires'),
+    'nb_total': Sum('nb_ventes'),
+}
+
+
+def debut_journee(date):
+    return timezone.make_aware(datetime.combine(date, time.min))
+
+
+def rafraichir_ventes_journalieres():
+    """
+    Agrège dans VenteJournaliere les journées terminées qui ne le sont pas encore.
+    Retourne le nombre de lignes d'agrégat créées.
+    """
+    # Les ventes sont lues sur la base principale : une vente pas encore répliquée
+    # serait exclue pour toujours des journées marquées comme consolidées
+    with lecture_principale():
+        return _rafraichir_ventes_journalieres()
+
+
+def _rafraichir_ventes_journalieres():
+    hier = timezone.localdate() - timedelta(days=1)
+    consolidation = ConsolidationVentes.objects.first()
+    if consolidation is not None and consolidation.derniere_date is not None and consolidation.derniere_date >= hier:
+        return 0  # Déjà à jour : aucune écriture ni verrou
+
+    with transaction.atomic():
+        if consolidation is None:
+            consolidation, _ = ConsolidationVentes.objects.get_or_create(pk=1)
+        consolidation = ConsolidationVentes.objects.select_for_update().get(pk=consolidation.pk)
+        if consolidation.derniere_date is not None and consolidation.derniere_date >= hier:
+            return 0  # Consolidé entre-temps par un autre processus
+
+        ventes = HistoriqueVentes.objects.filter(date_vente__lt=debut_journee(hier + timedelta(days=1)))
+        if consolidation.derniere_date is not None:
+            ventes = ventes.filter(date_vente__gte=debut_journee(consolidation.derniere_date + timedelta(days=1)))
+
+        lignes = (
+            ventes.annotate(jour=TruncDate('date_vente'))
+            .values('jour', *CHAMPS_JOURNALIERS)
+            .annotate(**AGREGATS_HISTORIQUE)
+            .order_by()
+        )
+        agregats = VenteJournaliere.objects.bulk_create([
+            VenteJournaliere(
+                date=ligne['jour'],
+                boutique_id=ligne['boutique'],
+                original_id=ligne['original_id'],
+                nom_produit=ligne['nom_produit'],
+                marque=ligne['marque'],
+                modele=ligne['modele'],
+                vendu_par_id=ligne['vendu_par'],
+                quantite=ligne['quantite_totale'],
+                chiffre_affaires=ligne['ca_total'],
+                nb_ventes=ligne['nb_total'],
+            )
+            for ligne in lignes.iterator()
+        ], batch_size=1000)
+
+        consolidation.derniere_date = hier
+        consolidation.save(update_fields=['derniere_date'])
+    return len(agregats)
+
+
+def _sources(debut=None, fin=None, boutique_id=None):
+    """
+    Retourne les deux querysets à agréger (journées consolidées, ventes non consolidées),
+    chacun avec l'annotation 'jour' et les agrégats à appliquer.
+    """
+    consolidation = ConsolidationVentes.objects.first()
+    derniere_date = consolidation.derniere_date if consolidation else None
+
+    journalieres = VenteJournaliere.objects.all()
+    ventes = HistoriqueVentes.objects.all()
+    if derniere_date is None:
+        journalieres = journalieres.none()
+    else:
+        journalieres = journalieres.filter(date__lte=derniere_date)
+        ventes = ventes.filter(date_vente__gte=debut_journee(derniere_date + timedelta(days=1)))
+
+    if debut is not None:
+        journalieres = journalieres.filter(date__gte=timezone.localtime(debut).date())
+        ventes = ventes.filter(date_vente__gte=debut)
+    if fin is not None:
+        journalieres = journalieres.filter(date__lte=timezone.localtime(fin).date())
+        ventes = ventes.filter(date_vente__lte=fin)
+    if boutique_id is not None:
+        journalieres = journalieres.filter(boutique_id=boutique_id)
+        ventes = ventes.filter(boutique_id=boutique_id)
+
+    return [
+        (journalieres.annotate(jour=F('date')), AGREGATS_JOURNALIERS),
+        (ventes.annotate(jour=TruncDate('date_vente')), AGREGATS_HISTORIQUE),
+    ]
+
+
+def _grouper(sources, cles, periode=None):
+    """
+    Agrège chaque source en base (GROUP BY cles) puis fusionne les deux résultats.
+    """
+    resultats = {}
+    for queryset, agregats in sources:
+        if periode is not None:
+            queryset = queryset.annotate(periode=Trunc('jour', PERIODES[periode]))
+        for ligne in queryset.values(*cles).annotate(**agregats).order_by():
+            cle = tuple(ligne[champ] for champ in cles)
+            total = resultats.setdefault(cle, {
+                **{champ: ligne[champ] for champ in cles},
+                'chiffre_affaires': Decimal('0'), 'quantite': 0, 'nb_ventes': 0,
+            })
+            total['chiffre_affaires'] += ligne['ca_total'] or 0
+            total['quantite'] += ligne['quantite_totale'] or 0
+            total['nb_ventes'] += ligne['nb_total'] or 0
+    return list(resultats.values())
+
+
+def statistiques_ventes(periode='jour', debut=None, fin=None, boutique_id=None):
+    """
+    Chiffre d'affaires, unités vendues et meilleurs produits, groupés par période,
+    marque, modèle et vendeur. Lecture seule : la consolidation est faite par la commande
+    rafraichir_ventes_journalieres (cron), jamais pendant une requête.
+    """
+    sources = _sources(debut, fin, boutique_id)
+
+    series = sorted(_grouper(sources, ['periode'], periode=periode), key=lambda ligne: ligne['periode'])
+    par_vendeur = _grouper(sources, ['vendu_par'])
+    noms = dict(User.objects.filter(
+        pk__in=[ligne['vendu_par'] for ligne in par_vendeur if ligne['vendu_par']]
+    ).values_list('id', 'username'))
+    for ligne in par_vendeur:
+        ligne['username'] = noms.get(ligne['vendu_par'])
+
+    def par_chiffre_affaires(lignes):
+        return sorted(lignes, key=lambda ligne: ligne['chiffre_affaires'], reverse=True)
+
+    return {
+        'periode': periode,
+        'totaux': {
+            'chiffre_affaires': sum((ligne['chiffre_affaires'] for ligne in series), Decimal('0')),
+            'quantite': sum(ligne['quantite'] for ligne in series),
+            'nb_ventes': sum(ligne['nb_ventes'] for ligne in series),
+        },
+        'series': series,
+        'par_marque': par_chiffre_affaires(_grouper(sources, ['marque'])),
+        'par_modele': par_chiffre_affaires(_grouper(sources, ['marque', 'modele'])),
+        'par_vendeur': par_chiffre_affaires(par_vendeur),
+        'top_produits': sorted(
+            _grouper(sources, ['original_id', 'nom_produit', 'marque', 'modele']),
+            key=lambda ligne: ligne['quantite'], reverse=True
+        )[:NB_TOP_PRODUITS],
+    }
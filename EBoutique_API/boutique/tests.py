@@ -1,10 +1,46 @@
-from django.test import TestCase
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework.test import APIClient
 from rest_framework import status
+from PIL import Image
 
 from django.contrib.auth import get_user_model
-from free_app.models import Boutique, Produit, Stock, Marque, Modele
+from free_app.models import ArchivedUser, UserProfile
+from free_app.serializers import EBoutiqueTokenObtainPairSerializer
+from .models import Boutique, Produit, Stock, Marque, Modele, DemandeSuppressionProduit, HistoriqueVentes, AlerteStock, MouvementStock, VenteJournaliere, ArchivedBoutique, ArchivedProduit
+from .serializers import DemandeSuppressionProduitSerializer
+from .signals import notifier_api_frontend
+from .views import StockViewSet
+from .permissions import ContextePermissions
+from . import replica
+from .geo import encoder_geohash, distance_km
+from eboutique_config import schema
+from .bench import generer_donnees, purger_donnees
+from .images import _generer_dans_processus
+from .importation import importer_produits
+from .statistiques import rafraichir_ventes_journalieres
+from eboutique_config.metriques import archiver_instantane
 
 User = get_user_model()
 
@@ -14,23 +50,1326 @@ class ProduitPermissionsTest(TestCase):
 
         # Création des utilisateurs
         self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password='adminpass')
-        self.gestionnaire1 = User.objects.create_user(username='gest1', email='gest1@test.com', password='gestpass', is_gestionnaire=True)
+        self.gestionnaire1 = User.objects.create_user(username='gest1', email='gest1@test.com', password='gestpass')
+        UserProfile.objects.create(user=self.gestionnaire1, role='GESTIONNAIRE')
         self.utilisateur_normal = User.objects.create_user(username='normal', email='normal@test.com', password='normalpass')
 
         # Boutiques
-        self.boutique1 = Boutique.objects.create(nom="Boutique 1", gestionnaire=self.gestionnaire1, ville="Paris", code_postal="75000")
-        self.boutique2 = Boutique.objects.create(nom="Boutique 2", gestionnaire=self.gestionnaire1, ville="Lyon", code_postal="69000")
+        self.boutique1 = Boutique.objects.create(nom_boutique="Boutique 1", adresse="1 rue A", ville="Paris", code_postal="75000", latitude=48.8566, longitude=2.3522)
+        self.boutique2 = Boutique.objects.create(nom_boutique="Boutique 2", adresse="1 rue B", ville="Lyon", code_postal="69000", latitude=45.7640, longitude=4.8357)
+        self.boutique1.gestionnaires.add(self.gestionnaire1)
+        self.boutique2.gestionnaires.add(self.gestionnaire1)
 
         # Produits et Stocks
-        self.marque_a = Marque.objects.create(nom="Marque A")
-        self.modele1 = Modele.objects.create(nom="Modèle 1", marque=self.marque_a)
-        self.produit1 = Produit.objects.create(nom="Produit 1", boutique=self.boutique1, prix=100, modele=self.modele1)
-        self.stock1 = Stock.objects.create(produit=self.produit1, quantite=10, seuil_alerte=5)
+        self.marque_a = Marque.objects.create(marque="Marque A")
+        self.modele1 = Modele.objects.create(modele="Modèle 1", marque=self.marque_a)
+        self.produit1 = Produit.objects.create(nom_produit="Produit 1", modele=self.modele1, prix=100, couleur="Noir", capacite=128, ram=8, user=self.admin)
+        self.stock1 = Stock.objects.create(boutique=self.boutique1, produit=self.produit1, quantite=10, seuil_alerte=5)
 
     def test_gestionnaire_acces_produits(self):
         """Test que le gestionnaire peut accéder à ses produits"""
+        self.client.force_authenticate(user=self.gestionnaire1)
         url = reverse('produit-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['nom'], self.produit1.nom)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['nom_produit'], self.produit1.nom_produit)
+
+class BoutiquesProchesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='vendeur', password='pass')
+        marque = Marque.objects.create(marque="Marque A")
+        modele = Modele.objects.create(modele="Modèle 1", marque=marque)
+        self.produit = Produit.objects.create(nom_produit="Produit 1", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.user)
+
+        # Boutiques autour de Paris (Châtelet), à des distances croissantes
+        positions = [
+            ("Châtelet", 48.8584, 2.3470, 3),
+            ("Bastille", 48.8532, 2.3691, 0),   # Plus proche mais sans stock
+            ("La Défense", 48.8918, 2.2380, 7),
+            ("Versailles", 48.8049, 2.1204, 2),
+            ("Lyon", 45.7640, 4.8357, 9),
+        ]
+        self.boutiques = {}
+        for index, (nom, lat, lon, quantite) in enumerate(positions):
+            boutique = Boutique.objects.create(
+                nom_boutique=nom, adresse="adresse", ville=nom, code_postal=f"7500{index}",
+                latitude=lat, longitude=lon
+            )
+            Stock.objects.create(boutique=boutique, produit=self.produit, quantite=quantite)
+            self.boutiques[nom] = boutique
+
+    def test_geohash_calcule_a_l_enregistrement(self):
+        boutique = self.boutiques["Châtelet"]
+        self.assertEqual(boutique.geohash, encoder_geohash(48.8584, 2.3470))
+        self.assertTrue(boutique.geohash.startswith('u09tv'))
+
+    def test_proches_avec_stock(self):
+        response = self.client.get(reverse('boutique-proches'), {
+            'lat': 48.8570, 'lon': 2.3500, 'produit': self.produit.produit_id, 'k': 3
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        noms = [boutique['nom_boutique'] for boutique in response.data]
+        self.assertEqual(noms, ["Châtelet", "La Défense", "Versailles"])
+        self.assertEqual(response.data[0]['quantite'], 3)
+        distances = [boutique['distance_km'] for boutique in response.data]
+        self.assertEqual(distances, sorted(distances))
+
+    def test_proches_respecte_le_rayon(self):
+        response = self.client.get(reverse('boutique-proches'), {
+            'lat': 48.8570, 'lon': 2.3500, 'produit': self.produit.produit_id, 'rayon': 10, 'k': 10
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for boutique in response.data:
+            self.assertLessEqual(boutique['distance_km'], 10)
+        self.assertEqual([b['nom_boutique'] for b in response.data], ["Châtelet", "La Défense"])
+
+    def test_proches_sans_produit_correspond_au_parcours_complet(self):
+        response = self.client.get(reverse('boutique-proches'), {'lat': 46.5, 'lon': 3.0, 'rayon': 1000, 'k': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        attendu = sorted(
+            self.boutiques.values(),
+            key=lambda b: distance_km(46.5, 3.0, float(b.latitude), float(b.longitude))
+        )
+        self.assertEqual([b['boutique_id'] for b in response.data], [b.boutique_id for b in attendu])
+
+    def test_proches_parametres_invalides(self):
+        response = self.client.get(reverse('boutique-proches'), {'lat': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ProduitRequetesTest(TestCase):
+    """Le nombre de requêtes des produits ne doit pas dépendre du nombre de lignes"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username='vendeur', password='pass')
+        self.boutiques = [
+            Boutique.objects.create(nom_boutique=f"Boutique {i}", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35 + i)
+            for i in range(3)
+        ]
+
+    def creer_produits(self, nombre):
+        for index in range(nombre):
+            modele = Modele.objects.create(modele=f"Modèle {Produit.objects.count()}", marque=Marque.objects.get_or_create(marque=f"Marque {index % 2}")[0])
+            produit = Produit.objects.create(nom_produit=f"Produit {index}", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.user)
+            for boutique in self.boutiques:
+                Stock.objects.create(boutique=boutique, produit=produit, quantite=5)
+
+    def compter_requetes(self, url, params=None):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(requetes)
+
+    def test_liste_produits_nombre_constant_de_requetes(self):
+        self.creer_produits(1)
+        une_ligne = self.compter_requetes(reverse('produit-list'))
+        self.creer_produits(9)
+        dix_lignes = self.compter_requetes(reverse('produit-list'))
+        self.assertEqual(une_ligne, dix_lignes)
+        self.assertLessEqual(dix_lignes, 3)
+
+    def test_detail_produit_nombre_constant_de_requetes(self):
+        self.creer_produits(1)
+        produit = Produit.objects.get()
+        self.assertLessEqual(self.compter_requetes(reverse('produit-detail', args=[produit.produit_id])), 2)
+
+    def test_demandes_suppression_nombre_constant_de_requetes(self):
+        self.creer_produits(10)
+        for produit in Produit.objects.all():
+            DemandeSuppressionProduit.objects.create(produit=produit, demandeur=self.user, responsable=self.user)
+        with CaptureQueriesContext(connection) as requetes:
+            data = DemandeSuppressionProduitSerializer(
+                DemandeSuppressionProduitSerializer.optimiser_queryset(DemandeSuppressionProduit.objects.all()), many=True
+            ).data
+        self.assertEqual(len(data), 10)
+        self.assertEqual(len(data[0]['produit_details']['boutiques']), 3)
+        self.assertLessEqual(len(requetes), 2)
+
+class BoutiqueRequetesTest(TestCase):
+    """Le personnel des boutiques est chargé en un nombre constant de requêtes"""
+    def setUp(self):
+        self.client = APIClient()
+
+    def creer_boutiques(self, nombre):
+        debut = Boutique.objects.count()
+        for index in range(debut, debut + nombre):
+            responsable = User.objects.create_user(username=f'resp{index}')
+            boutique = Boutique.objects.create(
+                nom_boutique=f"Boutique {index}", adresse="adresse", ville="Paris", code_postal="75000",
+                latitude=48.85, longitude=2.35, responsable=responsable
+            )
+            for numero in range(2):
+                boutique.gestionnaires.add(User.objects.create_user(username=f'gest{index}-{numero}'))
+
+    def compter_requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('boutique-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(requetes), response
+
+    def test_liste_boutiques_nombre_constant_de_requetes(self):
+        self.creer_boutiques(1)
+        une_ligne, _ = self.compter_requetes()
+        self.creer_boutiques(9)
+        dix_lignes, response = self.compter_requetes()
+        self.assertEqual(une_ligne, dix_lignes)
+        boutique = response.data['results'][0]
+        self.assertEqual(boutique['responsable']['username'], 'resp0')
+        self.assertEqual([g['username'] for g in boutique['gestionnaires']], ['gest0-0', 'gest0-1'])
+
+class VenteConcurrenteTest(TransactionTestCase):
+    """Des ventes simultanées sur le même stock ne doivent jamais le rendre négatif"""
+    NB_VENDEURS = 12
+    STOCK_INITIAL = 5
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password=None)
+        boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        produit = Produit.objects.create(nom_produit="Produit 1", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.admin)
+        self.stock = Stock.objects.create(boutique=boutique, produit=produit, quantite=self.STOCK_INITIAL)
+
+    def vendre(self, depart, statuts):
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        client.raise_request_exception = False
+        depart.wait()
+        try:
+            response = client.post(reverse('stock-vendre', args=[self.stock.pk]), {'quantite': 1})
+            statuts.append(response.status_code)
+        finally:
+            connection.close()
+
+    def test_pas_de_survente_sous_concurrence(self):
+        depart = threading.Barrier(self.NB_VENDEURS)
+        statuts = []
+        vendeurs = [threading.Thread(target=self.vendre, args=(depart, statuts)) for _ in range(self.NB_VENDEURS)]
+        for vendeur in vendeurs:
+            vendeur.start()
+        for vendeur in vendeurs:
+            vendeur.join()
+
+        self.stock.refresh_from_db()
+        ventes = statuts.count(status.HTTP_200_OK)
+        self.assertEqual(len(statuts), self.NB_VENDEURS)
+        self.assertEqual(ventes, self.STOCK_INITIAL)
+        self.assertEqual(self.stock.quantite, 0)
+        self.assertEqual(HistoriqueVentes.objects.count(), ventes)
+        refus = {status.HTTP_400_BAD_REQUEST, status.HTTP_409_CONFLICT}
+        self.assertTrue(all(code == status.HTTP_200_OK or code in refus for code in statuts))
+
+    def test_vente_perdue_retourne_409(self):
+        # Le stock lu par la vue est périmé : une autre vente l'a vidé avant la mise à jour
+        stock_perime = Stock.objects.select_related('boutique', 'produit__modele__marque').get(pk=self.stock.pk)
+        Stock.objects.filter(pk=self.stock.pk).update(quantite=0)
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        with mock.patch.object(StockViewSet, 'get_object', return_value=stock_perime):
+            response = client.post(reverse('stock-vendre', args=[self.stock.pk]), {'quantite': 1})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(HistoriqueVentes.objects.count(), 0)
+
+class VenteLotTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password=None)
+        self.client.force_authenticate(user=self.admin)
+        boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        self.stocks = []
+        for index in range(20):
+            produit = Produit.objects.create(nom_produit=f"Produit {index}", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.admin)
+            self.stocks.append(Stock.objects.create(boutique=boutique, produit=produit, quantite=3))
+
+    def vendre_lot(self, lignes):
+        return self.client.post(reverse('stock-vendre-lot'), {'lignes': lignes}, format='json')
+
+    def test_panier_vendu_en_nombre_constant_de_requetes(self):
+        lignes = [{'stock_id': stock.pk, 'quantite': 2} for stock in self.stocks]
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.vendre_lot(lignes)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(requetes), 8)
+        self.assertEqual(set(Stock.objects.values_list('quantite', flat=True)), {1})
+        self.assertEqual(HistoriqueVentes.objects.count(), 20)
+        self.assertEqual(response.data['data'][0]['quantite'], 1)
+
+    def test_panier_tout_ou_rien(self):
+        lignes = [
+            {'stock_id': self.stocks[0].pk, 'quantite': 1},
+            {'stock_id': self.stocks[1].pk, 'quantite': 2},
+            {'stock_id': self.stocks[1].pk, 'quantite': 2},  # 4 au total pour un stock de 3
+        ]
+        response = self.vendre_lot(lignes)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['stock_ids'], [self.stocks[1].pk])
+        self.assertEqual(set(Stock.objects.values_list('quantite', flat=True)), {3})
+        self.assertEqual(HistoriqueVentes.objects.count(), 0)
+
+    def test_panier_stock_inconnu(self):
+        response = self.vendre_lot([{'stock_id': 999999, 'quantite': 1}])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class AlerteStockTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password=None)
+        self.client.force_authenticate(user=self.admin)
+        self.boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        self.gestionnaire = User.objects.create_user(username='gest', email='gest@test.com')
+        self.boutique.gestionnaires.add(self.gestionnaire)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        self.stocks = [
+            Stock.objects.create(
+                boutique=self.boutique, quantite=4, seuil_alerte=3,
+                produit=Produit.objects.create(nom_produit=f"Produit {index}", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.admin)
+            )
+            for index in range(2)
+        ]
+
+    def vendre(self, stock, quantite=1):
+        return self.client.post(reverse('stock-vendre', args=[stock.pk]), {'quantite': quantite})
+
+    def test_vente_sous_le_seuil_met_en_file_sans_envoyer(self):
+        self.vendre(self.stocks[0])  # 3 : pas sous le seuil
+        self.assertEqual(AlerteStock.objects.count(), 0)
+        self.vendre(self.stocks[0])  # 2 : sous le seuil
+        self.vendre(self.stocks[0])  # 1 : alerte déjà en file pour ce couple
+        self.assertEqual(AlerteStock.objects.filter(statut='EN_ATTENTE').count(), 1)
+        self.assertEqual(len(mail.outbox), 0)
+
+    @override_settings(STOCK_ALERT_WINDOW_MINUTES=0)
+    def test_une_seule_alerte_en_attente_meme_hors_fenetre(self):
+        # Fenêtre nulle : la vérification ne voit pas l'alerte, comme une transaction concurrente
+        self.vendre(self.stocks[0], 2)
+        self.vendre(self.stocks[0])
+        self.assertEqual(AlerteStock.objects.filter(statut='EN_ATTENTE').count(), 1)
+
+    def test_notification_frontend_sans_requete(self):
+        stock = Stock.objects.get(pk=self.stocks[0].pk)
+        with self.assertNumQueries(0):
+            notifier_api_frontend(Stock, stock, created=False)
+
+    def test_un_recapitulatif_par_gestionnaire(self):
+        self.vendre(self.stocks[0], 3)
+        self.client.post(reverse('stock-vendre-lot'), {'lignes': [{'stock_id': self.stocks[1].pk, 'quantite': 2}]}, format='json')
+        self.assertEqual(AlerteStock.objects.count(), 2)
+
+        call_command('envoyer_alertes_stock', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['gest@test.com'])
+        self.assertIn('Produit 0', mail.outbox[0].body)
+        self.assertIn('Produit 1', mail.outbox[0].body)
+        self.assertEqual(AlerteStock.objects.filter(statut='ENVOYEE').count(), 2)
+
+    def test_alerte_ignoree_apres_reapprovisionnement(self):
+        self.vendre(self.stocks[0], 3)
+        Stock.objects.filter(pk=self.stocks[0].pk).update(quantite=10)
+        call_command('envoyer_alertes_stock', stdout=open(os.devnull, 'w'))
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(AlerteStock.objects.get().statut, 'IGNOREE')
+
+    def test_worker_survit_a_une_erreur_smtp(self):
+        self.vendre(self.stocks[0], 3)
+        sortie = StringIO()
+        # Premier passage : serveur SMTP injoignable ; le worker est arrêté au deuxième sommeil
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=[OSError('SMTP'), 1]), \
+                mock.patch('time.sleep', side_effect=[None, KeyboardInterrupt]), \
+                self.assertLogs('boutique.management.commands.envoyer_alertes_stock', 'ERROR'):
+            with self.assertRaises(KeyboardInterrupt):
+                call_command('envoyer_alertes_stock', boucle=True, stdout=sortie)
+        self.assertIn('1 alerte(s) traitée(s)', sortie.getvalue())
+        self.assertEqual(AlerteStock.objects.get().statut, 'ENVOYEE')
+
+class MouvementStockTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = User.objects.create_superuser(username='admin', email='admin@test.com', password=None)
+        self.client.force_authenticate(user=self.admin)
+        self.boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        self.modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+
+    def test_journal_des_ecritures_de_stock(self):
+        response = self.client.post(reverse('produit-list'), {
+            'nom_produit': "Produit 1", 'modele': self.modele.pk, 'prix': 100, 'couleur': "Noir",
+            'capacite': 128, 'ram': 8, 'boutique_id': self.boutique.pk, 'quantite_initiale': 10
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        stock = Stock.objects.get()
+        self.client.post(reverse('stock-vendre', args=[stock.pk]), {'quantite': 3})
+        self.client.post(reverse('stock-vendre-lot'), {'lignes': [{'stock_id': stock.pk, 'quantite': 2}]}, format='json')
+        self.client.put(reverse('stock-detail', args=[stock.pk]), {
+            'boutique': self.boutique.pk, 'produit': stock.produit_id, 'quantite': 20, 'seuil_alerte': 5
+        })
+
+        mouvements = list(MouvementStock.objects.values_list('source', 'quantite_avant', 'quantite_apres'))
+        self.assertEqual(mouvements, [('PRODUIT', 0, 10), ('VENTE', 10, 7), ('VENTE', 7, 5), ('STOCK', 5, 20)])
+
+        # La quantité à une date est celle du dernier mouvement antérieur
+        vente = MouvementStock.objects.filter(source='VENTE').first()
+        self.assertEqual(MouvementStock.quantite_a(self.boutique.pk, stock.produit_id, vente.date_mouvement), 7)
+        response = self.client.get(reverse('mouvementstock-list'), {'boutique': self.boutique.pk, 'produit': stock.produit_id})
+        self.assertEqual(response.data['count'], 4)
+
+    def test_parametres_invalides(self):
+        self.client.post(reverse('produit-list'), {
+            'nom_produit': "Produit 1", 'modele': self.modele.pk, 'prix': 100, 'couleur': "Noir",
+            'capacite': 128, 'ram': 8, 'boutique_id': self.boutique.pk, 'quantite_initiale': 10
+        })
+        mouvement = MouvementStock.objects.get()
+        for params in ({'boutique': 'abc'}, {'produit': '1.5'}, {'debut': 'hier'}, {'fin': '2025-13-01'}):
+            for url in (reverse('mouvementstock-list'), reverse('mouvementstock-detail', args=[mouvement.pk])):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, (url, params))
+                self.assertIn('error', response.json())
+
+class StatistiquesVentesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.vendeur = User.objects.create_user(username='vendeur')
+        self.boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        maintenant = timezone.now()
+        # (jours avant aujourd'hui, marque, prix, quantité)
+        ventes = [(40, "Apple", 1000, 1), (3, "Apple", 1000, 2), (3, "Samsung", 500, 1), (0, "Samsung", 500, 4)]
+        for jours, marque, prix, quantite in ventes:
+            vente = HistoriqueVentes.objects.create(
+                original_id=1 if marque == "Apple" else 2, nom_produit=f"Téléphone {marque}", marque=marque, modele="X",
+                prix=prix, couleur="Noir", capacite=128, ram=8, quantite_vendue=quantite,
+                vendu_par=self.vendeur, boutique=self.boutique, description="vente"
+            )
+            HistoriqueVentes.objects.filter(pk=vente.pk).update(date_vente=maintenant - timedelta(days=jours))
+
+    def test_statistiques_agregat_et_ventes_du_jour(self):
+        # Rien n'est consolidé : tout est lu dans l'historique, sans écriture pendant la requête
+        response = self.client.get(reverse('historiqueventes-stats'), {'periode': 'mois'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(VenteJournaliere.objects.count(), 0)
+        self.assertEqual(response.data['totaux']['quantite'], 8)
+
+        # Les journées terminées sont consolidées, les ventes du jour restent dans l'historique
+        call_command('rafraichir_ventes_journalieres', stdout=StringIO())
+        self.assertEqual(VenteJournaliere.objects.count(), 3)
+        response = self.client.get(reverse('historiqueventes-stats'), {'periode': 'mois'})
+        self.assertEqual(response.data['totaux']['quantite'], 8)
+        self.assertEqual(response.data['totaux']['chiffre_affaires'], Decimal('5500'))
+        par_marque = {ligne['marque']: ligne['chiffre_affaires'] for ligne in response.data['par_marque']}
+        self.assertEqual(par_marque, {'Apple': Decimal('3000'), 'Samsung': Decimal('2500')})
+        self.assertEqual(response.data['top_produits'][0]['nom_produit'], 'Téléphone Samsung')
+        self.assertEqual(response.data['par_vendeur'][0]['username'], 'vendeur')
+
+        # Une deuxième consolidation ne reprend pas les mêmes journées
+        call_command('rafraichir_ventes_journalieres', stdout=StringIO())
+        response = self.client.get(reverse('historiqueventes-stats'), {'debut': (timezone.now() - timedelta(days=10)).date().isoformat()})
+        self.assertEqual(VenteJournaliere.objects.count(), 3)
+        self.assertEqual(response.data['totaux']['quantite'], 7)
+        self.assertEqual(len(response.data['series']), 2)
+
+    def test_vente_capture_la_boutique(self):
+        admin = User.objects.create_superuser(username='admin', email='admin@test.com', password=None)
+        self.client.force_authenticate(user=admin)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        produit = Produit.objects.create(nom_produit="Produit 1", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=admin)
+        stock = Stock.objects.create(boutique=self.boutique, produit=produit, quantite=5)
+        self.client.post(reverse('stock-vendre', args=[stock.pk]), {'quantite': 1})
+        self.assertEqual(HistoriqueVentes.objects.latest('id').boutique, self.boutique)
+
+class FiltresCatalogueTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create_user(username='vendeur')
+        apple = Marque.objects.create(marque="Apple")
+        samsung = Marque.objects.create(marque="Samsung")
+        iphone = Modele.objects.create(modele="iPhone 15", marque=apple)
+        galaxy = Modele.objects.create(modele="Galaxy S24", marque=samsung)
+        catalogue = [
+            ("iPhone 15 Bleu", iphone, 969, "Bleu", 128, 6),
+            ("iPhone 15 Noir", iphone, 1229, "Noir", 512, 6),
+            ("Galaxy S24 Noir", galaxy, 899, "Noir", 256, 8),
+        ]
+        for nom, modele, prix, couleur, capacite, ram in catalogue:
+            Produit.objects.create(nom_produit=nom, modele=modele, prix=prix, couleur=couleur, capacite=capacite, ram=ram, user=user)
+        self.samsung = samsung
+
+    def noms(self, params):
+        response = self.client.get(reverse('produit-list'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [produit['nom_produit'] for produit in response.data['results']]
+
+    def test_filtres_produits(self):
+        self.assertEqual(self.noms({'marque': self.samsung.pk}), ["Galaxy S24 Noir"])
+        self.assertEqual(self.noms({'couleur': 'noir', 'ordering': '-prix'}), ["iPhone 15 Noir", "Galaxy S24 Noir"])
+        self.assertEqual(self.noms({'prix_min': 900, 'prix_max': 1000}), ["iPhone 15 Bleu"])
+        self.assertEqual(self.noms({'ram_min': 8}), ["Galaxy S24 Noir"])
+
+    def test_recherche_produits(self):
+        self.assertEqual(self.noms({'recherche': 'apple noir'}), ["iPhone 15 Noir"])
+        self.assertEqual(self.noms({'recherche': 'galaxy'}), ["Galaxy S24 Noir"])
+
+    def test_filtres_boutiques(self):
+        Boutique.objects.create(nom_boutique="Free Lyon", adresse="adresse", ville="Lyon", code_postal="69002", departement="Rhône", latitude=45.76, longitude=4.83)
+        Boutique.objects.create(nom_boutique="Free Paris", adresse="adresse", ville="Paris", code_postal="75001", departement="Paris", latitude=48.86, longitude=2.34)
+        response = self.client.get(reverse('boutique-list'), {'ville': 'LYON'})
+        self.assertEqual([b['nom_boutique'] for b in response.data['results']], ["Free Lyon"])
+        response = self.client.get(reverse('boutique-list'), {'code_postal_debut': '75'})
+        self.assertEqual([b['nom_boutique'] for b in response.data['results']], ["Free Paris"])
+
+class PaginationCurseurTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        vendeur = User.objects.create_user(username='vendeur')
+        date = timezone.now()
+        for i in range(25):
+            vente = HistoriqueVentes.objects.create(
+                original_id=i, nom_produit=f"Produit {i}", marque="Marque", modele="X", prix=100, couleur="Noir",
+                capacite=128, ram=8, quantite_vendue=1, vendu_par=vendeur, description="vente"
+            )
+            # Plusieurs ventes à la même date : l'id départage les égalités
+            HistoriqueVentes.objects.filter(pk=vente.pk).update(date_vente=date - timedelta(hours=i // 3))
+        self.attendu = list(HistoriqueVentes.objects.order_by('-date_vente', '-id').values_list('id', flat=True))
+
+    def test_parcours_complet_sans_doublon(self):
+        vus = []
+        url = reverse('historiqueventes-list') + '?page_size=10'
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['count'], 25)
+            vus += [vente['id'] for vente in response.data['results']]
+            pages.append(response.data)
+            url = response.data['next']
+        self.assertEqual(vus, self.attendu)
+        self.assertEqual(len(pages), 3)
+
+        # Retour arrière depuis la dernière page
+        response = self.client.get(pages[-1]['previous'])
+        self.assertEqual([vente['id'] for vente in response.data['results']], self.attendu[10:20])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_sans_total_et_taille_max(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('historiqueventes-list'), {'total': 0, 'page_size': 1000})
+        self.assertIsNone(response.data['count'])
+        self.assertEqual(len(response.data['results']), 25)
+        self.assertFalse(any('COUNT(' in requete['sql'] for requete in requetes.captured_queries))
+
+    def test_curseur_invalide(self):
+        response = self.client.get(reverse('historiqueventes-list'), {'cursor': 'invalide'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+class ContextePermissionsTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.responsable = User.objects.create_user(username='resp')
+        UserProfile.objects.create(user=self.responsable, role='RESPONSABLE')
+        self.gestionnaire = User.objects.create_user(username='gest')
+        UserProfile.objects.create(user=self.gestionnaire, role='GESTIONNAIRE')
+        self.boutiques = []
+        for i in range(3):
+            boutique = Boutique.objects.create(nom_boutique=f"Boutique {i}", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35, responsable=self.responsable if i < 2 else None)
+            boutique.gestionnaires.add(self.gestionnaire)
+            self.boutiques.append(boutique)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        self.produit = Produit.objects.create(nom_produit="Produit 1", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.responsable)
+        for boutique in self.boutiques:
+            Stock.objects.create(boutique=boutique, produit=self.produit, quantite=10)
+
+    def test_contexte_en_une_requete(self):
+        with self.assertNumQueries(1):
+            contexte = ContextePermissions.depuis_utilisateur(self.gestionnaire)
+        self.assertEqual(contexte.role, 'GESTIONNAIRE')
+        self.assertEqual(contexte.boutiques_gerees, {b.pk for b in self.boutiques})
+        contexte = ContextePermissions.depuis_utilisateur(self.responsable)
+        self.assertEqual(contexte.boutiques_gerees, {self.boutiques[0].pk, self.boutiques[1].pk})
+        self.assertFalse(contexte.gere(self.boutiques[2].pk))
+
+    def test_creation_produit_selon_boutiques(self):
+        self.client.force_authenticate(user=self.responsable)
+        donnees = {'nom_produit': "Produit 2", 'modele': self.produit.modele_id, 'prix': 100, 'couleur': "Noir", 'capacite': 128, 'ram': 8, 'quantite': 1}
+        response = self.client.post(reverse('produit-list'), {**donnees, 'boutique_id': self.boutiques[2].pk})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        response = self.client.post(reverse('produit-list'), {**donnees, 'boutique_id': self.boutiques[0].pk})
+        self.assertNotEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_permission_objet_sans_requete_par_stock(self):
+        self.client.force_authenticate(user=self.gestionnaire)
+        stock = Stock.objects.get(boutique=self.boutiques[2])
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.put(reverse('stock-detail', args=[stock.pk]), {'boutique': stock.boutique_id, 'produit': self.produit.pk, 'quantite': 12, 'seuil_alerte': 5})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Le contexte (profil et boutiques) n'est chargé qu'une fois
+        self.assertEqual(sum('tb_user_profile' in requete['sql'] for requete in requetes.captured_queries), 1)
+
+    def test_portee_mine_et_ecriture(self):
+        autre = User.objects.create_user(username='autre')
+        UserProfile.objects.create(user=autre, role='GESTIONNAIRE')
+        self.boutiques[0].gestionnaires.add(autre)
+        self.client.force_authenticate(user=autre)
+
+        response = self.client.get(reverse('stock-list'))
+        self.assertEqual(response.data['count'], 3)
+        response = self.client.get(reverse('stock-list'), {'mine': 1})
+        self.assertEqual([stock['boutique'] for stock in response.data['results']], [self.boutiques[0].pk])
+        response = self.client.get(reverse('boutique-list'), {'mine': 1})
+        self.assertEqual([b['boutique_id'] for b in response.data['results']], [self.boutiques[0].pk])
+        response = self.client.get(reverse('produit-list'), {'mine': 1})
+        self.assertEqual(response.data['count'], 1)
+
+        # Un stock d'une autre boutique n'est même pas chargé en écriture
+        stock = Stock.objects.get(boutique=self.boutiques[1])
+        response = self.client.post(reverse('stock-vendre', args=[stock.pk]), {'quantite': 1})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        stock.refresh_from_db()
+        self.assertEqual(stock.quantite, 10)
+
+    def test_valider_reserve_aux_boutiques_du_responsable(self):
+        autre = User.objects.create_user(username='autre_resp')
+        UserProfile.objects.create(user=autre, role='RESPONSABLE')
+        DemandeSuppressionProduit.objects.create(produit=self.produit, demandeur=self.gestionnaire, responsable=self.responsable, raison="test")
+        self.client.force_authenticate(user=autre)
+        response = self.client.post(reverse('produit-valider', args=[self.produit.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Produit.objects.filter(pk=self.produit.pk).exists())
+        response = self.client.get(reverse('demandesuppressionproduit-list'))
+        self.assertEqual(response.data['results'], [])
+
+    def test_demandes_suppression_restreintes(self):
+        demande = DemandeSuppressionProduit.objects.create(produit=self.produit, demandeur=self.gestionnaire, responsable=self.responsable, raison="test")
+        response = self.client.get(reverse('demandesuppressionproduit-list'))
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        response = self.client.get(reverse('demandesuppressionproduit-detail', args=[demande.pk]))
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+        self.client.force_authenticate(user=self.responsable)
+        response = self.client.get(reverse('demandesuppressionproduit-list'))
+        self.assertEqual([d['id'] for d in response.data['results']], [demande.pk])
+        sans_boutique = User.objects.create_user(username='sans_boutique')
+        UserProfile.objects.create(user=sans_boutique, role='RESPONSABLE')
+        self.client.force_authenticate(user=sans_boutique)
+        response = self.client.get(reverse('demandesuppressionproduit-detail', args=[demande.pk]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class JWTSansRequeteTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.gestionnaire = User.objects.create_user(username='gest', password='motdepasse')
+        UserProfile.objects.create(user=self.gestionnaire, role='GESTIONNAIRE')
+        self.boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        self.boutique.gestionnaires.add(self.gestionnaire)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        produit = Produit.objects.create(nom_produit="Produit 1", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=self.gestionnaire)
+        self.stock = Stock.objects.create(boutique=self.boutique, produit=produit, quantite=10)
+
+    def connecter(self):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': 'gest', 'password': 'motdepasse'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {response.data['access']}")
+
+    def test_lecture_sans_requete_utilisateur(self):
+        self.connecter()
+        self.client.get(reverse('stock-list'), {'mine': 1})  # Met la version des jetons en cache
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('stock-list'), {'mine': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertFalse(any('auth_user' in r['sql'] or 'tb_user_profile' in r['sql'] for r in requetes.captured_queries))
+
+    def test_ecriture_avec_le_vrai_utilisateur(self):
+        self.connecter()
+        response = self.client.post(reverse('stock-vendre', args=[self.stock.pk]), {'quantite': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(HistoriqueVentes.objects.get().vendu_par, self.gestionnaire)
+
+    def test_revocation_apres_changement_de_boutiques(self):
+        self.connecter()
+        self.boutique.gestionnaires.remove(self.gestionnaire)
+        response = self.client.get(reverse('stock-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        # Un nouveau jeton reflète les nouvelles boutiques
+        self.client.credentials()
+        self.connecter()
+        response = self.client.get(reverse('stock-list'), {'mine': 1})
+        self.assertEqual(response.data['count'], 0)
+
+class CacheReponsesTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_user(username='lecteur'))
+        self.marque = Marque.objects.create(marque="Apple")
+        self.boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+
+    def test_reponse_en_cache_et_etag(self):
+        response = self.client.get(reverse('marque-list'))
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('marque-list'))
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.data['results'][0]['marque'], "Apple")
+
+        response = self.client.get(reverse('marque-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # La clé dépend des paramètres de requête
+        response = self.client.get(reverse('marque-list'), {'page': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_invalidation_par_signal(self):
+        response = self.client.get(reverse('modele-list'))
+        etag = response['ETag']
+        self.assertEqual(response.data['count'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            Modele.objects.create(modele="iPhone 15", marque=self.marque)
+        response = self.client.get(reverse('modele-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+
+        # Renommer la marque rend obsolètes les modèles qui l'embarquent
+        self.marque.marque = "Apple Inc."
+        self.marque.save()
+        response = self.client.get(reverse('modele-list'))
+        self.assertEqual(response.data['results'][0]['marque']['marque'], "Apple Inc.")
+
+    def test_gestionnaires_ajoutes_changent_l_etag(self):
+        # date_maj ne bouge pas : seul l'ETag, calculé sur le corps, signale le changement
+        url = reverse('boutique-detail', args=[self.boutique.pk])
+        response = self.client.get(url)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.boutique.gestionnaires.add(User.objects.create_user(username='gest'))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=http_date())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class SchemaOpenAPITest(TestCase):
+    def setUp(self):
+        schema._schemas.clear()
+        self.addCleanup(schema._schemas.clear)
+
+    def test_fichier_precalcule_et_etag(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        with override_settings(SCHEMA_OPENAPI_DIR=dossier):
+            call_command('generer_schema_openapi', stdout=open(os.devnull, 'w'))
+            with open(os.path.join(dossier, 'openapi.json'), 'rb') as fichier:
+                contenu = fichier.read()
+            response = self.client.get('/swagger.json/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, contenu)
+            response = self.client.get('/swagger.json/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_generation_unique_sans_fichier(self):
+        with override_settings(SCHEMA_OPENAPI_DIR='/chemin/inexistant'):
+            with mock.patch.object(schema, 'generer_schema', wraps=schema.generer_schema) as generer:
+                self.client.get('/swagger.yaml/')
+                response = self.client.get('/swagger.yaml/')
+        self.assertEqual(generer.call_count, 1)
+        self.assertIn(b'/produits/', response.content)
+
+class RouteurReplicaTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='x'))
+        self.routeur = replica.RouteurReplica()
+
+    def test_routage_des_lectures(self):
+        with mock.patch.object(replica, 'replica_configuree', return_value=True):
+            self.assertIsNone(self.routeur.db_for_read(Marque))
+            with replica.lecture_replica():
+                self.assertEqual(self.routeur.db_for_read(Marque), replica.ALIAS_REPLICA)
+                self.assertEqual(self.routeur.db_for_write(Marque), 'default')
+        # Sans alias replica dans DATABASES, tout reste sur default
+        with replica.lecture_replica():
+            self.assertIsNone(self.routeur.db_for_read(Marque))
+        self.assertFalse(self.routeur.allow_migrate(replica.ALIAS_REPLICA, 'boutique'))
+
+    def test_actions_de_lecture_seulement(self):
+        etats = []
+
+        def lecture(routeur, model, **hints):
+            etats.append(replica.lecture_replica_active())
+            return None
+
+        with mock.patch.object(replica.RouteurReplica, 'db_for_read', lecture):
+            self.client.get(reverse('historiqueventes-list'))
+            self.assertTrue(etats and all(etats))
+            self.assertFalse(replica.lecture_replica_active())
+
+            etats.clear()
+            response = self.client.post(reverse('marque-list'), {'marque': 'Samsung'})
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertFalse(any(etats))
+
+    def test_consolidation_lue_sur_la_base_principale(self):
+        etats = []
+
+        def lecture(routeur, model, **hints):
+            etats.append(replica.lecture_replica_active())
+            return None
+
+        with mock.patch.object(replica.RouteurReplica, 'db_for_read', lecture), replica.lecture_replica():
+            rafraichir_ventes_journalieres()
+            self.assertTrue(replica.lecture_replica_active())
+        self.assertTrue(etats)
+        self.assertFalse(any(etats))
+
+
+class VuesAsyncTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(username='vendeur', password='pass')
+        modele = Modele.objects.create(modele="iPhone 15", marque=Marque.objects.create(marque="Apple"))
+        self.produit = Produit.objects.create(nom_produit="iPhone 15 Noir", modele=modele, prix=900, couleur="Noir", capacite=128, ram=6, user=user, validation_responsable=True)
+        self.en_attente = Produit.objects.create(nom_produit="iPhone 15 Rose", modele=modele, prix=900, couleur="Rose", capacite=128, ram=6, user=user)
+        self.chatelet = Boutique.objects.create(nom_boutique="Châtelet", adresse="adresse", ville="Paris", code_postal="75001", latitude=48.8584, longitude=2.3470)
+        lyon = Boutique.objects.create(nom_boutique="Lyon", adresse="adresse", ville="Lyon", code_postal="69001", latitude=45.7640, longitude=4.8357)
+        Stock.objects.create(boutique=self.chatelet, produit=self.produit, quantite=3)
+        Stock.objects.create(boutique=lyon, produit=self.produit, quantite=0)
+
+    def test_catalogue_public_sans_jeton(self):
+        response = self.client.get(reverse('public-catalogue'), {'page_size': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        # Les produits en attente de validation ne sont pas publiés
+        self.assertEqual(data['count'], 1)
+        self.assertIsNone(data['next'])
+        self.assertEqual(data['results'][0]['nom_produit'], "iPhone 15 Noir")
+        self.assertEqual(data['results'][0]['marque']['marque'], "Apple")
+
+        response = self.client.get(reverse('public-catalogue'), {'page': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_disponibilite_produit(self):
+        response = self.client.get(reverse('public-disponibilite', args=[self.produit.produit_id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data['quantite_totale'], 3)
+        self.assertEqual([boutique['nom_boutique'] for boutique in data['boutiques']], ["Châtelet"])
+
+        response = self.client.get(reverse('public-disponibilite', args=[self.en_attente.produit_id]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_boutiques_proches(self):
+        response = self.client.get(reverse('public-boutiques-proches'), {
+            'lat': 48.8570, 'lon': 2.3500, 'produit': self.produit.produit_id, 'rayon': 1000
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        # Lyon n'a plus de stock
+        self.assertEqual([boutique['boutique_id'] for boutique in data], [self.chatelet.boutique_id])
+        self.assertEqual(data[0]['quantite'], 3)
+
+        response = self.client.get(reverse('public-boutiques-proches'), {'lat': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ImportCatalogueTest(TestCase):
+    def setUp(self):
+        self.dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dossier)
+        User.objects.create_superuser(username='admin', password='x')
+
+    def ecrire(self, nom, contenu):
+        chemin = os.path.join(self.dossier, nom)
+        with open(chemin, 'w', encoding='utf-8') as fichier:
+            fichier.write(contenu)
+        return chemin
+
+    def test_import_idempotent(self):
+        produits = self.ecrire('produits.csv', (
+            "brand,model,base_color,ROM,RAM,sales_price\n"
+            "Apple,iPhone 15,Noir,128,6,899.99\n"
+            "Apple,iPhone 15,Bleu,128,6,899.99\n"
+            "Samsung,Galaxy S24,Noir,256,8,999\n"
+            "Samsung,Galaxy S24,Noir,256,8,abc\n"
+        ))
+        boutiques = self.ecrire('boutiques.csv', (
+            "shopDescription;latitude;longitude\n"
+            "[Orange] 75 Paris Châtelet (1 rue de Rivoli);48.8584;2.3470\n"
+        ))
+        sortie = open(os.devnull, 'w')
+        self.addCleanup(sortie.close)
+        call_command('import_catalogue', produits=produits, boutiques=boutiques, stdout=sortie, stderr=sortie)
+
+        self.assertEqual(Marque.objects.count(), 2)
+        self.assertEqual(Modele.objects.count(), 2)
+        self.assertEqual(Produit.objects.count(), 3)
+        boutique = Boutique.objects.get()
+        self.assertEqual((boutique.ville, boutique.departement, boutique.adresse), ("Paris Châtelet", "75", "1 rue de Rivoli"))
+        self.assertEqual(boutique.geohash, encoder_geohash(48.8584, 2.3470))
+
+        # Second passage : mise à jour du prix sans doublon
+        produit = Produit.objects.get(couleur="Bleu")
+        stocks = self.ecrire('stocks.csv', f"boutique_id,produit_id,quantite\n{boutique.boutique_id},{produit.produit_id},4\n")
+        self.ecrire('produits.csv', "marque,modele,couleur,capacite,ram,prix\nApple,iPhone 15,Bleu,128,6,799\n")
+        call_command('import_catalogue', produits=produits, boutiques=boutiques, stocks=stocks, stdout=sortie, stderr=sortie)
+        call_command('import_catalogue', stocks=stocks, stdout=sortie, stderr=sortie)
+
+        self.assertEqual(Produit.objects.count(), 3)
+        self.assertEqual(Boutique.objects.count(), 1)
+        produit.refresh_from_db()
+        self.assertEqual(produit.prix, Decimal('799'))
+        self.assertEqual(Stock.objects.get().quantite, 4)
+        self.assertEqual(list(MouvementStock.objects.values_list('source', 'quantite_avant', 'quantite_apres')), [('IMPORT', 0, 4)])
+
+    def test_image_et_valeurs_trop_longues(self):
+        produits = self.ecrire('produits.csv', (
+            "brand,model,base_color,ROM,RAM,sales_price,image_url\n"
+            "Apple,iPhone 15,Noir,128,6,899.99,http://img.example.com/iphone.jpg\n"
+            f"Apple,{'X' * 101},Noir,128,6,899.99,\n"
+        ))
+        rapport = importer_produits(produits, User.objects.get())
+        self.assertEqual((rapport.creees, rapport.rejetees), (1, 1))
+        self.assertIn("modele trop long", rapport.erreurs[0])
+        self.assertFalse(Produit.objects.get().image)  # L'URL externe n'est pas prise pour un fichier
+
+        self.ecrire('produits.csv', (
+            "marque,modele,couleur,capacite,ram,prix,image\n"
+            "Apple,iPhone 15,Noir,128,6,799,https://img.example.com/iphone.jpg\n"
+            "Apple,iPhone 15,Noir,128,6,799,produits/iphone.jpg\n"
+        ))
+        rapport = importer_produits(produits, User.objects.get())
+        self.assertEqual((rapport.mises_a_jour, rapport.rejetees), (1, 1))
+        self.assertEqual(Produit.objects.get().image.name, 'produits/iphone.jpg')
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=User.objects.create_superuser(username='admin', password='x'))
+        vendeur = User.objects.create_user(username='vendeur')
+        for i in range(3):
+            vente = HistoriqueVentes.objects.create(
+                original_id=i, nom_produit=f"Produit, {i}", marque="Marque", modele="X", prix=100, couleur="Noir",
+                capacite=128, ram=8, quantite_vendue=i + 1, vendu_par=vendeur, description="vente"
+            )
+            HistoriqueVentes.objects.filter(pk=vente.pk).update(date_vente=timezone.now() - timedelta(days=2 - i))
+
+    def test_export_csv(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(reverse('historiqueventes-export'), {'format': 'csv'})
+            contenu = b''.join(response.streaming_content).decode()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="ventes-', response['Content-Disposition'])
+        lignes = contenu.splitlines()
+        self.assertTrue(lignes[0].startswith('id,date_vente,produit_id,nom_produit'))
+        self.assertEqual(len(lignes), 4)
+        self.assertIn('"Produit, 0"', lignes[1])  # Ordre chronologique, champs échappés
+        self.assertTrue(lignes[1].endswith(',vendeur'))
+        self.assertEqual(len(requetes), 1)  # Une seule requête, jointures comprises
+
+    def test_export_ndjson_periode(self):
+        hier = (timezone.localdate() - timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('historiqueventes-export'), {'format': 'ndjson', 'from': hier})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        ventes = [json.loads(ligne) for ligne in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([vente['produit_id'] for vente in ventes], [1, 2])
+        self.assertEqual(ventes[0]['prix'], '100.00')
+
+    def test_parametres_invalides(self):
+        response = self.client.get(reverse('historiqueventes-export'), {'format': 'xlsx'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('error', response.json())
+        response = self.client.get(reverse('archivedproduit-export'), {'from': 'hier'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class ImagesProduitTest(TestCase):
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        reglages = override_settings(MEDIA_ROOT=dossier)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+
+        tampon = BytesIO()
+        Image.new('RGB', (1600, 1200), 'red').save(tampon, 'JPEG')
+        self.nom = default_storage.save('produits/photo.jpg', ContentFile(tampon.getvalue()))
+        self.user = User.objects.create_superuser(username='admin', password='x')
+        self.modele = Modele.objects.create(modele="iPhone 15", marque=Marque.objects.create(marque="Apple"))
+
+    def creer_produit(self):
+        return Produit.objects.create(
+            nom_produit="iPhone 15", modele=self.modele, prix=900, couleur="Noir", capacite=128, ram=6,
+            user=self.user, image=self.nom,
+        )
+
+    def test_generation_planifiee_a_l_enregistrement(self):
+        with mock.patch('boutique.signals.planifier_variantes') as planifier:
+            produit = self.creer_produit()
+            self.assertEqual(planifier.call_count, 1)
+            produit.variantes_image = {'source': self.nom}
+            produit.save()  # Variantes à jour : rien à régénérer
+            self.assertEqual(planifier.call_count, 1)
+
+    def test_commande_et_serializer(self):
+        produit = self.creer_produit()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('produit-detail', args=[produit.pk]))
+        self.assertIsNone(response.json()['images'])
+
+        call_command('generer_images_produits', '--processus', '1', stdout=StringIO())
+        produit.refresh_from_db()
+        self.assertEqual(produit.variantes_image['moyenne']['largeur'], 800)
+        self.assertEqual(produit.variantes_image['miniature']['hauteur'], 150)
+        miniature_webp = produit.variantes_image['miniature']['webp']
+        self.assertTrue(miniature_webp.startswith('produits/variantes/'))
+        with default_storage.open(miniature_webp) as fichier:
+            self.assertEqual(Image.open(fichier).format, 'WEBP')
+
+        images = self.client.get(reverse('produit-detail', args=[produit.pk])).json()['images']
+        self.assertEqual(images['original'], {'url': f'http://testserver/media/{self.nom}', 'largeur': 1600, 'hauteur': 1200})
+        self.assertEqual(images['miniature']['url_webp'], f'http://testserver/media/{miniature_webp}')
+
+        # --tout parcourt le dossier sans retraiter les variantes elles-mêmes
+        sortie = StringIO()
+        call_command('generer_images_produits', '--tout', '--processus', '1', stdout=sortie)
+        self.assertIn('1 image(s) traitée(s)', sortie.getvalue())
+
+    def test_erreur_propre_a_une_image(self):
+        for erreur in (Image.DecompressionBombError('trop de pixels'), ValueError('fichier corrompu')):
+            with mock.patch('boutique.images.generer_variantes', side_effect=erreur):
+                nom, variantes, message = _generer_dans_processus(self.nom)
+            self.assertEqual((nom, variantes), (self.nom, None))
+            self.assertIn(str(erreur), message)
+
+
+class MediaTest(TestCase):
+    def setUp(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        reglages = override_settings(MEDIA_ROOT=dossier)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        self.nom = default_storage.save('produits/IMG_0001.JPG', ContentFile(b'photo'))
+
+    def test_stockage_par_condensat(self):
+        self.assertRegex(self.nom, r'^produits/[0-9a-f]{32}\.jpg$')
+        # Même photo envoyée pour un autre produit : un seul fichier sur disque
+        self.assertEqual(default_storage.save('produits/autre.jpg', ContentFile(b'photo')), self.nom)
+        self.assertEqual(len(default_storage.listdir('produits')[1]), 1)
+
+    def test_envoi_par_django(self):
+        response = self.client.get(f'/media/{self.nom}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'photo')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+
+        response = self.client.get(f'/media/{self.nom}', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(self.client.get('/media/produits/absent.jpg').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/media/produits/../secret.txt').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_envoi_delegue(self):
+        with override_settings(MEDIA_ENVOI='x-accel'):
+            response = self.client.get(f'/media/{self.nom}')
+        self.assertEqual(response['X-Accel-Redirect'], f'/media-interne/{self.nom}')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+        with override_settings(MEDIA_ENVOI='x-sendfile'):
+            response = self.client.get(f'/media/{self.nom}')
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.nom))
+
+class MetriquesTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        admin = User.objects.create_superuser(username='admin', password='x')
+        self.client.force_authenticate(user=admin)
+        boutique = Boutique.objects.create(nom_boutique="Boutique", adresse="adresse", ville="Paris", code_postal="75000", latitude=48.85, longitude=2.35)
+        modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        produit = Produit.objects.create(nom_produit="Produit", modele=modele, prix=100, couleur="Noir", capacite=128, ram=8, user=admin)
+        self.stock = Stock.objects.create(boutique=boutique, produit=produit, quantite=3)
+
+    def test_server_timing_et_histogrammes_par_action(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.post(reverse('stock-vendre-lot'), {'lignes': [{'stock_id': self.stock.pk, 'quantite': 1}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f'desc="{len(requetes)} SQL"', response['Server-Timing'])
+        self.assertRegex(response['Server-Timing'], r'serialisation;dur=[\d.]+, total;dur=[\d.]+$')
+
+        response = self.client.get('/metrics')
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        contenu = response.content.decode()
+        self.assertIn('eboutique_requete_sql_nombre_bucket{route="StockViewSet.vendre_lot",le="+Inf"}', contenu)
+        self.assertIn('eboutique_reponses_total{route="StockViewSet.vendre_lot",statut="200"}', contenu)
+
+    async def test_requetes_sql_comptees_sous_asgi(self):
+        # Vue DRF exécutée dans un thread (sync_to_async) et vue async (ORM async)
+        await sync_to_async(cache.clear)()  # Versions des jetons et réponses en cache
+        admin = await User.objects.aget(username='admin')
+        jeton = await sync_to_async(EBoutiqueTokenObtainPairSerializer.get_token)(admin)
+        for url, entetes in (
+            (reverse('marque-list'), {'Authorization': f'Bearer {jeton.access_token}'}),
+            (reverse('public-catalogue'), {}),
+        ):
+            response = await self.async_client.get(url, headers=entetes)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            nombre = int(re.search(r'desc="(\d+) SQL"', response['Server-Timing']).group(1))
+            self.assertGreater(nombre, 0, url)
+
+    def test_agregation_des_workers(self):
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        instantane = {'histogrammes': [['eboutique_requete_sql_nombre', 'Vue.get', [0, 2, 0, 0, 0, 0, 0, 0, 0, 0], 2.0]], 'reponses': [['Vue.get', 200, 2]]}
+        for pid in (101, 102):
+            with open(os.path.join(dossier, f'metriques-{pid}.json'), 'w') as fichier:
+                json.dump(instantane, fichier)
+        archiver_instantane(dossier, 101)  # Worker recyclé : ses mesures restent comptées
+        self.assertEqual(sorted(os.listdir(dossier)), ['metriques-102.json', 'metriques-archive.json'])
+
+        with override_settings(METRIQUES_DOSSIER=dossier):
+            contenu = self.client.get('/metrics').content.decode()
+        self.assertIn('eboutique_requete_sql_nombre_count{route="Vue.get"} 4', contenu)
+        self.assertIn('eboutique_reponses_total{route="Vue.get",statut="200"} 4', contenu)
+
+
+class BenchTest(TransactionTestCase):
+    """Clients concurrents dans des threads : les données doivent être commitées"""
+
+    def test_generation_reproductible(self):
+        bilan = generer_donnees(2, 12, graine=3)
+        self.assertEqual(bilan, {'utilisateurs': 7, 'boutiques': 2, 'produits': 12, 'stocks': 24, 'ventes': 24})
+        produits = list(Produit.objects.order_by('pk').values_list('nom_produit', 'prix', 'couleur'))
+        self.assertEqual(Boutique.objects.get(nom_boutique='Bench Paris 1').gestionnaires.count(), 2)
+        # Ventes antidatées et consolidées
+        self.assertGreater(HistoriqueVentes.objects.dates('date_vente', 'day').count(), 1)
+        self.assertTrue(VenteJournaliere.objects.exists())
+
+        purger_donnees()
+        self.assertFalse(Produit.objects.exists())
+        self.assertFalse(User.objects.filter(username__startswith='bench_').exists())
+        generer_donnees(2, 12, graine=3)
+        self.assertEqual(list(Produit.objects.order_by('pk').values_list('nom_produit', 'prix', 'couleur')), produits)
+
+    def test_rapport_du_bench(self):
+        with self.assertRaisesMessage(CommandError, '--produits'):
+            call_command('seed_bench', boutiques=2, produits=0, ventes=5, stdout=StringIO())
+        call_command('seed_bench', boutiques=2, produits=20, stdout=StringIO())
+        with self.assertRaisesMessage(CommandError, '--purger'):
+            call_command('seed_bench', boutiques=2, produits=20, stdout=StringIO())
+        dossier = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dossier)
+        sortie = os.path.join(dossier, 'bench.json')
+        call_command(
+            'bench', scenarios=['produits-liste', 'stocks-vendre'], requetes=6, concurrence=2, echauffement=1,
+            sortie=sortie, stdout=StringIO(),
+        )
+        with open(sortie) as fichier:
+            rapport = json.load(fichier)
+        self.assertEqual(rapport['donnees']['produits'], 20)
+        for scenario in ('produits-liste', 'stocks-vendre'):
+            resultat = rapport['resultats'][scenario]
+            self.assertEqual((resultat['requetes'], resultat['erreurs']), (6, 0))
+            self.assertLessEqual(resultat['p50_ms'], resultat['p99_ms'])
+        self.assertIsNotNone(rapport['resultats']['stocks-vendre']['sql_par_requete'])
+        self.assertEqual(HistoriqueVentes.objects.exclude(description__startswith='Vente générée').count(), 7)
+
+
+class BudgetRequetesTest(TestCase):
+    """
+    Budget de requêtes SQL par route (authentification exclue, réponses non mises en cache) :
+    mesuré avec 1 puis 50 lignes, le nombre de requêtes ne doit ni augmenter avec le
+    nombre de lignes ni dépasser le budget.
+    Chaque route a sa méthode requete_<route> qui crée ``lignes`` lignes et retourne
+    (méthode HTTP, URL, données).
+    """
+    LIGNES = (1, 50)
+    BUDGETS = {
+        'marque-list': 2,
+        'modele-list': 2,
+        'boutique-list': 3,
+        'boutique-proches': 6,  # Recherche élargie par anneaux tant que les candidats manquent
+        'produit-list': 3,
+        'produit-detail': 2,
+        'produit-valider': 11,
+        'produit-annuler': 5,
+        'stock-list': 2,
+        'stock-alertes': 1,
+        'stock-vendre': 10,
+        'stock-vendre-lot': 7,
+        'historiqueventes-list': 2,
+        'historiqueventes-stats': 7,
+        'mouvementstock-list': 2,
+        'archivedproduit-list': 2,
+        'archivedboutique-list': 2,
+        'demandesuppressionproduit-list': 4,  # Contexte de permissions : lecture restreinte aux boutiques
+        'userprofile-list': 2,
+        'archiveduser-list': 2,
+    }
+
+    def setUp(self):
+        self.responsable = User.objects.create_user(username='responsable', password='x')
+        UserProfile.objects.create(user=self.responsable, role='RESPONSABLE')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.responsable)
+        self.modele = Modele.objects.create(modele="Modèle 1", marque=Marque.objects.create(marque="Marque A"))
+        self.numero = 0  # Suffixe des noms uniques
+
+    def suivant(self):
+        self.numero += 1
+        return self.numero
+
+    def creer_boutique(self):
+        numero = self.suivant()
+        boutique = Boutique.objects.create(
+            nom_boutique=f"Boutique {numero}", adresse="adresse", ville="Paris", code_postal="75000",
+            latitude=48.85, longitude=2.35, responsable=self.responsable
+        )
+        boutique.gestionnaires.add(User.objects.create_user(username=f'gest{numero}'))
+        return boutique
+
+    def creer_produit(self, boutiques, quantite=10):
+        produit = Produit.objects.create(
+            nom_produit=f"Produit {self.suivant()}", modele=self.modele, prix=100, couleur="Noir",
+            capacite=128, ram=8, user=self.responsable
+        )
+        stocks = [Stock.objects.create(boutique=boutique, produit=produit, quantite=quantite) for boutique in boutiques]
+        return produit, stocks
+
+    def creer_vendeur(self):
+        vendeur = User.objects.create_user(username=f'vendeur{self.suivant()}')
+        UserProfile.objects.create(user=vendeur, role='GESTIONNAIRE')
+        return vendeur
+
+    def requete_marque_list(self, lignes):
+        Marque.objects.bulk_create([Marque(marque=f"Marque {self.suivant()}") for _ in range(lignes)])
+        return 'get', reverse('marque-list'), None
+
+    def requete_modele_list(self, lignes):
+        for _ in range(lignes):
+            Modele.objects.create(modele=f"Modèle {self.suivant()}", marque=Marque.objects.create(marque=f"Marque {self.numero}"))
+        return 'get', reverse('modele-list'), None
+
+    def requete_boutique_list(self, lignes):
+        for _ in range(lignes):
+            self.creer_boutique()
+        return 'get', reverse('boutique-list'), None
+
+    def requete_boutique_proches(self, lignes):
+        for _ in range(lignes):
+            self.creer_boutique()
+        return 'get', reverse('boutique-proches'), {'lat': 48.85, 'lon': 2.35, 'k': 50}
+
+    def requete_produit_list(self, lignes):
+        boutiques = [self.creer_boutique() for _ in range(2)]
+        for _ in range(lignes):
+            self.creer_produit(boutiques)
+        return 'get', reverse('produit-list'), None
+
+    def requete_produit_detail(self, lignes):
+        produit, _ = self.creer_produit([self.creer_boutique() for _ in range(lignes)])
+        return 'get', reverse('produit-detail', args=[produit.pk]), None
+
+    def demande_suppression(self, lignes):
+        # Produit présent dans ``lignes`` boutiques du responsable
+        produit, _ = self.creer_produit([self.creer_boutique() for _ in range(lignes)])
+        DemandeSuppressionProduit.objects.create(produit=produit, demandeur=self.creer_vendeur(), responsable=self.responsable, raison="Fin de série")
+        return produit
+
+    def requete_produit_valider(self, lignes):
+        return 'post', reverse('produit-valider', args=[self.demande_suppression(lignes).pk]), {'commentaire': 'OK'}
+
+    def requete_produit_annuler(self, lignes):
+        return 'post', reverse('produit-annuler', args=[self.demande_suppression(lignes).pk]), {'commentaire': 'Non'}
+
+    def requete_stock_list(self, lignes):
+        boutique = self.creer_boutique()
+        for _ in range(lignes):
+            self.creer_produit([boutique])
+        return 'get', reverse('stock-list'), None
+
+    def requete_stock_alertes(self, lignes):
+        boutique = self.creer_boutique()
+        for _ in range(lignes):
+            self.creer_produit([boutique], quantite=1)
+        return 'get', reverse('stock-alertes'), None
+
+    def requete_stock_vendre(self, lignes):
+        # Vente de ``lignes`` unités d'un produit présent dans ``lignes`` boutiques
+        _, stocks = self.creer_produit([self.creer_boutique() for _ in range(lignes)], quantite=lignes)
+        return 'post', reverse('stock-vendre', args=[stocks[0].pk]), {'quantite': lignes}
+
+    def requete_stock_vendre_lot(self, lignes):
+        boutique = self.creer_boutique()
+        stocks = [self.creer_produit([boutique])[1][0] for _ in range(lignes)]
+        return 'post', reverse('stock-vendre-lot'), {'lignes': [{'stock_id': stock.pk, 'quantite': 1} for stock in stocks]}
+
+    def creer_ventes(self, lignes):
+        _, stocks = self.creer_produit([self.creer_boutique()], quantite=lignes)
+        for _ in range(lignes):
+            HistoriqueVentes.depuis_stock(stocks[0], 1, self.creer_vendeur()).save()
+        return stocks[0]
+
+    def requete_historiqueventes_list(self, lignes):
+        self.creer_ventes(lignes)
+        return 'get', reverse('historiqueventes-list'), None
+
+    def requete_historiqueventes_stats(self, lignes):
+        self.creer_ventes(lignes)
+        return 'get', reverse('historiqueventes-stats'), None
+
+    def requete_mouvementstock_list(self, lignes):
+        stock = self.creer_ventes(1)
+        MouvementStock.objects.bulk_create([
+            MouvementStock.depuis_stock(stock, 10, 9, 'VENTE', self.creer_vendeur()) for _ in range(lignes)
+        ])
+        return 'get', reverse('mouvementstock-list'), None
+
+    def requete_archivedproduit_list(self, lignes):
+        ArchivedProduit.objects.bulk_create([
+            ArchivedProduit(original_id=index, nom_produit="Produit", marque="Marque A", modele="Modèle 1", prix=100,
+                            couleur="Noir", capacite=128, ram=8, archive_par=self.creer_vendeur(), raison="Épuisé")
+            for index in range(lignes)
+        ])
+        return 'get', reverse('archivedproduit-list'), None
+
+    def requete_archivedboutique_list(self, lignes):
+        ArchivedBoutique.objects.bulk_create([
+            ArchivedBoutique(original_id=index, nom_boutique="Boutique", adresse="adresse", ville="Paris",
+                             code_postal="75000", archive_par=self.creer_vendeur(), raison="Fermeture")
+            for index in range(lignes)
+        ])
+        return 'get', reverse('archivedboutique-list'), None
+
+    def requete_demandesuppressionproduit_list(self, lignes):
+        boutique = self.creer_boutique()
+        for _ in range(lignes):
+            produit, _ = self.creer_produit([boutique])
+            DemandeSuppressionProduit.objects.create(produit=produit, demandeur=self.creer_vendeur(), responsable=self.responsable)
+        return 'get', reverse('demandesuppressionproduit-list'), None
+
+    def requete_userprofile_list(self, lignes):
+        for _ in range(lignes):
+            self.creer_vendeur()
+        return 'get', reverse('userprofile-list'), None
+
+    def requete_archiveduser_list(self, lignes):
+        ArchivedUser.objects.bulk_create([
+            ArchivedUser(original_id=index, username=f'ancien{index}', email=f'ancien{index}@test.com', first_name='A',
+                         last_name='B', role='GESTIONNAIRE', archive_par=self.creer_vendeur(), raison="Départ")
+            for index in range(lignes)
+        ])
+        return 'get', reverse('archiveduser-list'), None
+
+    def compter_requetes(self, route, lignes):
+        # Chaque mesure part de la même base : les lignes créées sont annulées ensuite
+        with transaction.atomic():
+            methode, url, donnees = getattr(self, 'requete_' + route.replace('-', '_'))(lignes)
+            cache.clear()  # Réponses en cache : la mesure porte sur la vue
+            with CaptureQueriesContext(connection) as requetes:
+                response = getattr(self.client, methode)(url, donnees, format='json' if methode == 'post' else None)
+            self.assertLess(response.status_code, 300, f"{route} : {response.status_code} {response.content[:200]!r}")
+            transaction.set_rollback(True)
+        return len(requetes)
+
+    def test_budget_de_requetes_par_route(self):
+        for route, budget in self.BUDGETS.items():
+            with self.subTest(route=route):
+                une_ligne, cinquante_lignes = (self.compter_requetes(route, lignes) for lignes in self.LIGNES)
+                self.assertLessEqual(cinquante_lignes, une_ligne, f"{route} : le nombre de requêtes augmente avec le nombre de lignes")
+                self.assertLessEqual(une_ligne, budget, f"{route} : budget de requêtes dépassé")
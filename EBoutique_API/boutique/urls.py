@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from . import views
+from . import views, vues_async
 
 router = DefaultRouter()
 router.register(r'marques', views.MarqueViewSet)
@@ -11,9 +11,14 @@ router.register(r'stocks', views.StockViewSet)
 router.register(r'archives-produits', views.ArchivedProduitViewSet)
 router.register(r'archives-boutiques', views.ArchivedBoutiqueViewSet)
 router.register(r'historique-ventes', views.HistoriqueVentesViewSet)
-# router.register(r'demandes-suppression', views.DemandeSuppressionProduitViewSet)
+router.register(r'mouvements-stock', views.MouvementStockViewSet)
+router.register(r'demandes-suppression', views.DemandeSuppressionProduitViewSet)
 
 urlpatterns = [
+    # Lectures publiques asynchrones (voir vues_async.py)
+    path('public/boutiques/proches/', vues_async.boutiques_proches, name='public-boutiques-proches'),
+    path('public/produits/', vues_async.catalogue, name='public-catalogue'),
+    path('public/produits/<int:produit_id>/disponibilite/', vues_async.disponibilite_produit, name='public-disponibilite'),
     path('', include(router.urls)),
 ]
 # 
\ No newline at end of file
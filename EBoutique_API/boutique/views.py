@@ -6,28 +6,97 @@ from drf_yasg import openapi
 from .models import (
     Marque, Modele, Boutique, Produit, Stock,
     ArchivedProduit, ArchivedBoutique, HistoriqueVentes,
-    DemandeSuppressionProduit
+    DemandeSuppressionProduit, MouvementStock
 )
 from .serializers import (
     MarqueSerializer, ModeleSerializer, BoutiqueSerializer,
     ProduitSerializer, StockSerializer, ArchivedProduitSerializer,
     ArchivedBoutiqueSerializer, HistoriqueVentesSerializer,
-    DemandeSuppressionProduitSerializer
+    DemandeSuppressionProduitSerializer, MouvementStockSerializer
 )
-from .permissions import EstResponsableBoutique, EstGestionnaireOuResponsable
+from .permissions import EstResponsableBoutique, EstGestionnaireOuResponsable, PorteeBoutiquesMixin, contexte_permissions
+from .geo import k_plus_proches, boite_englobante
+from .alertes import enfiler_alertes
+from .filters import (
+    ProduitFilter, StockFilter, BoutiqueFilter, ArchivedProduitFilter,
+    HistoriqueVentesFilter, ArchivedBoutiqueFilter, DemandeSuppressionProduitFilter
+)
+from .cache import CacheReponsesMixin, invalider_groupes
+from .replica import LectureReplicaMixin
+from .export import ExportMixin, FORMATS_EXPORT, COLONNES_VENTES, COLONNES_STOCKS, COLONNES_ARCHIVES, reponse_export
+from .pagination import PaginationVentes, PaginationArchives, PaginationDemandesSuppression
+from .statistiques import statistiques_ventes, PERIODES
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from django_filters.rest_framework import DjangoFilterBackend
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, When, prefetch_related_objects
 from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from datetime import datetime, time
+
+
+PARAMETRE_MINE = openapi.Parameter(
+    'mine', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, enum=[0, 1],
+    description="mine=1 : uniquement les lignes des boutiques de l'utilisateur"
+)
+
+PARAMETRES_PAGINATION_CURSEUR = [
+    openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Curseur renvoyé dans les liens next / previous'),
+    openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Nombre de résultats par page (100 au maximum)'),
+    openapi.Parameter('total', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, enum=[0, 1], description='total=0 : ne pas calculer count'),
+]
+
+PARAMETRE_FORMAT_EXPORT = openapi.Parameter(
+    'format', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*FORMATS_EXPORT], description='Format du fichier (csv par défaut)'
+)
+
+PARAMETRES_EXPORT = [
+    PARAMETRE_FORMAT_EXPORT,
+    openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de début (ISO 8601)'),
+    openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de fin (ISO 8601)'),
+]
+
+
+def lire_date(valeur, fin_de_journee=False):
+    """
+    Convertit un paramètre de requête (date ou date/heure ISO 8601) en datetime.
+    Une date seule correspond au début (ou à la fin) de la journée. Lève ValueError si invalide.
+    """
+    date_heure = parse_datetime(valeur)
+    if date_heure is None:
+        date = parse_date(valeur)
+        if date is None:
+            raise ValueError(f"Date invalide : {valeur}")
+        date_heure = datetime.combine(date, time.max if fin_de_journee else time.min)
+    if timezone.is_naive(date_heure):
+        date_heure = timezone.make_aware(date_heure)
+    return date_heure
+
+
+def filtrer_periode(queryset, champ, params):
+    """
+    Restreint le queryset aux lignes dont le champ date est compris entre les paramètres
+    from et to (bornes incluses). Lève ValueError si une date est invalide.
+    """
+    if params.get('from'):
+        queryset = queryset.filter(**{f'{champ}__gte': lire_date(params['from'])})
+    if params.get('to'):
+        queryset = queryset.filter(**{f'{champ}__lte': lire_date(params['to'], fin_de_journee=True)})
+    return queryset
 
 # ============================================================================
 # Gestion des marques
 # ============================================================================
-class MarqueViewSet(viewsets.ModelViewSet):
+class MarqueViewSet(LectureReplicaMixin, CacheReponsesMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les marques de téléphones.
     """
     queryset = Marque.objects.all()
     serializer_class = MarqueSerializer
     permission_classes = [IsAuthenticated]
+    groupe_cache = 'marques'
 
     @swagger_auto_schema(
         operation_description="Liste toutes les marques",
@@ -69,13 +138,14 @@ class MarqueViewSet(viewsets.ModelViewSet):
 # ============================================================================
 # Gestion des modèles
 # ============================================================================
-class ModeleViewSet(viewsets.ModelViewSet):
+class ModeleViewSet(LectureReplicaMixin, CacheReponsesMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les modèles de téléphones.
     """
-    queryset = Modele.objects.all()
+    queryset = Modele.objects.select_related('marque')
     serializer_class = ModeleSerializer
     permission_classes = [IsAuthenticated]
+    groupe_cache = 'modeles'
 
     @swagger_auto_schema(
         operation_description="Liste tous les modèles",
@@ -117,13 +187,29 @@ class ModeleViewSet(viewsets.ModelViewSet):
 # ============================================================================
 # Gestion des boutiques
 # ============================================================================
-class BoutiqueViewSet(viewsets.ModelViewSet):
-    queryset = Boutique.objects.all()
+class BoutiqueViewSet(LectureReplicaMixin, PorteeBoutiquesMixin, CacheReponsesMixin, viewsets.ModelViewSet):
+    queryset = BoutiqueSerializer.optimiser_queryset(Boutique.objects.order_by('boutique_id'))
     serializer_class = BoutiqueSerializer
     permission_classes = [EstResponsableBoutique]   
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = BoutiqueFilter
+    ordering_fields = ['nom_boutique', 'ville', 'code_postal', 'date_creation']
+    groupe_cache = 'boutiques'
+    actions_replica = ('list', 'proches')
+    RAYON_DEFAUT_KM = 50  # Rayon de recherche par défaut de l'action proches
+    RAYON_MAX_KM = 1000
+    K_DEFAUT = 5  # Nombre de boutiques retournées par défaut
+    K_MAX = 50
+
+    def boutiques_portee(self, contexte):
+        # Seul le responsable modifie une boutique ; en lecture, mine=1 inclut les boutiques gérées
+        if self.action in self.actions_ecriture:
+            return contexte.boutiques_responsable
+        return contexte.boutiques_gerees
 
     @swagger_auto_schema(
         operation_description="Liste toutes les boutiques",
+        manual_parameters=[PARAMETRE_MINE],
         responses={200: BoutiqueSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -178,14 +264,132 @@ class BoutiqueViewSet(viewsets.ModelViewSet):
         )
         instance.delete()
 
+    @classmethod
+    def parametres_proches(cls, query_params):
+        """
+        Lit et valide les paramètres de la recherche des boutiques proches.
+        Retourne (parametres, None) ou (None, message d'erreur).
+        """
+        try:
+            latitude = float(query_params['lat'])
+            longitude = float(query_params['lon'])
+            rayon = float(query_params.get('rayon', cls.RAYON_DEFAUT_KM))
+            k = int(query_params.get('k', cls.K_DEFAUT))
+            produit_id = query_params.get('produit')
+            produit_id = int(produit_id) if produit_id else None
+        except (KeyError, ValueError):
+            return None, 'Les paramètres lat et lon sont obligatoires et doivent être numériques'
+
+        if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+            return None, 'Coordonnées GPS invalides'
+        if rayon <= 0 or k <= 0:
+            return None, 'Le rayon et k doivent être positifs'
+        return {
+            'latitude': latitude,
+            'longitude': longitude,
+            'rayon': min(rayon, cls.RAYON_MAX_KM),
+            'k': min(k, cls.K_MAX),
+            'produit_id': produit_id,
+        }, None
+
+    @staticmethod
+    def filtre_proches(parametres, cellules):
+        """
+        Filtre des candidats d'une étape de recherche : cellules geohash et boîte englobante.
+        Avec un produit on interroge le stock (préfixe boutique__), sinon directement les boutiques.
+        """
+        prefixe = 'boutique__' if parametres['produit_id'] is not None else ''
+
+        # Filtre grossier sur les coordonnées pour limiter les candidats des grandes cellules
+        lat_min, lat_max, lon_min, lon_max = boite_englobante(
+            parametres['latitude'], parametres['longitude'], parametres['rayon']
+        )
+        filtre = Q(**{f'{prefixe}latitude__gte': lat_min, f'{prefixe}latitude__lte': lat_max})
+        if lon_min is not None:
+            filtre &= Q(**{f'{prefixe}longitude__gte': lon_min, f'{prefixe}longitude__lte': lon_max})
+
+        filtre_cellules = Q()
+        for cellule in cellules:
+            filtre_cellules |= Q(**{f'{prefixe}geohash__startswith': cellule})
+        return filtre & filtre_cellules
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Recherche les boutiques les plus proches ayant le produit en stock",
+        manual_parameters=[
+            openapi.Parameter('lat', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=True, description='Latitude du client'),
+            openapi.Parameter('lon', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=True, description='Longitude du client'),
+            openapi.Parameter('produit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='ID du produit recherché (stock > 0)'),
+            openapi.Parameter('rayon', openapi.IN_QUERY, type=openapi.TYPE_NUMBER, description='Rayon de recherche en km (défaut 50, max 1000)'),
+            openapi.Parameter('k', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Nombre de boutiques retournées (défaut 5, max 50)'),
+        ],
+        responses={
+            200: BoutiqueSerializer(many=True),
+            400: 'Paramètres invalides'
+        }
+    )
+    @action(detail=False, methods=['get'])
+    def proches(self, request):
+        parametres, erreur = self.parametres_proches(request.query_params)
+        if erreur:
+            return Response({'error': erreur}, status=status.HTTP_400_BAD_REQUEST)
+        produit_id = parametres['produit_id']
+
+        def charger_candidats(cellules):
+            filtre = self.filtre_proches(parametres, cellules)
+            if produit_id is not None:
+                stocks = Stock.objects.filter(
+                    filtre, produit_id=produit_id, quantite__gt=0
+                ).select_related('boutique__responsable')
+                candidats = ((stock.boutique, stock.quantite) for stock in stocks)
+            else:
+                boutiques = Boutique.objects.filter(filtre).select_related('responsable')
+                candidats = ((boutique, None) for boutique in boutiques)
+
+            return [
+                ((boutique, quantite), float(boutique.latitude), float(boutique.longitude))
+                for boutique, quantite in candidats
+            ]
+
+        resultats = k_plus_proches(
+            parametres['latitude'], parametres['longitude'], parametres['k'], parametres['rayon'], charger_candidats
+        )
+
+        boutiques = [objet[0] for _, objet in resultats]
+        prefetch_related_objects(boutiques, BoutiqueSerializer.prefetch_gestionnaires())
+
+        data = []
+        for distance, (boutique, quantite) in resultats:
+            representation = BoutiqueSerializer(boutique, context=self.get_serializer_context()).data
+            representation['distance_km'] = round(distance, 3)
+            if quantite is not None:
+                representation['quantite'] = quantite
+            data.append(representation)
+        return Response(data)
+
 # ============================================================================
 # Gestion des produits
 # ============================================================================
-class ProduitViewSet(viewsets.ModelViewSet):
-    queryset = Produit.objects.all()
+class ProduitViewSet(LectureReplicaMixin, PorteeBoutiquesMixin, CacheReponsesMixin, viewsets.ModelViewSet):
+    queryset = ProduitSerializer.optimiser_queryset(Produit.objects.order_by('produit_id'))
     serializer_class = ProduitSerializer
     permission_classes = [EstGestionnaireOuResponsable]
-    
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = ProduitFilter
+    ordering_fields = ['nom_produit', 'prix', 'capacite', 'ram']
+    groupe_cache = 'produits'
+
+    def boutiques_portee(self, contexte):
+        # Les demandes de suppression sont validées ou annulées par le responsable
+        if self.action in ('valider', 'annuler'):
+            return contexte.boutiques_responsable
+        return contexte.boutiques_gerees
+
+    def filtrer_par_boutiques(self, queryset, boutique_ids):
+        # EXISTS sur l'index (boutique, produit) de tb_stock, sans doublons ni DISTINCT
+        return queryset.filter(Exists(
+            Stock.objects.filter(produit=OuterRef('pk'), boutique_id__in=boutique_ids)
+        ))
 
     @swagger_auto_schema(
         operation_description="Crée un nouveau produit",
@@ -197,6 +401,7 @@ class ProduitViewSet(viewsets.ModelViewSet):
 
     @swagger_auto_schema(
         operation_description="Liste tous les produits",
+        manual_parameters=[PARAMETRE_MINE],
         responses={200: ProduitSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -306,7 +511,7 @@ class ProduitViewSet(viewsets.ModelViewSet):
             )
 
         # Vérifier si l'utilisateur est un responsable
-        if not hasattr(request.user, 'profile') or request.user.profile.role != 'RESPONSABLE':
+        if contexte_permissions(request).role != 'RESPONSABLE':
             return Response(
                 {"error": "Seul un responsable peut valider une demande de suppression"},
                 status=status.HTTP_403_FORBIDDEN
@@ -340,11 +545,8 @@ class ProduitViewSet(viewsets.ModelViewSet):
             )
             
         # Vérifier si l'utilisateur est responsable d'au moins une des boutiques du produit
-        is_responsable = False
-        for stock in stocks:
-            if stock.boutique.responsable == request.user:
-                is_responsable = True
-                break
+        # Comparaison des identifiants : les responsables ne sont pas chargés
+        is_responsable = any(stock.boutique.responsable_id == request.user.pk for stock in stocks)
 
         if not is_responsable:
             return Response(
@@ -352,7 +554,7 @@ class ProduitViewSet(viewsets.ModelViewSet):
                     "error": "Vous n'êtes pas le responsable d'une des boutiques de ce produit",
                     "details": {
                         "user_id": request.user.id,
-                        "user_role": request.user.profile.role if hasattr(request.user, 'profile') else None,
+                        "user_role": contexte_permissions(request).role,
                         "boutiques_responsable": [stock.boutique.id for stock in stocks],
                         "boutiques_responsable_names": [stock.boutique.nom_boutique for stock in stocks] if stocks else []
                     }
@@ -414,7 +616,10 @@ class ProduitViewSet(viewsets.ModelViewSet):
             
             # Récupérer la demande de suppression
             try:
-                demande = DemandeSuppressionProduit.objects.get(produit=produit, statut='EN_ATTENTE')
+                demande = DemandeSuppressionProduit.objects.select_related('demandeur', 'responsable').get(
+                    produit=produit, statut='EN_ATTENTE'
+                )
+                demande.produit = produit  # Réutilise le produit déjà chargé avec ses relations
             except DemandeSuppressionProduit.DoesNotExist:
                 return Response(
                     {"error": "Demande de suppression non trouvée ou déjà traitée"},
@@ -428,7 +633,7 @@ class ProduitViewSet(viewsets.ModelViewSet):
         
         # Vérifier que l'utilisateur est bien le responsable
        stocks = produit.stocks.all()
-       is_responsable = any(stock.boutique.responsable == request.user for stock in stocks)
+       is_responsable = any(stock.boutique.responsable_id == request.user.pk for stock in stocks)
         
        if not is_responsable:
             return Response(
@@ -448,14 +653,19 @@ class ProduitViewSet(viewsets.ModelViewSet):
 # ============================================================================
 # Gestion des stocks
 # ============================================================================
-class StockViewSet(viewsets.ModelViewSet):
-    queryset = Stock.objects.all()
+class StockViewSet(ExportMixin, LectureReplicaMixin, PorteeBoutiquesMixin, viewsets.ModelViewSet):
+    queryset = Stock.objects.select_related('boutique', 'produit__modele__marque').order_by('stock_id')
     serializer_class = StockSerializer
     permission_classes = [EstGestionnaireOuResponsable]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = StockFilter
+    ordering_fields = ['quantite', 'seuil_alerte']
     http_method_names = ['get', 'put', 'head', 'options', 'post', ]  # Suppression de 'post' et 'delete'
+    actions_replica = ('list', 'export')
 
     @swagger_auto_schema(
         operation_description="Liste tous les stocks",
+        manual_parameters=[PARAMETRE_MINE],
         responses={200: StockSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -477,7 +687,7 @@ class StockViewSet(viewsets.ModelViewSet):
         return super().update(request, *args, **kwargs)
 
     def get_permissions(self):
-        if self.action in ['vendre', 'update', 'partial_update']:
+        if self.action in ['vendre', 'vendre_lot', 'update', 'partial_update']:
             return [IsAuthenticated(), EstGestionnaireOuResponsable()]
         return []  # Pas de permission requise pour la lecture
 
@@ -494,14 +704,25 @@ class StockViewSet(viewsets.ModelViewSet):
             status=status.HTTP_405_METHOD_NOT_ALLOWED
         )
 
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Exporte les stocks filtrés (fichier CSV ou NDJSON envoyé en flux)",
+        manual_parameters=[PARAMETRE_FORMAT_EXPORT, PARAMETRE_MINE],
+        responses={200: 'Fichier CSV ou NDJSON', 400: 'Paramètres invalides'}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        return reponse_export(request, self.filter_queryset(self.get_queryset()), COLONNES_STOCKS, 'stocks')
+
     @swagger_auto_schema(
         operation_description="Liste les stocks faibles",
+        manual_parameters=[PARAMETRE_MINE],
         responses={200: StockSerializer(many=True)}
     )
     @action(detail=False, methods=['get'])
     def alertes(self, request):
-        seuil = 5  # Valeur de seuil par défaut
-        stocks_faibles = self.queryset.filter(quantite__lt=seuil)
+        # Chaque stock est comparé à son propre seuil d'alerte
+        stocks_faibles = self.get_queryset().filter(quantite__lt=F('seuil_alerte'))
         serializer = self.get_serializer(stocks_faibles, many=True)
         return Response(serializer.data)
 
@@ -518,13 +739,20 @@ class StockViewSet(viewsets.ModelViewSet):
         responses={
             200: StockSerializer(),
             400: 'Quantité invalide ou stock insuffisant',
-            404: 'Stock non trouvé'
+            404: 'Stock non trouvé',
+            409: 'Stock vendu entre-temps par une vente concurrente'
         }
     )
     @action(detail=True, methods=['post'])
     def vendre(self, request, pk=None):
         stock = self.get_object()
-        quantite_a_vendre = int(request.data.get('quantite', 1))
+        try:
+            quantite_a_vendre = int(request.data.get('quantite', 1))
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'La quantité à vendre doit être un entier'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         if quantite_a_vendre <= 0:
             return Response(
@@ -538,37 +766,154 @@ class StockViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Mettre à jour le stock
-        stock.quantite -= quantite_a_vendre    
-        # Archiver le produit deja vendu dans l'historique des ventes pour gerer la traçabilité
-        HistoriqueVentes.objects.create(
-            original_id=stock.produit.produit_id,
-            nom_produit=stock.produit.nom_produit,
-            marque=stock.produit.modele.marque.marque,
-            modele=stock.produit.modele.modele,
-            prix=stock.produit.prix,
-            couleur=stock.produit.couleur,
-            capacite=stock.produit.capacite,
-            ram=stock.produit.ram,
-            vendu_par=request.user,
-            quantite_vendue=quantite_a_vendre,
-            description="Produit vendu et archivé"
-        )
-        stock.save()
+        with transaction.atomic():
+            # Décrément conditionnel en une seule requête : UPDATE ... WHERE quantite >= n
+            # Deux ventes concurrentes ne peuvent pas toutes les deux passer sous zéro
+            vendu = Stock.objects.filter(
+                pk=stock.pk, quantite__gte=quantite_a_vendre
+            ).update(quantite=F('quantite') - quantite_a_vendre)
+            if not vendu:
+                return Response(
+                    {'error': 'Stock insuffisant : le stock a été modifié par une autre vente'},
+                    status=status.HTTP_409_CONFLICT
+                )
+            # Archiver le produit deja vendu dans l'historique des ventes pour gerer la traçabilité
+            HistoriqueVentes.depuis_stock(stock, quantite_a_vendre, request.user).save()
+            # La ligne est verrouillée par l'UPDATE : la quantité relue est exacte
+            stock.refresh_from_db(fields=['quantite'])
+            MouvementStock.depuis_stock(
+                stock, stock.quantite + quantite_a_vendre, stock.quantite, 'VENTE', request.user
+            ).save()
+            enfiler_alertes([stock])
+            # UPDATE direct, sans signal post_save : les quantités affichées par les produits changent
+            invalider_groupes('produits')
+
         serializer = self.get_serializer(stock)
         return Response({'message': 'Produit vendu et dans l\'historique des ventes', 
                          'data': serializer.data}, status=status.HTTP_200_OK)
     
+    @swagger_auto_schema(
+        method='post',
+        operation_description="Vendre un panier de produits en une seule opération (tout ou rien)",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'lignes': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        properties={
+                            'stock_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='ID du stock'),
+                            'quantite': openapi.Schema(type=openapi.TYPE_INTEGER, description='Quantité à vendre')
+                        },
+                        required=['stock_id', 'quantite']
+                    )
+                )
+            },
+            required=['lignes']
+        ),
+        responses={
+            200: StockSerializer(many=True),
+            400: 'Lignes invalides ou stock insuffisant',
+            404: 'Stock non trouvé',
+            409: 'Stock modifié par une vente concurrente'
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='vendre-lot')
+    def vendre_lot(self, request):
+        lignes = request.data if isinstance(request.data, list) else request.data.get('lignes')
+        if not isinstance(lignes, list) or not lignes:
+            return Response(
+                {'error': 'Le panier doit contenir une liste de lignes {stock_id, quantite}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Regrouper les lignes par stock (un même stock peut apparaître plusieurs fois)
+        quantites = {}
+        try:
+            for ligne in lignes:
+                stock_id = int(ligne['stock_id'])
+                quantite = int(ligne.get('quantite', 1))
+                if quantite <= 0:
+                    raise ValueError
+                quantites[stock_id] = quantites.get(stock_id, 0) + quantite
+        except (KeyError, TypeError, ValueError, AttributeError):
+            return Response(
+                {'error': 'Chaque ligne doit contenir un stock_id et une quantité entière positive'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            with transaction.atomic():
+                # Verrouillage des lignes de stock dans un ordre déterministe pour éviter les interblocages
+                stocks = list(
+                    self.get_queryset().select_for_update(of=('self',))
+                    .filter(pk__in=quantites).order_by('pk')
+                )
+                manquants = sorted(set(quantites) - {stock.pk for stock in stocks})
+                if manquants:
+                    return Response(
+                        {'error': 'Stock non trouvé', 'stock_ids': manquants},
+                        status=status.HTTP_404_NOT_FOUND
+                    )
+
+                for stock in stocks:
+                    self.check_object_permissions(request, stock)
+
+                insuffisants = [stock.pk for stock in stocks if stock.quantite < quantites[stock.pk]]
+                if insuffisants:
+                    return Response(
+                        {'error': 'Stock insuffisant', 'stock_ids': insuffisants},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+
+                # Une seule requête UPDATE pour tout le panier
+                Stock.objects.filter(pk__in=quantites).update(quantite=Case(
+                    *[When(pk=stock_id, then=F('quantite') - quantite) for stock_id, quantite in quantites.items()],
+                    default=F('quantite')
+                ))
+                # Une seule requête INSERT pour tout l'historique des ventes
+                HistoriqueVentes.objects.bulk_create([
+                    HistoriqueVentes.depuis_stock(stock, quantites[stock.pk], request.user)
+                    for stock in stocks
+                ])
+                # Les lignes sont verrouillées : les quantités avant/après du journal sont exactes
+                MouvementStock.objects.bulk_create([
+                    MouvementStock.depuis_stock(
+                        stock, stock.quantite, stock.quantite - quantites[stock.pk], 'VENTE', request.user
+                    )
+                    for stock in stocks
+                ])
+                for stock in stocks:
+                    stock.quantite -= quantites[stock.pk]
+                enfiler_alertes(stocks)
+                invalider_groupes('produits')
+        except IntegrityError:
+            # La contrainte quantite >= 0 a refusé la mise à jour : le stock a changé entre-temps
+            return Response(
+                {'error': 'Stock insuffisant : le stock a été modifié par une autre vente'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        serializer = self.get_serializer(stocks, many=True)
+        return Response({'message': 'Panier vendu et dans l\'historique des ventes',
+                         'data': serializer.data}, status=status.HTTP_200_OK)
+
 # ============================================================================
 # Archivage des produits et des boutiques
 # ============================================================================
-class ArchivedProduitViewSet(viewsets.ReadOnlyModelViewSet):
+class ArchivedProduitViewSet(ExportMixin, LectureReplicaMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ArchivedProduit.objects.all()
     serializer_class = ArchivedProduitSerializer
     permission_classes = [EstGestionnaireOuResponsable]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ArchivedProduitFilter
+    pagination_class = PaginationArchives  # Tri imposé (date_archivage, id) par la pagination
+    actions_replica = ('list', 'retrieve', 'export')  # Lectures d'historique : servies par la réplique
 
     @swagger_auto_schema(
-        operation_description="Liste tous les produits archivés",
+        operation_description="Liste tous les produits archivés, du plus récent au plus ancien",
+        manual_parameters=PARAMETRES_PAGINATION_CURSEUR,
         responses={200: ArchivedProduitSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -581,13 +926,32 @@ class ArchivedProduitViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
-class HistoriqueVentesViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = HistoriqueVentes.objects.all()
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Exporte les produits archivés filtrés, du plus ancien au plus récent (fichier CSV ou NDJSON envoyé en flux)",
+        manual_parameters=PARAMETRES_EXPORT,
+        responses={200: 'Fichier CSV ou NDJSON', 400: 'Paramètres invalides'}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        try:
+            archives = filtrer_periode(self.filter_queryset(self.get_queryset()), 'date_archivage', request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return reponse_export(request, archives.order_by('date_archivage', 'id'), COLONNES_ARCHIVES, 'produits-archives')
+
+class HistoriqueVentesViewSet(ExportMixin, LectureReplicaMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = HistoriqueVentes.objects.select_related('vendu_par')  # Vendeur sérialisé avec chaque vente
     serializer_class = HistoriqueVentesSerializer
     permission_classes = [EstGestionnaireOuResponsable]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = HistoriqueVentesFilter
+    pagination_class = PaginationVentes  # Tri imposé (date_vente, id) par la pagination
+    actions_replica = ('list', 'retrieve', 'stats', 'export')  # Lectures d'historique (stats ne consolide pas) : servies par la réplique
 
     @swagger_auto_schema(
-        operation_description="Liste tous les produits deja vendus",
+        operation_description="Liste tous les produits deja vendus, du plus récent au plus ancien",
+        manual_parameters=PARAMETRES_PAGINATION_CURSEUR,
         responses={200: HistoriqueVentesSerializer(many=True)}
     )
     def list(self, request, *args, **kwargs):
@@ -600,10 +964,166 @@ class HistoriqueVentesViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
 
-class ArchivedBoutiqueViewSet(viewsets.ReadOnlyModelViewSet):
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Statistiques des ventes : chiffre d'affaires, unités et meilleurs produits par période, marque, modèle et vendeur",
+        manual_parameters=[
+            openapi.Parameter('periode', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=[*PERIODES], description='Granularité des séries (jour par défaut)'),
+            openapi.Parameter('debut', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de début (ISO 8601)'),
+            openapi.Parameter('fin', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de fin (ISO 8601)'),
+            openapi.Parameter('boutique', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='ID de la boutique'),
+        ],
+        responses={200: 'Statistiques des ventes', 400: 'Paramètres invalides'}
+    )
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        params = request.query_params
+        periode = params.get('periode', 'jour')
+        if periode not in PERIODES:
+            return Response(
+                {'error': f"La période doit être l'une de : {', '.join(PERIODES)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            debut = lire_date(params['debut']) if params.get('debut') else None
+            fin = lire_date(params['fin'], fin_de_journee=True) if params.get('fin') else None
+            boutique_id = int(params['boutique']) if params.get('boutique') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(statistiques_ventes(periode, debut, fin, boutique_id))
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Exporte les ventes filtrées, de la plus ancienne à la plus récente (fichier CSV ou NDJSON envoyé en flux)",
+        manual_parameters=PARAMETRES_EXPORT,
+        responses={200: 'Fichier CSV ou NDJSON', 400: 'Paramètres invalides'}
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        try:
+            ventes = filtrer_periode(self.filter_queryset(self.get_queryset()), 'date_vente', request.query_params)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return reponse_export(request, ventes.order_by('date_vente', 'id'), COLONNES_VENTES, 'ventes')
+
+class DemandeSuppressionProduitViewSet(PorteeBoutiquesMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = DemandeSuppressionProduitSerializer.optimiser_queryset(DemandeSuppressionProduit.objects.all())
+    serializer_class = DemandeSuppressionProduitSerializer
+    permission_classes = [IsAuthenticated, EstGestionnaireOuResponsable]
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = DemandeSuppressionProduitFilter
+    pagination_class = PaginationDemandesSuppression
+
+    def portee_demandee(self):
+        # Les demandes exposent demandeur et responsable : toujours restreintes aux
+        # boutiques de l'utilisateur (hors superuser), en liste comme en détail
+        return not self.request.user.is_superuser
+
+    def filtrer_par_boutiques(self, queryset, boutique_ids):
+        return queryset.filter(Exists(
+            Stock.objects.filter(produit=OuterRef('produit'), boutique_id__in=boutique_ids)
+        ))
+
+    @swagger_auto_schema(
+        operation_description="Liste les demandes de suppression des produits de vos boutiques, de la plus récente à la plus ancienne",
+        manual_parameters=PARAMETRES_PAGINATION_CURSEUR,
+        responses={200: DemandeSuppressionProduitSerializer(many=True)}
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Récupère une demande de suppression par son ID",
+        responses={200: DemandeSuppressionProduitSerializer()}
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class MouvementStockViewSet(LectureReplicaMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = MouvementStock.objects.all()
+    serializer_class = MouvementStockSerializer
+    permission_classes = [EstGestionnaireOuResponsable]
+    actions_replica = ('list', 'retrieve', 'quantite')  # Lectures d'historique : servies par la réplique
+
+    def get_queryset(self):
+        """
+        Filtre le journal par boutique, produit et période (index sur boutique/produit/date).
+        Un paramètre invalide donne une réponse 400, en liste comme en détail.
+        """
+        queryset = super().get_queryset()
+        if getattr(self, 'swagger_fake_view', False):
+            return queryset
+        params = self.request.query_params
+        try:
+            if params.get('boutique'):
+                queryset = queryset.filter(boutique_id=int(params['boutique']))
+            if params.get('produit'):
+                queryset = queryset.filter(produit_id=int(params['produit']))
+            if params.get('debut'):
+                queryset = queryset.filter(date_mouvement__gte=lire_date(params['debut']))
+            if params.get('fin'):
+                queryset = queryset.filter(date_mouvement__lte=lire_date(params['fin'], fin_de_journee=True))
+        except ValueError:
+            raise ValidationError({'error': 'Les paramètres boutique et produit doivent être des identifiants, debut et fin des dates ISO 8601'})
+        return queryset
+
+    @swagger_auto_schema(
+        operation_description="Liste les mouvements de stock (filtres : boutique, produit, debut, fin)",
+        manual_parameters=[
+            openapi.Parameter('boutique', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='ID de la boutique'),
+            openapi.Parameter('produit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='ID du produit'),
+            openapi.Parameter('debut', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de début (ISO 8601)'),
+            openapi.Parameter('fin', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date de fin (ISO 8601)'),
+        ],
+        responses={200: MouvementStockSerializer(many=True)}
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_description="Récupère un mouvement de stock par son ID",
+        responses={200: MouvementStockSerializer()}
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        method='get',
+        operation_description="Quantité en stock d'un produit dans une boutique à une date donnée",
+        manual_parameters=[
+            openapi.Parameter('boutique', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True, description='ID de la boutique'),
+            openapi.Parameter('produit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=True, description='ID du produit'),
+            openapi.Parameter('date', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Date (ISO 8601, maintenant par défaut)'),
+        ],
+        responses={200: 'Quantité reconstituée', 400: 'Paramètres invalides'}
+    )
+    @action(detail=False, methods=['get'])
+    def quantite(self, request):
+        try:
+            boutique_id = int(request.query_params['boutique'])
+            produit_id = int(request.query_params['produit'])
+            date = lire_date(request.query_params['date'], fin_de_journee=True) if request.query_params.get('date') else timezone.now()
+        except (KeyError, ValueError):
+            return Response(
+                {'error': 'Les paramètres boutique et produit sont obligatoires, la date doit être au format ISO 8601'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        return Response({
+            'boutique': boutique_id,
+            'produit': produit_id,
+            'date': date,
+            'quantite': MouvementStock.quantite_a(boutique_id, produit_id, date)
+        })
+
+class ArchivedBoutiqueViewSet(LectureReplicaMixin, viewsets.ReadOnlyModelViewSet):
     queryset = ArchivedBoutique.objects.all()
     serializer_class = ArchivedBoutiqueSerializer
     permission_classes = [EstResponsableBoutique]
+    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filterset_class = ArchivedBoutiqueFilter
+    ordering_fields = ['date_archivage', 'ville']
+    actions_replica = ('list', 'retrieve')  # Lectures d'historique : servies par la réplique
 
     @swagger_auto_schema(
         operation_description="Liste toutes les boutiques archivées",
@@ -0,0 +1,166 @@
+"""
+Endpoints publics en lecture, asynchrones (ORM async : aget, acount, async for).
+
+Servis par le point d'entrée ASGI (SERVER_MODE=asgi), ils n'occupent pas de thread
+pendant l'attente de la base ou d'un client mobile lent : un worker uvicorn sert de
+nombreuses requêtes simultanées. Sous WSGI, Django les exécute dans une boucle
+d'événements par requête ; ils restent fonctionnels.
+
+Ces vues sont de simples vues Django (DRF ne gère pas les vues async) : réponses
+construites à partir de .values(), sans serializer, et accessibles sans jeton
+(catalogue public : ni utilisateur, ni produit en attente de validation).
+"""
+from django.core.files.storage import default_storage
+from django.http import JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from .filters import rechercher_produits
+from .geo import ak_plus_proches
+from .images import representation_variantes
+from .models import Boutique, Produit, Stock
+from .replica import lecture_replica
+from .views import BoutiqueViewSet
+
+CHAMPS_BOUTIQUE = ('boutique_id', 'nom_boutique', 'adresse', 'ville', 'code_postal', 'latitude', 'longitude')
+CHAMPS_PRODUIT = (
+    'produit_id', 'nom_produit', 'prix', 'couleur', 'capacite', 'ram', 'image', 'variantes_image',
+    'modele_id', 'modele__modele', 'modele__marque_id', 'modele__marque__marque',
+)
+TAILLE_PAGE = 20
+TAILLE_PAGE_MAX = 100
+
+
+def _erreur(message, statut=400):
+    return JsonResponse({'error': message}, status=statut)
+
+
+def _entier(query_params, nom, defaut=None):
+    valeur = query_params.get(nom)
+    return int(valeur) if valeur else defaut
+
+
+def _produit(request, ligne):
+    return {
+        'produit_id': ligne['produit_id'],
+        'nom_produit': ligne['nom_produit'],
+        'prix': ligne['prix'],
+        'couleur': ligne['couleur'],
+        'capacite': ligne['capacite'],
+        'ram': ligne['ram'],
+        'image': request.build_absolute_uri(default_storage.url(ligne['image'])) if ligne['image'] else None,
+        'images': representation_variantes(ligne['variantes_image'], ligne['image'], request.build_absolute_uri),
+        'modele': {'id': ligne['modele_id'], 'modele': ligne['modele__modele']},
+        'marque': {'id': ligne['modele__marque_id'], 'marque': ligne['modele__marque__marque']},
+    }
+
+
+@require_safe
+async def boutiques_proches(request):
+    """
+    Boutiques les plus proches d'une position, éventuellement ayant un produit en stock.
+    Mêmes paramètres que /api/boutiques/proches/ (lat, lon, produit, rayon, k).
+    """
+    parametres, erreur = BoutiqueViewSet.parametres_proches(request.GET)
+    if erreur:
+        return _erreur(erreur)
+    produit_id = parametres['produit_id']
+
+    async def charger_candidats(cellules):
+        filtre = BoutiqueViewSet.filtre_proches(parametres, cellules)
+        if produit_id is not None:
+            lignes = Stock.objects.filter(filtre, produit_id=produit_id, quantite__gt=0).values(
+                'quantite', *(f'boutique__{champ}' for champ in CHAMPS_BOUTIQUE)
+            )
+            boutiques = [
+                ({champ: ligne[f'boutique__{champ}'] for champ in CHAMPS_BOUTIQUE}, ligne['quantite'])
+                async for ligne in lignes
+            ]
+        else:
+            boutiques = [(ligne, None) async for ligne in Boutique.objects.filter(filtre).values(*CHAMPS_BOUTIQUE)]
+        return [
+            ((boutique, quantite), float(boutique['latitude']), float(boutique['longitude']))
+            for boutique, quantite in boutiques
+        ]
+
+    with lecture_replica():
+        resultats = await ak_plus_proches(
+            parametres['latitude'], parametres['longitude'], parametres['k'], parametres['rayon'], charger_candidats
+        )
+
+    data = []
+    for distance, (boutique, quantite) in resultats:
+        boutique['distance_km'] = round(distance, 3)
+        if quantite is not None:
+            boutique['quantite'] = quantite
+        data.append(boutique)
+    return JsonResponse(data, safe=False)
+
+
+@require_safe
+async def catalogue(request):
+    """
+    Catalogue des produits validés, paginé par numéro de page.
+    Paramètres : search, marque, modele, page, page_size (max 100), total=0 pour ne pas compter.
+    """
+    try:
+        marque = _entier(request.GET, 'marque')
+        modele = _entier(request.GET, 'modele')
+        page = max(1, _entier(request.GET, 'page', 1))
+        taille = max(1, min(_entier(request.GET, 'page_size', TAILLE_PAGE), TAILLE_PAGE_MAX))
+    except ValueError:
+        return _erreur('Les paramètres marque, modele, page et page_size doivent être entiers')
+
+    produits = Produit.objects.filter(validation_responsable=True).order_by('produit_id')
+    if marque is not None:
+        produits = produits.filter(modele__marque_id=marque)
+    if modele is not None:
+        produits = produits.filter(modele_id=modele)
+    produits = rechercher_produits(produits, request.GET.get('search', ''))
+
+    debut = (page - 1) * taille
+    with lecture_replica():
+        total = await produits.acount() if request.GET.get('total') != '0' else None
+        # Une ligne de plus pour savoir s'il existe une page suivante
+        lignes = [ligne async for ligne in produits.values(*CHAMPS_PRODUIT)[debut:debut + taille + 1]]
+
+    url = request.build_absolute_uri()
+    suivant = replace_query_param(url, 'page', page + 1) if len(lignes) > taille else None
+    if page == 1:
+        precedent = None
+    elif page == 2:
+        precedent = remove_query_param(url, 'page')
+    else:
+        precedent = replace_query_param(url, 'page', page - 1)
+    return JsonResponse({
+        'count': total,
+        'next': suivant,
+        'previous': precedent,
+        'results': [_produit(request, ligne) for ligne in lignes[:taille]],
+    })
+
+
+@require_safe
+async def disponibilite_produit(request, produit_id):
+    """
+    Disponibilité d'un produit validé : quantité totale et boutiques qui l'ont en stock.
+    """
+    with lecture_replica():
+        try:
+            produit = await Produit.objects.filter(validation_responsable=True).values(*CHAMPS_PRODUIT).aget(pk=produit_id)
+        except Produit.DoesNotExist:
+            return _erreur('Produit introuvable', statut=404)
+
+        stocks = Stock.objects.filter(produit_id=produit_id, quantite__gt=0)
+        boutiques = [
+            {champ: ligne[f'boutique__{champ}'] for champ in CHAMPS_BOUTIQUE} | {'quantite': ligne['quantite']}
+            async for ligne in stocks.order_by('boutique_id').values(
+                'quantite', *(f'boutique__{champ}' for champ in CHAMPS_BOUTIQUE)
+            )
+        ]
+
+    return JsonResponse({
+        **_produit(request, produit),
+        'quantite_totale': sum(boutique['quantite'] for boutique in boutiques),
+        'boutiques': boutiques,
+    })
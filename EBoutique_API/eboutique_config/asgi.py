@@ -9,8 +9,11 @@ https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 
 import os
 
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eboutique_config.settings')
 
-application = get_asgi_application()
+# Fichiers statiques (admin, Swagger UI) servis sans middleware synchrone :
+# les vues async (boutique/vues_async.py) restent dans la boucle d'événements
+application = ASGIStaticFilesHandler(get_asgi_application())
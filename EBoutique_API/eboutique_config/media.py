@@ -0,0 +1,99 @@
+"""
+Fichiers envoyés (images des produits) : stockage dédoublonné et envoi délégué au serveur frontal.
+
+Chaque fichier est enregistré sous le condensat SHA-256 de son contenu
+(produits/3f2a…c9.jpg) : une même photo réutilisée par des centaines de produits
+n'occupe qu'un fichier, et un nom ne désigne jamais qu'un seul contenu. Les réponses
+peuvent donc être mises en cache indéfiniment (Cache-Control immutable, ETag = condensat).
+
+La vue servir_media se contente de vérifier la demande (dossier public, chemin sûr) ;
+selon MEDIA_ENVOI, le fichier est envoyé par :
+- django     : FileResponse (développement) ;
+- x-accel    : nginx, via l'en-tête X-Accel-Redirect vers une location internal ;
+- x-sendfile : Apache (mod_xsendfile) ou lighttpd, via l'en-tête X-Sendfile.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_safe
+
+LONGUEUR_CONDENSAT = 32  # Caractères hexadécimaux conservés (128 bits)
+NOM_CONDENSAT = re.compile(rf'^([0-9a-f]{{{LONGUEUR_CONDENSAT}}})\.[a-z0-9]+$')
+CACHE_IMMUABLE = 'public, max-age=31536000, immutable'
+CACHE_COURT = 'public, max-age=3600'  # Anciens fichiers nommés librement : leur contenu peut changer
+
+
+class StockageContenuHache(FileSystemStorage):
+    """
+    Stockage local qui nomme chaque fichier d'après le condensat de son contenu.
+    Le dossier et l'extension du nom demandé sont conservés ; enregistrer un contenu
+    déjà présent renvoie le nom existant sans rien écrire.
+    """
+    def nom_contenu(self, name, content):
+        condensat = hashlib.sha256()
+        for morceau in content.chunks():
+            condensat.update(morceau)
+        content.seek(0)
+        dossier, fichier = posixpath.split(name)
+        extension = os.path.splitext(fichier)[1].lower()
+        return posixpath.join(dossier, condensat.hexdigest()[:LONGUEUR_CONDENSAT] + extension)
+
+    def _save(self, name, content):
+        name = self.nom_contenu(name, content)
+        if self.exists(name):
+            return name  # Contenu déjà stocké : un seul fichier pour toutes les références
+        return super()._save(name, content)
+
+
+def _entetes_cache(response, nom_fichier):
+    correspondance = NOM_CONDENSAT.match(nom_fichier)
+    if correspondance:
+        response['Cache-Control'] = CACHE_IMMUABLE
+        response['ETag'] = quote_etag(correspondance.group(1))
+    else:
+        response['Cache-Control'] = CACHE_COURT
+    return response
+
+
+@require_safe
+def servir_media(request, chemin):
+    """
+    Envoie un fichier de MEDIA_ROOT appartenant à un dossier public (MEDIA_DOSSIERS_PUBLICS).
+    Les noms issus d'un condensat ne changent jamais de contenu : un client qui renvoie
+    If-None-Match reçoit un 304 sans que le fichier soit lu.
+    """
+    chemin = posixpath.normpath(chemin).lstrip('/')
+    if chemin.split('/', 1)[0] not in settings.MEDIA_DOSSIERS_PUBLICS:
+        raise Http404
+    try:
+        chemin_complet = safe_join(settings.MEDIA_ROOT, chemin)
+    except ValueError:  # Chemin qui sort de MEDIA_ROOT
+        raise Http404
+
+    nom_fichier = posixpath.basename(chemin)
+    correspondance = NOM_CONDENSAT.match(nom_fichier)
+    if correspondance and quote_etag(correspondance.group(1)) in request.headers.get('If-None-Match', ''):
+        return _entetes_cache(HttpResponseNotModified(), nom_fichier)
+
+    envoi = settings.MEDIA_ENVOI
+    if envoi == 'django':
+        if not os.path.isfile(chemin_complet):
+            raise Http404
+        response = FileResponse(open(chemin_complet, 'rb'))
+    else:
+        # Le serveur frontal lit et envoie le fichier : aucun accès disque côté Django
+        response = HttpResponse(content_type=mimetypes.guess_type(nom_fichier)[0] or 'application/octet-stream')
+        if envoi == 'x-accel':
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIXE + quote(chemin)
+        else:
+            response['X-Sendfile'] = chemin_complet
+    return _entetes_cache(response, nom_fichier)
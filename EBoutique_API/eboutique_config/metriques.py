@@ -0,0 +1,322 @@
+"""
+Instrumentation des requêtes : nombre de requêtes SQL, temps base de données, temps de
+sérialisation et temps total.
+
+Activée par METRIQUES_ACTIF, MetriquesMiddleware mesure chaque requête, ajoute un
+en-tête Server-Timing à la réponse et agrège les mesures en histogrammes par route
+(viewset et action, ex. StockViewSet.vendre), exposés au format texte Prometheus sur
+/metrics.
+
+Les histogrammes sont tenus en mémoire par processus. Avec plusieurs workers gunicorn,
+chaque processus écrit périodiquement un instantané dans METRIQUES_DOSSIER ; /metrics
+additionne les instantanés de tous les workers (vidé au démarrage par gunicorn.conf.py).
+"""
+from bisect import bisect_left
+from contextvars import ContextVar
+import json
+import os
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.views.decorators.http import require_safe
+
+BORNES_SECONDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BORNES_REQUETES_SQL = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+HISTOGRAMMES = {
+    # nom : (description, bornes)
+    'eboutique_requete_duree_secondes': ("Durée totale de traitement des requêtes", BORNES_SECONDES),
+    'eboutique_requete_bdd_secondes': ("Temps passé dans la base de données par requête", BORNES_SECONDES),
+    'eboutique_requete_serialisation_secondes': ("Temps passé dans les serializers par requête", BORNES_SECONDES),
+    'eboutique_requete_sql_nombre': ("Nombre de requêtes SQL par requête", BORNES_REQUETES_SQL),
+}
+COMPTEUR_REPONSES = 'eboutique_reponses_total'
+INTERVALLE_INSTANTANE = 5  # Secondes entre deux écritures de l'instantané d'un worker
+
+_mesure = ContextVar('mesure_requete', default=None)
+
+
+class Mesure:
+    __slots__ = ('requetes_sql', 'bdd', 'serialisation', 'profondeur')
+
+    def __init__(self):
+        self.requetes_sql = 0
+        self.bdd = 0.0
+        self.serialisation = 0.0
+        self.profondeur = 0  # Serializers imbriqués : seul le plus externe est chronométré
+
+
+class Registre:
+    """
+    Histogrammes et compteurs du processus, indexés par (métrique, route).
+    Les compteurs des histogrammes ne sont pas cumulés (cumul à l'exposition).
+    """
+    def __init__(self):
+        self.verrou = threading.Lock()
+        self.histogrammes = {}  # (nom, route) -> [compteurs par borne + dépassement, somme]
+        self.reponses = {}  # (route, statut) -> nombre
+        self.derniere_ecriture = time.monotonic()
+
+    def enregistrer(self, route, statut, valeurs):
+        with self.verrou:
+            for nom, valeur in valeurs.items():
+                bornes = HISTOGRAMMES[nom][1]
+                histogramme = self.histogrammes.get((nom, route))
+                if histogramme is None:
+                    histogramme = self.histogrammes[(nom, route)] = [[0] * (len(bornes) + 1), 0.0]
+                histogramme[0][bisect_left(bornes, valeur)] += 1
+                histogramme[1] += valeur
+            cle = (route, statut)
+            self.reponses[cle] = self.reponses.get(cle, 0) + 1
+
+    def instantane(self):
+        with self.verrou:
+            return {
+                'histogrammes': [[nom, route, list(compteurs), somme] for (nom, route), (compteurs, somme) in self.histogrammes.items()],
+                'reponses': [[route, statut, nombre] for (route, statut), nombre in self.reponses.items()],
+            }
+
+    def ecrire_instantane(self, dossier, force=False):
+        """
+        Écrit l'instantané du processus dans le dossier partagé (au plus toutes les
+        INTERVALLE_INSTANTANE secondes, sauf si force).
+        """
+        maintenant = time.monotonic()
+        if not force and maintenant - self.derniere_ecriture < INTERVALLE_INSTANTANE:
+            return
+        self.derniere_ecriture = maintenant
+        chemin = os.path.join(dossier, f'metriques-{os.getpid()}.json')
+        with open(chemin + '.tmp', 'w') as fichier:
+            json.dump(self.instantane(), fichier)
+        os.replace(chemin + '.tmp', chemin)  # Remplacement atomique : jamais de fichier à moitié écrit
+
+
+registre = Registre()
+
+
+def _chronometrer_bdd(execute, sql, params, many, context):
+    # Toujours installé : seules les requêtes exécutées pendant une requête HTTP mesurée
+    # sont comptées. La ContextVar suit sync_to_async, donc aussi sous ASGI
+    mesure = _mesure.get()
+    if mesure is None:
+        return execute(sql, params, many, context)
+    debut = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        mesure.bdd += time.perf_counter() - debut
+        mesure.requetes_sql += 1
+
+
+def _instrumenter_connexion(connection, **kwargs):
+    """
+    Installe le chronomètre sur une connexion. Les connexions sont propres à chaque
+    thread : sous ASGI, les vues synchrones et l'ORM async interrogent la base depuis
+    les threads de sync_to_async, pas depuis celui de la boucle d'événements.
+    """
+    if _chronometrer_bdd not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_chronometrer_bdd)
+
+
+# Toute connexion ouverte après le chargement du module, quel que soit son thread
+connection_created.connect(_instrumenter_connexion, dispatch_uid='metriques_chronometre_bdd')
+
+
+def _installer_mesure_serialisation():
+    """
+    Chronomètre BaseSerializer.data, point d'entrée de toute sérialisation DRF.
+    """
+    from rest_framework import serializers
+
+    data = serializers.BaseSerializer.data
+    if getattr(data.fget, 'chronometre', False):
+        return
+
+    def data_chronometree(serializer):
+        mesure = _mesure.get()
+        if mesure is None:
+            return data.fget(serializer)
+        mesure.profondeur += 1
+        debut = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            mesure.profondeur -= 1
+            if not mesure.profondeur:
+                mesure.serialisation += time.perf_counter() - debut
+
+    data_chronometree.chronometre = True
+    serializers.BaseSerializer.data = property(data_chronometree)
+
+
+def nom_route(request):
+    """
+    Libellé de la route : Viewset.action pour les viewsets DRF, Vue.methode pour les
+    APIView, nom de la fonction pour les vues Django ; 'non_resolue' sinon.
+    """
+    correspondance = getattr(request, 'resolver_match', None)
+    if correspondance is None:
+        return 'non_resolue'
+    vue = correspondance.func
+    classe = getattr(vue, 'cls', None) or getattr(vue, 'view_class', None)
+    if classe is None:
+        return getattr(vue, '__name__', 'vue')
+    methode = request.method.lower()
+    actions = getattr(vue, 'actions', None)
+    action = actions.get(methode, methode) if actions else methode
+    return f'{classe.__name__}.{action}'
+
+
+class MetriquesMiddleware:
+    """
+    Mesure chaque requête (SQL, base, sérialisation, total), ajoute l'en-tête
+    Server-Timing et alimente le registre. Compatible WSGI et ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.mode_async = iscoroutinefunction(get_response)
+        if self.mode_async:
+            markcoroutinefunction(self)
+        _installer_mesure_serialisation()
+        # Connexions déjà ouvertes dans ce thread (vérifications au démarrage)
+        for connection in connections.all(initialized_only=True):
+            _instrumenter_connexion(connection)
+
+    def __call__(self, request):
+        if self.mode_async:
+            return self.__acall__(request)
+        mesure, debut = Mesure(), time.perf_counter()
+        jeton = _mesure.set(mesure)
+        try:
+            response = self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+        return self.terminer(request, response, mesure, time.perf_counter() - debut)
+
+    async def __acall__(self, request):
+        mesure, debut = Mesure(), time.perf_counter()
+        jeton = _mesure.set(mesure)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _mesure.reset(jeton)
+        return self.terminer(request, response, mesure, time.perf_counter() - debut)
+
+    def terminer(self, request, response, mesure, total):
+        if 'Server-Timing' not in response:
+            response['Server-Timing'] = (
+                f'bdd;dur={mesure.bdd * 1000:.1f};desc="{mesure.requetes_sql} SQL", '
+                f'serialisation;dur={mesure.serialisation * 1000:.1f}, '
+                f'total;dur={total * 1000:.1f}'
+            )
+        registre.enregistrer(nom_route(request), response.status_code, {
+            'eboutique_requete_duree_secondes': total,
+            'eboutique_requete_bdd_secondes': mesure.bdd,
+            'eboutique_requete_serialisation_secondes': mesure.serialisation,
+            'eboutique_requete_sql_nombre': mesure.requetes_sql,
+        })
+        if settings.METRIQUES_DOSSIER:
+            registre.ecrire_instantane(settings.METRIQUES_DOSSIER)
+        return response
+
+
+def _instantanes():
+    """
+    Instantané du processus courant et, si METRIQUES_DOSSIER est défini, ceux des autres workers.
+    """
+    dossier = settings.METRIQUES_DOSSIER
+    if not dossier:
+        return [registre.instantane()]
+    registre.ecrire_instantane(dossier, force=True)
+    instantanes = []
+    for fichier in os.listdir(dossier):
+        if fichier.startswith('metriques-') and fichier.endswith('.json'):
+            try:
+                with open(os.path.join(dossier, fichier)) as contenu:
+                    instantanes.append(json.load(contenu))
+            except (OSError, ValueError):
+                continue  # Fichier en cours de remplacement ou supprimé
+    return instantanes
+
+
+def _additionner(instantanes):
+    histogrammes, reponses = {}, {}
+    for instantane in instantanes:
+        for nom, route, compteurs, somme in instantane['histogrammes']:
+            cumul = histogrammes.setdefault((nom, route), [[0] * len(compteurs), 0.0])
+            cumul[0] = [a + b for a, b in zip(cumul[0], compteurs)]
+            cumul[1] += somme
+        for route, statut, nombre in instantane['reponses']:
+            reponses[(route, statut)] = reponses.get((route, statut), 0) + nombre
+    return histogrammes, reponses
+
+
+def archiver_instantane(dossier, pid):
+    """
+    Ajoute l'instantané d'un worker terminé à metriques-archive.json puis le supprime :
+    les compteurs ne diminuent pas et le dossier ne grossit pas au fil des recyclages
+    de workers (appelé par le maître gunicorn, child_exit).
+    """
+    chemin = os.path.join(dossier, f'metriques-{pid}.json')
+    archive = os.path.join(dossier, 'metriques-archive.json')
+    instantanes = []
+    for fichier in (archive, chemin):
+        try:
+            with open(fichier) as contenu:
+                instantanes.append(json.load(contenu))
+        except (OSError, ValueError):
+            continue
+    histogrammes, reponses = _additionner(instantanes)
+    with open(archive + '.tmp', 'w') as fichier:
+        json.dump({
+            'histogrammes': [[nom, route, compteurs, somme] for (nom, route), (compteurs, somme) in histogrammes.items()],
+            'reponses': [[route, statut, nombre] for (route, statut), nombre in reponses.items()],
+        }, fichier)
+    os.replace(archive + '.tmp', archive)
+    if os.path.exists(chemin):
+        os.remove(chemin)
+
+
+def _etiquette(valeur):
+    return str(valeur).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def exposition_prometheus(instantanes):
+    """
+    Additionne les instantanés et les met au format texte d'exposition Prometheus (0.0.4).
+    """
+    histogrammes, reponses = _additionner(instantanes)
+    lignes = []
+    for nom, (description, bornes) in HISTOGRAMMES.items():
+        lignes += [f'# HELP {nom} {description}', f'# TYPE {nom} histogram']
+        for (nom_histogramme, route), (compteurs, somme) in sorted(histogrammes.items()):
+            if nom_histogramme != nom:
+                continue
+            route = _etiquette(route)
+            cumul = 0
+            for borne, compteur in zip((*bornes, '+Inf'), compteurs):
+                cumul += compteur
+                lignes.append(f'{nom}_bucket{{route="{route}",le="{borne}"}} {cumul}')
+            lignes.append(f'{nom}_sum{{route="{route}"}} {somme}')
+            lignes.append(f'{nom}_count{{route="{route}"}} {cumul}')
+    lignes += [f'# HELP {COMPTEUR_REPONSES} Réponses par route et code HTTP', f'# TYPE {COMPTEUR_REPONSES} counter']
+    for (route, statut), nombre in sorted(reponses.items()):
+        lignes.append(f'{COMPTEUR_REPONSES}{{route="{_etiquette(route)}",statut="{statut}"}} {nombre}')
+    return '\n'.join(lignes) + '\n'
+
+
+@require_safe
+def metriques(request):
+    """
+    Métriques des requêtes au format texte Prometheus.
+    """
+    return HttpResponse(
+        exposition_prometheus(_instantanes()), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,81 @@
+"""
+Schéma OpenAPI de l'API, précalculé.
+
+Le schéma complet (tous les @swagger_auto_schema et serializers imbriqués) coûte
+cher à générer. ``manage.py generer_schema_openapi`` l'écrit sur disque au build
+(SCHEMA_OPENAPI_DIR) ; les vues ci-dessous servent ces fichiers tels quels avec un
+ETag fort. Si le fichier est absent, le schéma est généré une seule fois par
+processus puis gardé en mémoire.
+"""
+import hashlib
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.views.decorators.http import require_safe
+from drf_yasg import openapi
+from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+from drf_yasg.generators import OpenAPISchemaGenerator
+
+api_info = openapi.Info(
+    title="EBoutique FREE API",
+    default_version='v1',
+    description="""
+API pour la gestion des boutiques de téléphones free les plus proches de vous.
+
+## Authentification
+Pour utiliser l'API  afin d'avoir accès aux endpoints lies a la gestion des boutiques, produits, stocks, etc (requete POST, PUT, DELETE) il faut :
+1. Obtenez un token JWT via `/api/token/`
+2. Cliquez sur le bouton 'Authorize' en haut
+3. Collez simplement votre token JWT (avec le préfixe Bearer suivi d'un espace)
+""",
+    terms_of_service="https://www.google.com/policies/terms/",
+    contact=openapi.Contact(email="contact@eboutique.com"),
+    license=openapi.License(name="MIT License"),
+)
+
+FORMATS = {
+    '.json': ('openapi.json', 'application/json', OpenAPICodecJson),
+    '.yaml': ('openapi.yaml', 'application/yaml', OpenAPICodecYaml),
+}
+
+_schemas = {}  # Cache du processus : format -> (contenu, etag)
+
+
+def generer_schema(format):
+    """
+    Génère le schéma public complet, sans requête (pas de filtrage par utilisateur).
+    """
+    _, _, codec = FORMATS[format]
+    schema = OpenAPISchemaGenerator(api_info).get_schema(request=None, public=True)
+    return codec(validators=[]).encode(schema)
+
+
+def chemin_schema(format):
+    return Path(settings.SCHEMA_OPENAPI_DIR) / FORMATS[format][0]
+
+
+def schema_openapi_en_cache(format):
+    """
+    Retourne (contenu, etag) : le fichier précalculé s'il existe, sinon le schéma
+    généré à la première demande. Le résultat est gardé pour la durée du processus.
+    """
+    if format not in _schemas:
+        chemin = chemin_schema(format)
+        contenu = chemin.read_bytes() if chemin.is_file() else generer_schema(format)
+        _schemas[format] = (contenu, '"{}"'.format(hashlib.sha256(contenu).hexdigest()))
+    return _schemas[format]
+
+
+@require_safe
+def schema_openapi(request, format):
+    if format not in FORMATS:
+        raise Http404
+    contenu, etag = schema_openapi_en_cache(format)
+    if etag in [valeur.strip() for valeur in request.headers.get('If-None-Match', '').split(',')]:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(contenu, content_type=FORMATS[format][1])
+    response['ETag'] = etag
+    response['Cache-Control'] = f'public, max-age={settings.SCHEMA_OPENAPI_MAX_AGE}'
+    return response
@@ -31,7 +31,8 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DEBUG', 'False') == 'True'
 
-ALLOWED_HOSTS = []
+# Liste séparée par des virgules (ex. api.eboutique.com,localhost)
+ALLOWED_HOSTS = [hote.strip() for hote in os.getenv('ALLOWED_HOSTS', 'localhost,127.0.0.1').split(',') if hote.strip()]
 
 
 # Application definition
@@ -68,6 +69,18 @@ MIDDLEWARE = [
 
 ]
 
+if os.getenv('SERVER_MODE') != 'asgi':
+    # Fichiers statiques (admin, Swagger UI) hors runserver. WhiteNoise n'est pas compatible async :
+    # en ASGI il forcerait chaque requête à repasser par un thread, les statiques y sont servis par asgi.py
+    MIDDLEWARE.insert(1, "whitenoise.middleware.WhiteNoiseMiddleware")
+
+# Mesure des requêtes (SQL, temps base, sérialisation) : en-tête Server-Timing et /metrics
+METRIQUES_ACTIF = os.getenv('METRIQUES_ACTIF', 'True') == 'True'
+# Dossier partagé par les workers gunicorn pour agréger leurs métriques (un seul processus sinon)
+METRIQUES_DOSSIER = os.getenv('METRIQUES_DOSSIER')
+if METRIQUES_ACTIF:
+    MIDDLEWARE.insert(0, "eboutique_config.metriques.MetriquesMiddleware")
+
 ROOT_URLCONF = "eboutique_config.urls"
 
 TEMPLATES = [
@@ -91,17 +104,57 @@ WSGI_APPLICATION = "eboutique_config.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DB_ENGINE permet d'utiliser SQLite pour les tests locaux (django.db.backends.sqlite3)
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": os.getenv('DB_ENGINE', "django.db.backends.postgresql"),
         "NAME": os.getenv('DB_NAME'),
         "USER": os.getenv('DB_USER'),
         "PASSWORD": os.getenv('DB_PASSWORD'),
         "HOST": os.getenv('DB_HOST'),
-        "PORT": 5432
+        "PORT": int(os.getenv('DB_PORT', 5432)),
+        # Connexions persistantes entre requêtes (0 : une connexion par requête), vérifiées avant réutilisation.
+        # Désactivées par défaut en ASGI : les connexions y sont ouvertes par thread et ne seraient pas réutilisées.
+        "CONN_MAX_AGE": int(os.getenv('DB_CONN_MAX_AGE', 0 if os.getenv('SERVER_MODE') == 'asgi' else 60)),
+        "CONN_HEALTH_CHECKS": os.getenv('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+        "OPTIONS": {},
     }
 }
 
+if os.getenv('DB_POOL', 'False') == 'True':
+    # Pool natif de psycopg 3 (paquets psycopg et psycopg-pool) : un pool par processus,
+    # incompatible avec les connexions persistantes, qu'il remplace
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"]["pool"] = {
+        "min_size": int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        "max_size": int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        "timeout": float(os.getenv('DB_POOL_TIMEOUT', 10)),  # Attente maximale d'une connexion libre (s)
+        "max_idle": float(os.getenv('DB_POOL_MAX_IDLE', 600)),
+        "max_lifetime": float(os.getenv('DB_POOL_MAX_LIFETIME', 3600)),
+    }
+
+if os.getenv('DB_REPLICA_HOST'):
+    # Réplique en lecture seule : listes, archives et historique (boutique.replica)
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv('DB_REPLICA_HOST'),
+        "PORT": int(os.getenv('DB_REPLICA_PORT', DATABASES["default"]["PORT"])),
+        "OPTIONS": dict(DATABASES["default"]["OPTIONS"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["boutique.replica.RouteurReplica"]
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    # Recherche du catalogue par similarité de trigrammes (lookups trigram_word_similar)
+    INSTALLED_APPS.append("django.contrib.postgres")
+
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # SQLite sert de base locale pour les tests : base de test sur fichier (partagée entre threads),
+    # attente des verrous et verrou d'écriture pris dès le début de chaque transaction
+    DATABASES["default"]["OPTIONS"] = {"timeout": 20, "transaction_mode": "IMMEDIATE"}
+    DATABASES["default"]["TEST"] = {"NAME": BASE_DIR / "test_db.sqlite3"}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,6 +199,21 @@ CORS_ALLOWED_ORIGINS = [
 # https://docs.djangoproject.com/en/5.2/howto/static-files/
 
 STATIC_URL = "static/"
+STATIC_ROOT = BASE_DIR / "staticfiles"  # Rempli par collectstatic au build de l'image
+
+# Fichiers envoyés (images des produits), nommés d'après le condensat de leur contenu :
+# voir eboutique_config/media.py
+MEDIA_URL = os.getenv('MEDIA_URL', 'media/')
+MEDIA_ROOT = Path(os.getenv('MEDIA_ROOT', BASE_DIR / "media"))
+MEDIA_DOSSIERS_PUBLICS = ['produits']  # Seuls dossiers servis par /media/
+# Envoi des fichiers : django (FileResponse), x-accel (nginx) ou x-sendfile (Apache, lighttpd)
+MEDIA_ENVOI = os.getenv('MEDIA_ENVOI', 'django')
+MEDIA_ACCEL_PREFIXE = os.getenv('MEDIA_ACCEL_PREFIXE', '/media-interne/')  # location internal de nginx
+
+STORAGES = {
+    "default": {"BACKEND": "eboutique_config.media.StockageContenuHache"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
@@ -154,7 +222,8 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Lectures authentifiées sans requête base : voir free_app/authentication.py
+        'free_app.authentication.JWTSansRequeteAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -168,7 +237,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
     'ROTATE_REFRESH_TOKENS': False,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    'UPDATE_LAST_LOGIN': os.getenv('JWT_UPDATE_LAST_LOGIN', 'False') == 'True',  # Évite un UPDATE à chaque connexion
+    'TOKEN_USER_CLASS': 'free_app.authentication.UtilisateurJeton',
     'AUTH_HEADER_TYPES': ('Bearer',),
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
@@ -176,6 +246,35 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# Durée de mise en cache de la version des jetons JWT (délai maximal de révocation
+# lorsque le cache n'est pas partagé entre les workers)
+JWT_VERSION_CACHE_SECONDS = int(os.getenv('JWT_VERSION_CACHE_SECONDS', 60))
+
+# Cache : mémoire locale par défaut (tests, développement), backend partagé en production
+# (ex. CACHE_BACKEND=django.core.cache.backends.redis.RedisCache, CACHE_LOCATION=redis://redis:6379/1)
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'eboutique'),
+    }
+}
+
+# Cache des réponses de lecture du catalogue (marques, modèles, produits, boutiques)
+CACHE_REPONSES_ACTIF = os.getenv('CACHE_REPONSES_ACTIF', 'True') == 'True'
+CACHE_REPONSES_SECONDS = int(os.getenv('CACHE_REPONSES_SECONDS', 300))
+
+# Emails (alertes de stock)
+EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
+EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
+EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
+EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
+EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'False') == 'True'
+DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'noreply@eboutique.com')
+
+# Une seule alerte par couple (boutique, produit) pendant cette durée
+STOCK_ALERT_WINDOW_MINUTES = int(os.getenv('STOCK_ALERT_WINDOW_MINUTES', 60))
+
 # Configuration Swagger/OpenAPI
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -192,5 +291,15 @@ SWAGGER_SETTINGS = {
     'JSON_EDITOR': True,
     'SECURITY_REQUIREMENTS': [
         {'Bearer': []}
-    ]
+    ],
+    # Spécification précalculée (manage.py generer_schema_openapi), voir eboutique_config/schema.py
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
 }
+
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
+# Fichiers du schéma OpenAPI écrits au build ; à défaut, le schéma est généré une fois par processus
+SCHEMA_OPENAPI_DIR = os.getenv('SCHEMA_OPENAPI_DIR', str(BASE_DIR / 'schema'))
+SCHEMA_OPENAPI_MAX_AGE = int(os.getenv('SCHEMA_OPENAPI_MAX_AGE', 3600))
@@ -14,31 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
+from .schema import api_info, schema_openapi
+from .media import servir_media
+from .metriques import metriques
 # from boutique.views import accueil  # afficher la page d’accueil ici
 
 
+# Les pages Swagger UI / ReDoc ne génèrent qu'un schéma vide : la spécification complète
+# est chargée depuis SPEC_URL, servie précalculée par eboutique_config.schema
 schema_view = get_schema_view(
-    openapi.Info(
-        title="EBoutique FREE API",
-        default_version='v1',
-        description="""
-API pour la gestion des boutiques de téléphones free les plus proches de vous.
-
-## Authentification
-Pour utiliser l'API  afin d'avoir accès aux endpoints lies a la gestion des boutiques, produits, stocks, etc (requete POST, PUT, DELETE) il faut :
-1. Obtenez un token JWT via `/api/token/`
-2. Cliquez sur le bouton 'Authorize' en haut
-3. Collez simplement votre token JWT (avec le préfixe Bearer suivi d'un espace)
-""",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="contact@eboutique.com"),
-        license=openapi.License(name="MIT License"),
-    ),
+    api_info,
     public=True,
     permission_classes=(permissions.AllowAny,),
     authentication_classes=(),
@@ -50,12 +40,18 @@ urlpatterns = [
     path('api/', include('free_app.urls')),
     
     # URLs pour Swagger
-    path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
+    path('swagger<format>/', schema_openapi, name='schema-json'),
     path('', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
     path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
 
+    # Images des produits (envoyées par nginx / Apache selon MEDIA_ENVOI)
+    path(f"{settings.MEDIA_URL.strip('/')}/<path:chemin>", servir_media, name='media'),
+
     # path("", accueil, name="accueil"),  # Page d'accueil de l'application boutique  |
     # #path("api-auth/", include("rest_framework.urls")),  # API US5 & US6 : recherche de boutiques proches où le stock est non nul
 
     # path("boutique/", include('boutique.urls')), # URL de l'application boutique
 ]
+
+if settings.METRIQUES_ACTIF:
+    urlpatterns.append(path('metrics', metriques, name='metriques'))
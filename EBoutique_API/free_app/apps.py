@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class FreeAppConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "free_app"
+
+    def ready(self):
+        # Connexion des signaux (révocation des jetons JWT)
+        from . import signals  # noqa: F401
@@ -0,0 +1,101 @@
+"""
+Authentification JWT sans requête base de données sur les lectures.
+
+Le rôle et les boutiques de l'utilisateur sont ajoutés au jeton à sa création
+(``/api/token/``). Sur une requête en lecture, l'utilisateur est reconstruit à
+partir du jeton, sans SELECT sur auth_user ni sur le profil. Les écritures
+chargent toujours le vrai User (il est enregistré dans les clés étrangères).
+
+Chaque jeton porte la version des jetons de l'utilisateur (claim ``ver``) ; elle
+est comparée à la version courante, lue en cache. Changer le rôle, les boutiques,
+le mot de passe ou désactiver le compte incrémente la version : les jetons déjà
+émis sont refusés au plus tard après JWT_VERSION_CACHE_SECONDS secondes (immédiatement
+si le cache est partagé entre les workers).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.contrib.auth.models import User
+from django.db.models import F
+from rest_framework import permissions
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from boutique.permissions import ContextePermissions
+from .models import UserProfile
+
+CLAIM_VERSION = 'ver'
+
+
+def _cle_version(user_id):
+    return f'jwt_version:{user_id}'
+
+
+def version_jetons(user_id):
+    """
+    Version courante des jetons d'un utilisateur, servie par le cache.
+    Retourne None si le compte n'existe plus ou est désactivé.
+    """
+    cle = _cle_version(user_id)
+    version = cache.get(cle)
+    if version is None:
+        lignes = list(User.objects.filter(pk=user_id, is_active=True).values_list('profile__version_jetons', flat=True))
+        # -1 : compte supprimé ou désactivé ; un compte sans profil (superuser) est en version 0
+        version = (lignes[0] or 0) if lignes else -1
+        cache.set(cle, version, settings.JWT_VERSION_CACHE_SECONDS)
+    return None if version < 0 else version
+
+
+def revoquer_jetons(*user_ids):
+    """
+    Invalide les jetons déjà émis des utilisateurs donnés.
+    """
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if not user_ids:
+        return
+    UserProfile.objects.filter(user_id__in=user_ids).update(version_jetons=F('version_jetons') + 1)
+    cache.delete_many([_cle_version(user_id) for user_id in user_ids])
+
+
+class UtilisateurJeton(TokenUser):
+    """
+    Utilisateur reconstruit à partir des claims du jeton, sans accès à la base.
+    """
+    @property
+    def contexte_permissions(self):
+        return ContextePermissions(
+            user_id=self.pk,
+            role=self.token.get('role'),
+            boutiques_responsable=self.token.get('boutiques_responsable', ()),
+            boutiques_gestionnaire=self.token.get('boutiques_gestionnaire', ()),
+        )
+
+
+class JWTSansRequeteAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication qui ne charge pas l'utilisateur en base pour les lectures.
+    Les jetons émis avant l'ajout des claims sont traités comme par JWTAuthentication.
+    """
+    def authenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        token = self.get_validated_token(raw_token)
+        if CLAIM_VERSION not in token:
+            return self.get_user(token), token
+
+        version = version_jetons(token[api_settings.USER_ID_CLAIM])
+        if version is None or version != token[CLAIM_VERSION]:
+            raise AuthenticationFailed('Jeton révoqué', code='token_revoked')
+
+        # Le contexte de permissions vient des claims : aucune requête pour le calculer
+        utilisateur = UtilisateurJeton(token)
+        requete = getattr(request, '_request', request)
+        requete._contexte_permissions = utilisateur.contexte_permissions
+        if request.method in permissions.SAFE_METHODS:
+            return utilisateur, token
+        return self.get_user(token), token
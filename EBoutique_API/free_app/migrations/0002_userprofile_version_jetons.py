@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('free_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='version_jetons',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -17,6 +17,7 @@ class UserProfile(models.Model):
     telephone = models.CharField(max_length=20, blank=True, null=True, unique=True) # Numéro de téléphone de l'utilisateur
     date_creation = models.DateTimeField(auto_now_add=True) # Date de création de l'utilisateur
     date_maj = models.DateTimeField(auto_now=True) # Date de mise à jour de l'utilisateur   
+    version_jetons = models.PositiveIntegerField(default=0, editable=False) # Incrémentée pour révoquer les jetons JWT émis
 
     class Meta:
         db_table = 'tb_user_profile' # Nom personnalisé de la table pour les profils des utilisateurs
@@ -2,6 +2,9 @@
 from rest_framework import serializers
 from .models import UserProfile, ArchivedUser
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from boutique.permissions import ContextePermissions
+from .authentication import CLAIM_VERSION, version_jetons
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -63,4 +66,22 @@ class ArchivedUserSerializer(serializers.ModelSerializer):
     class Meta:
         model = ArchivedUser
         fields = '__all__'
-        read_only_fields = ['date_archivage', 'archive_par'] 
\ No newline at end of file
+        read_only_fields = ['date_archivage', 'archive_par'] 
+
+class EBoutiqueTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Ajoute au jeton le rôle, les boutiques de l'utilisateur et la version de ses jetons,
+    lus ensuite par JWTSansRequeteAuthentication sans requête base.
+    """
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        contexte = ContextePermissions.depuis_utilisateur(user)
+        token['username'] = user.username
+        token['is_superuser'] = user.is_superuser
+        token['is_staff'] = user.is_staff
+        token['role'] = contexte.role
+        token['boutiques_responsable'] = sorted(contexte.boutiques_responsable)
+        token['boutiques_gestionnaire'] = sorted(contexte.boutiques_gestionnaire)
+        token[CLAIM_VERSION] = version_jetons(user.pk) or 0
+        return token
@@ -1,74 +1,77 @@
-from django.db.models.signals import post_save, pre_save
+"""
+Révocation des jetons JWT lorsque les informations qu'ils embarquent changent :
+rôle, boutiques dont l'utilisateur est responsable ou gestionnaire, mot de passe,
+compte désactivé ou droits superuser.
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_init, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from .models import Stock
-import logging
 
-logger = logging.getLogger(__name__)
+from boutique.models import Boutique
+from .authentication import revoquer_jetons
+from .models import UserProfile
 
-@receiver(post_save, sender=Stock)
-def alerte_stock(sender, instance, created, **kwargs):
-    """Envoie une alerte email lorsque le stock est faible"""
-    if created:
-        return  # Ne pas alerter à la création du stock
-    
-    # Vérifie si le stock est inférieur au seuil d'alerte
-    if instance.quantite < settings.STOCK_ALERT_THRESHOLD:
-        boutique = instance.boutique
-        gestionnaire = boutique.gestionnaire
-
-        # Vérifie si le gestionnaire a une adresse email
-        if not gestionnaire or not gestionnaire.email:
-            return
-
-        # Crée l'email d'alerte
-        sujet = f"Alerte stock - {instance.produit.nom} ({boutique.nom})"
-        message = (
-            f"Bonjour {gestionnaire.first_name or 'gestionnaire'},\n\n"
-            f"Le produit {instance.produit.nom} dans votre boutique {boutique.nom} "
-            f"a un stock faible :\n\n"
-            f"- Quantité actuelle : {instance.quantite}\n"
-            f"- Seuil d'alerte : {settings.STOCK_ALERT_THRESHOLD}\n\n"
-            f"Veuillez procéder au réapprovisionnement.\n\n"
-            f"Cordialement,\nVotre système de gestion de stock"
-        )
-
-        # Envoi de l'email
-        send_mail(
-            subject=sujet,
-            message=message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[gestionnaire.email],
-            fail_silently=False,
-        )
-
-        logger.info(f"Alerte stock envoyée pour le produit {instance.produit.nom} à {gestionnaire.email}")
-
-@receiver(pre_save, sender=Stock)
-def tracer_changement_stock(sender, instance, **kwargs):
-    """Crée un historique des modifications de stock, sans HistoriqueStock"""
-    if not instance.pk:
-        return
-
-    try:
-        ancien_stock = Stock.objects.get(pk=instance.pk)
-    except Stock.DoesNotExist:
-        return
-
-    if ancien_stock.quantite != instance.quantite:
-        difference = instance.quantite - ancien_stock.quantite
-        type_mouvement = 'ENTREE' if difference > 0 else 'SORTIE'
-
-        # Tu peux loguer le changement ici ou effectuer d'autres actions,
-        # mais pas de création d'objet HistoriqueStock.
-        logger.info(f"Changement de stock pour {instance.produit.nom}: "
-                    f"{ancien_stock.quantite} -> {instance.quantite} ({type_mouvement})")
-
-@receiver(post_save, sender=Stock)
-def notifier_api_frontend(sender, instance, created, **kwargs):
+
+CHAMPS_USER = ('password', 'is_active', 'is_superuser')
+
+
+def _etat(instance, champs):
     """
-    Pour une future intégration avec React (webhooks ou SSE)
+    Valeurs chargées des champs donnés ; les champs différés (only/defer) sont ignorés
+    pour ne pas déclencher de requête.
     """
-    logger.info(f"[Notifier Frontend] Stock mis à jour : {instance.produit.nom} ({instance.quantite})")
+    return {champ: instance.__dict__[champ] for champ in champs if champ in instance.__dict__}
+
+
+def _modifie(instance):
+    return any(getattr(instance, champ) != valeur for champ, valeur in instance._etat_jetons.items())
+
+
+@receiver(post_init, sender=User)
+def memoriser_etat_user(sender, instance, **kwargs):
+    instance._etat_jetons = _etat(instance, CHAMPS_USER)
+
+
+@receiver(post_save, sender=User)
+def revoquer_si_user_modifie(sender, instance, created, **kwargs):
+    if not created and _modifie(instance):
+        revoquer_jetons(instance.pk)
+    instance._etat_jetons = _etat(instance, CHAMPS_USER)
+
+
+@receiver(post_init, sender=UserProfile)
+def memoriser_role(sender, instance, **kwargs):
+    instance._etat_jetons = _etat(instance, ['role'])
+
+
+@receiver(post_save, sender=UserProfile)
+def revoquer_si_role_modifie(sender, instance, created, **kwargs):
+    if not created and _modifie(instance):
+        revoquer_jetons(instance.user_id)
+    instance._etat_jetons = _etat(instance, ['role'])
+
+
+@receiver(post_init, sender=Boutique)
+def memoriser_responsable(sender, instance, **kwargs):
+    instance._etat_jetons = _etat(instance, ['responsable_id'])
+
+
+@receiver(post_save, sender=Boutique)
+def revoquer_si_responsable_modifie(sender, instance, created, **kwargs):
+    if created:
+        revoquer_jetons(instance.responsable_id)
+    elif _modifie(instance):
+        revoquer_jetons(instance.responsable_id, instance._etat_jetons['responsable_id'])
+    instance._etat_jetons = _etat(instance, ['responsable_id'])
+
 
+@receiver(m2m_changed, sender=Boutique.gestionnaires.through)
+def revoquer_gestionnaires_modifies(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove'):
+        revoquer_jetons(*([instance.pk] if reverse else pk_set))
+    elif action == 'pre_clear':
+        # Les gestionnaires retirés ne sont plus connus après le clear
+        if reverse:
+            revoquer_jetons(instance.pk)
+        else:
+            revoquer_jetons(*instance.gestionnaires.values_list('pk', flat=True))
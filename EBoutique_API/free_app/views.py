@@ -1,14 +1,15 @@
 from rest_framework import viewsets
 from .models import UserProfile, ArchivedUser
 from drf_yasg.utils import swagger_auto_schema
-from .serializers import UserProfileSerializer, ArchivedUserSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .serializers import UserProfileSerializer, ArchivedUserSerializer, EBoutiqueTokenObtainPairSerializer
 from boutique.permissions import EstResponsableBoutique, PeuModifierUserProfile
 
 # ============================================================================
 # Gestion des utilisateurs
 # ============================================================================
 class UserProfileViewSet(viewsets.ModelViewSet):
-    queryset = UserProfile.objects.all()
+    queryset = UserProfile.objects.select_related('user')  # Champs de l'utilisateur ajoutés à chaque profil
     serializer_class = UserProfileSerializer
     permission_classes = [PeuModifierUserProfile]
 
@@ -83,3 +84,9 @@ class ArchivedUserViewSet(viewsets.ReadOnlyModelViewSet):
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
     
+
+# ============================================================================
+# Obtention des jetons JWT
+# ============================================================================
+class EBoutiqueTokenObtainPairView(TokenObtainPairView):
+    serializer_class = EBoutiqueTokenObtainPairSerializer
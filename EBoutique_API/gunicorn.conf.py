@@ -0,0 +1,76 @@
+"""
+Configuration gunicorn du mode production (entrypoint.sh, SERVER_MODE=wsgi ou asgi).
+
+Toutes les valeurs se règlent par variables d'environnement.
+"""
+import multiprocessing
+import os
+
+_mode = os.getenv('SERVER_MODE', 'wsgi')
+_cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '9000')}"
+
+if _mode == 'asgi':
+    # Workers uvicorn : une boucle d'événements par processus, un processus par CPU suffit
+    wsgi_app = 'eboutique_config.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    workers = int(os.getenv('WEB_CONCURRENCY', _cpus))
+else:
+    # Workers synchrones à threads : (2 x CPU) + 1 processus
+    wsgi_app = 'eboutique_config.wsgi:application'
+    worker_class = 'gthread'
+    workers = int(os.getenv('WEB_CONCURRENCY', 2 * _cpus + 1))
+    threads = int(os.getenv('GUNICORN_THREADS', 2))
+
+# Application chargée une fois dans le maître puis partagée par fork (copy-on-write)
+preload_app = os.getenv('GUNICORN_PRELOAD', 'True') == 'True'
+
+# Recyclage progressif des workers (fuites mémoire), décalé pour ne pas tous les redémarrer ensemble
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Plusieurs workers : leurs métriques (/metrics) sont agrégées via un dossier partagé
+if workers > 1:
+    os.environ.setdefault('METRIQUES_DOSSIER', '/tmp/eboutique-metriques')
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    # Les connexions ouvertes par le maître pendant le préchargement ne doivent pas être
+    # partagées entre processus : chaque worker ouvre les siennes
+    from django.db import connections
+    connections.close_all()
+
+
+def on_starting(server):
+    # Métriques agrégées entre workers : on repart de zéro à chaque démarrage
+    dossier = os.getenv('METRIQUES_DOSSIER')
+    if dossier:
+        os.makedirs(dossier, exist_ok=True)
+        for fichier in os.listdir(dossier):
+            if fichier.startswith('metriques-'):
+                os.remove(os.path.join(dossier, fichier))
+
+
+def worker_exit(server, worker):
+    # Dernier instantané des métriques du worker, avant son archivage par le maître
+    dossier = os.getenv('METRIQUES_DOSSIER')
+    if dossier:
+        from eboutique_config.metriques import registre
+        registre.ecrire_instantane(dossier, force=True)
+
+
+def child_exit(server, worker):
+    # Les mesures d'un worker recyclé (max_requests) sont conservées dans l'archive
+    dossier = os.getenv('METRIQUES_DOSSIER')
+    if dossier:
+        from eboutique_config.metriques import archiver_instantane
+        archiver_instantane(dossier, worker.pid)
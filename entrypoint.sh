@@ -1,11 +1,42 @@
-#!/bin/bash
+#!/bin/sh
+#
+# Usage : entrypoint.sh [serve|migrate]
+#   migrate : applique les migrations puis s'arrête (étape ponctuelle avant le déploiement)
+#   serve   : démarre le serveur selon SERVER_MODE
+#             dev  : runserver (défaut, applique les migrations si RUN_MIGRATIONS=True)
+#             wsgi : gunicorn, workers gthread
+#             asgi : gunicorn, workers uvicorn
 
 set -e  # Stop on error
 
 cd EBoutique_API
 
-echo "🛠 Running migrations..."
-python3 manage.py migrate
-
-echo "🚀 Starting development server on 0.0.0.0:${PORT:-9000} ..."
-exec python3 manage.py runserver 0.0.0.0:${PORT:-9000}
+case "${1:-serve}" in
+  migrate)
+    echo "🛠 Running migrations..."
+    exec python3 manage.py migrate --noinput
+    ;;
+  serve)
+    case "${SERVER_MODE:-dev}" in
+      wsgi|asgi)
+        echo "🚀 Starting gunicorn (${SERVER_MODE}) on 0.0.0.0:${PORT:-9000} ..."
+        exec gunicorn -c gunicorn.conf.py
+        ;;
+      dev)
+        if [ "${RUN_MIGRATIONS:-True}" = "True" ]; then
+          echo "🛠 Running migrations..."
+          python3 manage.py migrate
+        fi
+        echo "🚀 Starting development server on 0.0.0.0:${PORT:-9000} ..."
+        exec python3 manage.py runserver 0.0.0.0:${PORT:-9000}
+        ;;
+      *)
+        echo "SERVER_MODE inconnu : ${SERVER_MODE} (dev, wsgi ou asgi)" >&2
+        exit 1
+        ;;
+    esac
+    ;;
+  *)
+    exec "$@"
+    ;;
+esac
@@ -0,0 +1,180 @@
+"""
+Benchmark des endpoints publics asynchrones face au ProduitViewSet.list synchrone.
+
+Deux latences réseau peuvent être simulées :
+- --latence : clients mobiles lents. Chaque client envoie la ligne de requête, attend
+  --latence millisecondes puis envoie la fin des en-têtes.
+- --latence-bdd : base distante (PostgreSQL uniquement). Le serveur se connecte à la
+  base à travers un relais TCP local qui retarde chaque message de --latence-bdd
+  millisecondes. Une vue synchrone garde son thread bloqué pendant chaque requête SQL ;
+  le nombre de threads du worker borne alors le débit.
+
+Chaque scénario tourne sur un seul worker (WEB_CONCURRENCY=1) :
+- wsgi-sync  : gunicorn gthread, GET /api/produits/ (ProduitViewSet.list)
+- asgi-sync  : gunicorn + uvicorn, GET /api/produits/ (vue DRF exécutée dans un thread)
+- asgi-async : gunicorn + uvicorn, GET /api/public/produits/ (vue async)
+
+La base doit être migrée et contenir des produits (validés pour le catalogue public).
+
+Exemple :
+    python scripts/bench_async.py --concurrence 64 --latence 200 --duree 15 \\
+        --utilisateur admin --mot-de-passe admin --sortie bench_async.json
+    python scripts/bench_async.py --latence 0 --latence-bdd 20 --utilisateur admin --mot-de-passe admin
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from test_charge import arreter_serveur, attendre_serveur, centile, demarrer_serveur, obtenir_jeton
+
+SCENARIOS = {
+    'wsgi-sync': ('wsgi', '/api/produits/', True),
+    'asgi-sync': ('asgi', '/api/produits/', True),
+    'asgi-async': ('asgi', '/api/public/produits/', False),
+}
+
+
+def demarrer_relais(hote, port, latence):
+    """
+    Relais TCP local vers (hote, port) qui retarde chaque message de la latence donnée.
+    Retourne le port local du relais ; le relais tourne dans un thread démon.
+    """
+    async def transferer(lecteur, ecrivain):
+        try:
+            while donnees := await lecteur.read(65536):
+                await asyncio.sleep(latence)
+                ecrivain.write(donnees)
+                await ecrivain.drain()
+        except ConnectionError:
+            pass
+        finally:
+            ecrivain.close()
+
+    async def connexion(lecteur_client, ecrivain_client):
+        lecteur_base, ecrivain_base = await asyncio.open_connection(hote, port)
+        await asyncio.gather(
+            transferer(lecteur_client, ecrivain_base),
+            transferer(lecteur_base, ecrivain_client),
+        )
+
+    pret = threading.Event()
+    ports = []
+
+    async def servir():
+        serveur = await asyncio.start_server(connexion, '127.0.0.1', 0)
+        ports.append(serveur.sockets[0].getsockname()[1])
+        pret.set()
+        await serveur.serve_forever()
+
+    threading.Thread(target=asyncio.run, args=(servir(),), daemon=True).start()
+    pret.wait()
+    return ports[0]
+
+
+def requete_lente(port, route, jeton, latence):
+    """
+    Une requête GET dont les en-têtes arrivent en deux fois, séparées par la latence simulée.
+    Retourne le code HTTP de la réponse.
+    """
+    entetes = ['Host: localhost', 'Connection: close']
+    if jeton:
+        entetes.append(f'Authorization: Bearer {jeton}')
+    with socket.create_connection(('127.0.0.1', port), timeout=60) as connexion:
+        connexion.sendall(f'GET {route} HTTP/1.1\r\n'.encode())
+        time.sleep(latence)
+        connexion.sendall(('\r\n'.join(entetes) + '\r\n\r\n').encode())
+        reponse = b''
+        while morceau := connexion.recv(65536):
+            reponse += morceau
+    return int(reponse.split(b' ', 2)[1]) if reponse else 0
+
+
+def client(port, route, jeton, latence, fin):
+    latences, erreurs = [], 0
+    while time.monotonic() < fin:
+        debut = time.perf_counter()
+        try:
+            code = requete_lente(port, route, jeton, latence)
+        except OSError:
+            code = 0
+        if code == 200:
+            latences.append(time.perf_counter() - debut)
+        else:
+            erreurs += 1
+    return latences, erreurs
+
+
+def mesurer(nom, args):
+    mode, route, authentifie = SCENARIOS[nom]
+    variables = {'WEB_CONCURRENCY': '1'}
+    if args.port_relais:
+        variables.update(DB_HOST='127.0.0.1', DB_PORT=str(args.port_relais))
+    processus = demarrer_serveur(mode, args.port, **variables)
+    try:
+        base = f'http://127.0.0.1:{args.port}'
+        if not attendre_serveur(base + '/api/public/produits/'):
+            raise SystemExit(f'Le serveur {mode} ne répond pas sur {base}')
+        jeton = obtenir_jeton(base, args.utilisateur, args.mot_de_passe) if authentifie and args.utilisateur else None
+        latence = args.latence / 1000
+        fin = time.monotonic() + args.duree
+        with ThreadPoolExecutor(max_workers=args.concurrence) as executor:
+            resultats = list(executor.map(
+                lambda _: client(args.port, route, jeton, latence, fin), range(args.concurrence)
+            ))
+    finally:
+        arreter_serveur(processus)
+
+    latences = sorted(latence for latences_client, _ in resultats for latence in latences_client)
+    return {
+        'scenario': nom,
+        'route': route,
+        'requetes': len(latences),
+        'erreurs': sum(erreurs for _, erreurs in resultats),
+        'req_par_s': round(len(latences) / args.duree, 1),
+        **{
+            f'p{p}_ms': round(centile(latences, p) * 1000, 1) if latences else None
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vues async contre ProduitViewSet.list sous latence réseau simulée.')
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument('--concurrence', type=int, default=64, help='Nombre de clients lents simultanés')
+    parser.add_argument('--latence', type=float, default=200, help='Latence réseau simulée par requête, en ms')
+    parser.add_argument('--latence-bdd', type=float, default=0, help='Latence simulée entre le serveur et PostgreSQL, en ms')
+    parser.add_argument('--duree', type=float, default=15, help='Durée de mesure par scénario, en secondes')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--utilisateur', help='Compte utilisé pour /api/produits/ (jeton via /api/token/)')
+    parser.add_argument('--mot-de-passe', default='')
+    parser.add_argument('--sortie', help='Fichier JSON où écrire les résultats')
+    args = parser.parse_args()
+
+    args.port_relais = None
+    if args.latence_bdd:
+        args.port_relais = demarrer_relais(
+            os.getenv('DB_HOST', '127.0.0.1'), int(os.getenv('DB_PORT', 5432)), args.latence_bdd / 1000
+        )
+
+    resultats = []
+    for nom in args.scenarios:
+        print(f'Scénario {nom}...', file=sys.stderr)
+        resultats.append(mesurer(nom, args))
+
+    print(f"{'scenario':<11} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+    for r in resultats:
+        print(f"{r['scenario']:<11} {r['req_par_s']:>8} {r['p50_ms']!s:>8} {r['p95_ms']!s:>8} {r['p99_ms']!s:>8} {r['erreurs']:>8}")
+    if args.sortie:
+        Path(args.sortie).write_text(json.dumps(resultats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Test de charge local : compare les modes de service de entrypoint.sh (dev, wsgi, asgi).
+
+Pour chaque mode, le serveur est démarré comme dans l'image (SERVER_MODE=<mode>
+entrypoint.sh serve), puis des clients concurrents envoient des GET sur les routes
+données pendant une durée fixe. Le script affiche le débit, les latences p50 / p95 / p99
+et le nombre d'erreurs de chaque mode.
+
+La base doit être migrée au préalable (entrypoint.sh migrate) ; les variables du
+fichier .env sont utilisées comme pour le serveur. Les routes exigeant une
+authentification, un jeton est obtenu via /api/token/ (--utilisateur / --mot-de-passe)
+ou fourni directement (--jeton).
+
+Exemple :
+    python scripts/test_charge.py --modes dev wsgi asgi --concurrence 32 --duree 20 \\
+        --route /api/produits/ --route /api/marques/ --utilisateur admin --mot-de-passe admin
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+RACINE = Path(__file__).resolve().parent.parent
+
+
+def demarrer_serveur(mode, port, **variables):
+    env = dict(os.environ, SERVER_MODE=mode, PORT=str(port), RUN_MIGRATIONS='False', **variables)
+    # Nouveau groupe de processus : runserver (autoreload) et gunicorn lancent des processus enfants
+    return subprocess.Popen(
+        ['sh', './entrypoint.sh', 'serve'], cwd=RACINE, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True,
+    )
+
+
+def arreter_serveur(processus):
+    try:
+        os.killpg(processus.pid, signal.SIGTERM)
+        processus.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(processus.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def attendre_serveur(url, delai=60):
+    fin = time.monotonic() + delai
+    while time.monotonic() < fin:
+        try:
+            urllib.request.urlopen(url, timeout=2).close()
+            return True
+        except urllib.error.HTTPError:
+            return True  # Le serveur répond, même avec une erreur
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def obtenir_jeton(base, utilisateur, mot_de_passe):
+    requete = urllib.request.Request(
+        f'{base}/api/token/',
+        data=json.dumps({'username': utilisateur, 'password': mot_de_passe}).encode(),
+        headers={'Host': 'localhost', 'Content-Type': 'application/json'},
+    )
+    with urllib.request.urlopen(requete, timeout=10) as reponse:
+        return json.load(reponse)['access']
+
+
+def client(urls, entetes, fin):
+    """
+    Boucle d'un client : requêtes successives jusqu'à l'échéance.
+    Retourne (latences en secondes, nombre d'erreurs).
+    """
+    latences, erreurs, i = [], 0, 0
+    while time.monotonic() < fin:
+        requete = urllib.request.Request(urls[i % len(urls)], headers=entetes)
+        i += 1
+        debut = time.perf_counter()
+        try:
+            with urllib.request.urlopen(requete, timeout=30) as reponse:
+                reponse.read()
+            latences.append(time.perf_counter() - debut)
+        except (urllib.error.URLError, OSError):
+            erreurs += 1
+    return latences, erreurs
+
+
+def centile(valeurs, p):
+    if not valeurs:
+        return None
+    return statistics.quantiles(valeurs, n=100, method='inclusive')[p - 1] if len(valeurs) > 1 else valeurs[0]
+
+
+def mesurer(mode, args):
+    base = f'http://127.0.0.1:{args.port}'
+    urls = [base + route for route in args.route]
+    entetes = {'Host': 'localhost'}
+
+    processus = demarrer_serveur(mode, args.port)
+    try:
+        if not attendre_serveur(urls[0]):
+            raise SystemExit(f'Le serveur {mode} ne répond pas sur {base}')
+        jeton = args.jeton
+        if jeton is None and args.utilisateur:
+            jeton = obtenir_jeton(base, args.utilisateur, args.mot_de_passe)
+        if jeton:
+            entetes['Authorization'] = f'Bearer {jeton}'
+        # Échauffement : workers démarrés, connexions ouvertes
+        client(urls, entetes, time.monotonic() + 2)
+
+        fin = time.monotonic() + args.duree
+        with ThreadPoolExecutor(max_workers=args.concurrence) as executor:
+            resultats = list(executor.map(lambda _: client(urls, entetes, fin), range(args.concurrence)))
+    finally:
+        arreter_serveur(processus)
+
+    latences = sorted(latence for latences_client, _ in resultats for latence in latences_client)
+    erreurs = sum(erreurs_client for _, erreurs_client in resultats)
+    return {
+        'mode': mode,
+        'requetes': len(latences),
+        'erreurs': erreurs,
+        'req_par_s': round(len(latences) / args.duree, 1),
+        **{
+            f'p{p}_ms': round(centile(latences, p) * 1000, 1) if latences else None
+            for p in (50, 95, 99)
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare le débit et la latence des modes de service.')
+    parser.add_argument('--modes', nargs='+', default=['dev', 'wsgi'], choices=['dev', 'wsgi', 'asgi'])
+    parser.add_argument('--route', action='append', help='Route à interroger (répétable, défaut : /api/produits/)')
+    parser.add_argument('--concurrence', type=int, default=16, help='Nombre de clients simultanés')
+    parser.add_argument('--duree', type=float, default=15, help='Durée de mesure par mode, en secondes')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--jeton', help='Jeton JWT envoyé en Authorization: Bearer')
+    parser.add_argument('--utilisateur', help='Compte utilisé pour obtenir un jeton via /api/token/')
+    parser.add_argument('--mot-de-passe', default='')
+    parser.add_argument('--sortie', help='Fichier JSON où écrire les résultats')
+    args = parser.parse_args()
+    args.route = args.route or ['/api/produits/']
+
+    resultats = []
+    for mode in args.modes:
+        print(f'Mode {mode}...', file=sys.stderr)
+        resultats.append(mesurer(mode, args))
+
+    print(f"{'mode':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erreurs':>8}")
+    for r in resultats:
+        print(f"{r['mode']:<6} {r['req_par_s']:>8} {r['p50_ms']!s:>8} {r['p95_ms']!s:>8} {r['p99_ms']!s:>8} {r['erreurs']:>8}")
+    if args.sortie:
+        Path(args.sortie).write_text(json.dumps(resultats, indent=2))
+
+
+if __name__ == '__main__':
+    main()